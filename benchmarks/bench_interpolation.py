@@ -0,0 +1,118 @@
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from heatmap_utils import get_heatmap_dataset, LON, LAT, VALUE
+from interpolation import ENGINES, interpolate, leave_one_out
+
+"""
+Sammenligner interpolasjonsmotorene i src/interpolation.py på ekte data (standard data/Jan_2025):
+tid for et helt rutenett, og nøyaktighet med leave-one-station-out, der hver stasjon holdes
+utenfor og sammenlignes med verdien heatmapet viser i nærmeste gridpunkt. Nøyaktigheten
+avhenger derfor også av grid_res. For hver grid_res anbefales den raskeste motoren som er
+nøyaktig nok.
+Kjøres med: python benchmarks/bench_interpolation.py [--grid-res 50 100 200 400] [--dates 5]
+"""
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "Jan_2025"))
+GRID_RES = (50, 100, 200, 400)
+TOLERANCE = 0.10 # RMSE inntil 10 % over den beste motoren regnes som nøyaktig nok
+MIN_COVERAGE = 0.9 # Andel stasjoner motoren må gi en verdi for
+
+
+def load_days(data_dir, datatype=None, n_dates=5):
+    """
+    (dato, punkter, verdier) for de første n_dates datoene for datatypen (standard den første).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        dataset = get_heatmap_dataset(data_dir)
+    datatype = datatype or dataset.datatypes[0]
+    days = []
+    for selected_date in dataset.dates[:n_dates]:
+        day = dataset.filter(datatype, selected_date).dropna(subset=[LON, LAT, VALUE])
+        if len(day) >= 4:
+            days.append((selected_date, day[[LON, LAT]].to_numpy(dtype=np.float64), day[VALUE].to_numpy(dtype=np.float64)))
+    return days
+
+def evaluate_engines(days, grid_res=GRID_RES, engines=tuple(ENGINES), repeat=3, cutoff_radius_km=75):
+    """
+    Én rad per (grid_res, motor) med median tid for ett rutenett og RMSE, MAE og dekning
+    fra leave-one-station-out over alle dagene.
+    """
+    rows = []
+    for res in grid_res:
+        for engine in engines:
+            times, errors, covered, total = [], [], 0, 0
+            for _, points, values in days:
+                grid_lon = np.linspace(points[:, 0].min(), points[:, 0].max(), res)
+                grid_lat = np.linspace(points[:, 1].min(), points[:, 1].max(), res)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    interpolate(points, values, grid_lon, grid_lat, cutoff_radius_km, engine)
+                    times.append(time.perf_counter() - start)
+                predictions = leave_one_out(points, values, grid_lon, grid_lat, cutoff_radius_km, engine)
+                found = ~np.isnan(predictions)
+                errors.append(predictions[found] - values[found])
+                covered += found.sum()
+                total += len(values)
+            errors = np.concatenate(errors)
+            rows.append({
+                "grid_res": res,
+                "engine": engine,
+                "seconds": float(np.median(times)),
+                "rmse": float(np.sqrt(np.mean(errors ** 2))) if len(errors) else np.nan,
+                "mae": float(np.mean(np.abs(errors))) if len(errors) else np.nan,
+                "coverage": covered / total if total else 0.0,
+            })
+    return pd.DataFrame(rows)
+
+def choose_engines(results, tolerance=TOLERANCE, min_coverage=MIN_COVERAGE):
+    """
+    Den raskeste motoren per grid_res blant dem med dekning minst min_coverage og
+    RMSE høyst (1 + tolerance) ganger den beste.
+    """
+    chosen = []
+    for res, group in results.groupby("grid_res"):
+        candidates = group[group["coverage"] >= min_coverage]
+        if candidates.empty:
+            continue
+        accurate = candidates[candidates["rmse"] <= candidates["rmse"].min() * (1 + tolerance)]
+        chosen.append(accurate.sort_values("seconds").iloc[0])
+    return pd.DataFrame(chosen).reset_index(drop=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tid og nøyaktighet for interpolasjonsmotorene")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Mappe med CSV-filer, som data/Jan_2025")
+    parser.add_argument("--datatype", default=None, help="Datatype (standard den første)")
+    parser.add_argument("--dates", type=int, default=5, help="Antall datoer")
+    parser.add_argument("--grid-res", type=int, nargs="+", default=list(GRID_RES))
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--min-coverage", type=float, default=MIN_COVERAGE)
+    parser.add_argument("--output", default=None, help="Lagre resultatet som JSON")
+    args = parser.parse_args(argv)
+
+    days = load_days(args.data_dir, args.datatype, args.dates)
+    if not days:
+        print(f"Fant ingen datoer med nok stasjoner i {args.data_dir}")
+        return 1
+    results = evaluate_engines(days, args.grid_res, args.engines, args.repeat)
+    chosen = choose_engines(results, args.tolerance, args.min_coverage)
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    print("\nAnbefalt motor per grid_res:")
+    print(chosen[["grid_res", "engine", "seconds", "rmse", "coverage"]].to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results.to_dict(orient="records"), "chosen": chosen.to_dict(orient="records")}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
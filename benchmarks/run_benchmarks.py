@@ -0,0 +1,253 @@
+import os
+import sys
+import gc
+import glob
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from data_processing import process_weather_data, process_weather_data_parallel
+from heatmap_utils import interpolate_data
+from interpolation import GridInterpolator
+from predictions import predict_from_csv
+from instrumentation import StageProfiler
+from synthetic_frost import generate_observations, generate_stations
+
+"""
+Ytelsestester for prosesseringen, interpolasjonen og prediksjonen på syntetiske Frost-data
+i flere størrelser. Resultatene lagres som JSON i benchmarks/results/, og hver kjøring
+sammenlignes med forrige resultat (eller --baseline), slik at regresjoner oppdages uten nettverk.
+Kjøres med: python benchmarks/run_benchmarks.py [--scales small medium] [--repeat 3]
+Returkode 1 betyr at minst én test er tregere enn toleransen, eller at den parallelle
+prosesseringen er tregere enn den serielle.
+"""
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Stasjoner × dager × timeOffsets per størrelse. Ett element per nyttelast, som én henting i
+# FrostDataFetcher, siden resample_and_aggregate beholder én rad per stasjon og dag.
+ELEMENT = "sum(precipitation_amount P1D)"
+SCALES = {
+    "small": {"n_stations": 20, "n_days": 90, "time_offsets": ("PT6H",)},
+    "medium": {"n_stations": 100, "n_days": 365, "time_offsets": ("PT6H",)},
+    "large": {"n_stations": 200, "n_days": 3653, "time_offsets": ("PT0H", "PT6H")},
+}
+GAP_FRACTION = 0.05
+OUTLIER_FRACTION = 0.001
+TOLERANCE = 0.25 # Tregere enn 25 % over forrige resultat regnes som regresjon
+MIN_DELTA = 0.005 # Sekunder. Mindre forskjeller er støy for de raskeste testene
+PARALLEL_WORKERS = min(os.cpu_count() or 1, 4)
+PARALLEL_MIN_ROWS = 10_000 # Under dette er overføring til arbeiderne en stor del av tiden, og parallell sjekkes ikke
+
+
+def timed(func, repeat):
+    """
+    Kjører func repeat ganger og returnerer tidene i sekunder og resultatet fra siste kjøring.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+def _case(name, scale, rows, times, **extra):
+    return dict(name=name, scale=scale, rows=rows, repeat=len(times),
+                seconds_min=min(times), seconds_median=float(np.median(times)), **extra)
+
+def bench_scale(scale, spec, repeat, work_dir, seed=1):
+    """
+    Kjører alle testene for én størrelse og returnerer én post per test.
+    """
+    data = generate_observations(**spec, elements=(ELEMENT,), gap_fraction=GAP_FRACTION, outlier_fraction=OUTLIER_FRACTION, seed=seed)
+    stations_path = os.path.join(work_dir, f"stations_{scale}.csv")
+    generate_stations(spec["n_stations"], seed=seed).to_csv(stations_path, index=False)
+    raw = pd.json_normalize(data)
+    n_observations = sum(len(item["observations"]) for item in data)
+    cases = []
+
+    # Prosessering, med tid per steg fra den raskeste kjøringen
+    profilers = []
+    def run_processing():
+        profilers.append(StageProfiler(scale, track_memory=False))
+        return process_weather_data(raw.copy(), stations_path, profiler=profilers[-1])
+    times, processed = timed(run_processing, repeat)
+    fastest = profilers[int(np.argmin(times))]
+    cases.append(_case("process_weather_data", scale, n_observations, times,
+                       stages={r["stage"]: r["seconds"] for r in fastest.records}))
+
+    # Samme prosessering i en prosesspool. Poolen startes før tidtakingen, som i en batch-kjøring
+    with ProcessPoolExecutor(max_workers=PARALLEL_WORKERS) as pool:
+        list(pool.map(abs, range(PARALLEL_WORKERS)))
+        executor = pool if PARALLEL_WORKERS > 1 else None
+        times, _ = timed(lambda: process_weather_data_parallel(raw.copy(), stations_path, max_workers=PARALLEL_WORKERS,
+                                                               executor=executor), repeat)
+    cases.append(_case("process_weather_data_parallel", scale, n_observations, times, workers=PARALLEL_WORKERS))
+
+    # Interpolasjon av én dag over alle stasjoner, som i Interactive_plot
+    one_day = processed[processed["referenceTimestamp"] == processed["referenceTimestamp"].min()].copy()
+    one_day["scaled_value"] = (one_day["value"] / one_day["value"].max()).clip(0, 1)
+    times, grid = timed(lambda: interpolate_data(one_day), repeat)
+    cases.append(_case("interpolate_data", scale, len(one_day), times, grid_cells=len(grid)))
+
+    # En måned med samme stasjoner: triangulering og vekter tilpasses én gang, og hver dag er et matriseprodukt
+    points = one_day[["lon", "lat"]].to_numpy(dtype=np.float64)
+    month = (processed.pivot_table(index="sourceId", columns="referenceTimestamp", values="value", observed=True)
+             .reindex(one_day["sourceId"]).iloc[:, :31].fillna(0).to_numpy())
+    grid_lon = np.linspace(points[:, 0].min(), points[:, 0].max(), 200)
+    grid_lat = np.linspace(points[:, 1].min(), points[:, 1].max(), 200)
+    times, _ = timed(lambda: GridInterpolator(points, grid_lon, grid_lat)(month), repeat)
+    cases.append(_case("grid_interpolator_month", scale, month.size, times, days=month.shape[1]))
+
+    # Prediksjon fra en CSV med én stasjon, som i appen
+    csv_path = os.path.join(work_dir, f"predict_{scale}.csv")
+    station = processed[processed["sourceId"] == processed["sourceId"].iloc[0]]
+    station.to_csv(csv_path, index=False)
+    times, _ = timed(lambda: predict_from_csv(csv_path, "MS", 12), repeat)
+    cases.append(_case("predict_from_csv", scale, len(station), times))
+    return cases
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run_benchmarks(scales=("small", "medium"), repeat=3):
+    """
+    Kjører testene for de gitte størrelsene og returnerer resultatet som en dict.
+    """
+    cases = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in scales:
+            print(f"Kjører {scale}: {SCALES[scale]['n_stations']} stasjoner x {SCALES[scale]['n_days']} dager")
+            cases.extend(bench_scale(scale, SCALES[scale], repeat, work_dir))
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "cases": cases,
+    }
+
+def save_results(results, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.fromisoformat(results["created"]).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(results_dir, f"bench_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def latest_results(results_dir=RESULTS_DIR, exclude=None):
+    """
+    Stien til det nyeste lagrede resultatet, eller None.
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(results_dir, "bench_*.json")) if p != exclude)
+    return paths[-1] if paths else None
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare_results(baseline, current, tolerance=TOLERANCE):
+    """
+    Sammenligner den raskeste tiden per (test, størrelse) med et tidligere resultat.
+    Returnerer en DataFrame med forholdet ny/gammel og om det er en regresjon.
+    """
+    old = {(c["name"], c["scale"]): c for c in baseline["cases"]}
+    rows = []
+    for case in current["cases"]:
+        before = old.get((case["name"], case["scale"]))
+        if before is None:
+            continue # Ny test eller størrelse, ingenting å sammenligne med
+        ratio = case["seconds_min"] / before["seconds_min"] if before["seconds_min"] > 0 else np.nan
+        rows.append({
+            "name": case["name"],
+            "scale": case["scale"],
+            "before_s": before["seconds_min"],
+            "after_s": case["seconds_min"],
+            "ratio": ratio,
+            "regression": bool(ratio > 1 + tolerance and case["seconds_min"] - before["seconds_min"] > MIN_DELTA),
+        })
+    return pd.DataFrame(rows, columns=["name", "scale", "before_s", "after_s", "ratio", "regression"])
+
+def compare_parallel(results, tolerance=TOLERANCE, min_rows=PARALLEL_MIN_ROWS):
+    """
+    Sammenligner process_weather_data_parallel med process_weather_data per størrelse med minst min_rows rader.
+    Returnerer en DataFrame med forholdet parallell/seriell og om den parallelle er tregere enn toleransen.
+    """
+    serial = {c["scale"]: c for c in results["cases"] if c["name"] == "process_weather_data"}
+    rows = []
+    for case in results["cases"]:
+        before = serial.get(case["scale"])
+        if case["name"] != "process_weather_data_parallel" or before is None or case["rows"] < min_rows:
+            continue
+        ratio = case["seconds_min"] / before["seconds_min"] if before["seconds_min"] > 0 else np.nan
+        rows.append({
+            "scale": case["scale"],
+            "workers": case.get("workers"),
+            "serial_s": before["seconds_min"],
+            "parallel_s": case["seconds_min"],
+            "ratio": ratio,
+            "slower": bool(ratio > 1 + tolerance and case["seconds_min"] - before["seconds_min"] > MIN_DELTA),
+        })
+    return pd.DataFrame(rows, columns=["scale", "workers", "serial_s", "parallel_s", "ratio", "slower"])
+
+def print_results(results):
+    for case in results["cases"]:
+        rate = case["rows"] / case["seconds_min"] if case["seconds_min"] > 0 else 0.0
+        print(f"  {case['name']:<29} {case['scale']:<7} {case['rows']:>9} rader  "
+              f"min {case['seconds_min']:8.3f} s  median {case['seconds_median']:8.3f} s  ({rate:,.0f} rader/s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ytelsestester på syntetiske Frost-data")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="Resultatfil å sammenligne med (standard er forrige kjøring)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true", help="Ikke lagre resultatet")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.repeat)
+    print_results(results)
+    path = None
+    if not args.no_save:
+        path = save_results(results, args.results_dir)
+        print(f"Lagret {path}")
+
+    parallel = compare_parallel(results, args.tolerance)
+    for row in parallel.itertuples():
+        flag = "  TREGERE ENN SERIELL" if row.slower else ""
+        print(f"  parallell {row.scale:<7} {row.workers} prosesser: {row.serial_s:8.3f} s -> {row.parallel_s:8.3f} s  ({row.ratio:.2f}x){flag}")
+    slower = bool(parallel["slower"].any())
+
+    baseline_path = args.baseline or latest_results(args.results_dir, exclude=path)
+    if baseline_path is None:
+        print("Ingen tidligere resultater å sammenligne med")
+        return 1 if slower else 0
+    comparison = compare_results(load_results(baseline_path), results, args.tolerance)
+    print(f"Sammenlignet med {baseline_path}:")
+    for row in comparison.itertuples():
+        flag = "  REGRESJON" if row.regression else ""
+        print(f"  {row.name:<29} {row.scale:<7} {row.before_s:8.3f} s -> {row.after_s:8.3f} s  ({row.ratio:.2f}x){flag}")
+    return 1 if slower or comparison["regression"].any() else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
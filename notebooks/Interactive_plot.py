@@ -6,28 +6,35 @@ src_path = os.path.abspath(os.path.join(os.getcwd(), "src"))
 sys.path.append(src_path)
 
 from heatmap_utils import (
-    load_data, filter_data, interpolate_data,
-    make_map, plot_legend
+    get_heatmap_dataset, clear_heatmap_cache,
+    make_map, make_bitmap_map, plot_legend
 )
+from interpolation_cube import get_interpolation_cube, clear_cube_cache
+from interpolation import ENGINES
+from heatmap_export import cube_frames, export_animation
 
 # Sti til datamappe
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'Jan_2025'))
 OUTFILE = "weather_map.html"
+ANIMATION_OUTFILE = "weather_animation.html"
 
 st.title("🌦️ Nedbør i januar 2025 – Interpolert heatmap")
 
-# 1. Last inn data
-_df = load_data(DATA_DIR)
+# 1. Last inn data. Datasettet deles mellom reruns og lastes bare på nytt når CSV-filene endres
+if st.sidebar.button("🔄 Last data på nytt"):
+    clear_heatmap_cache(DATA_DIR)
+    clear_cube_cache(DATA_DIR)
+dataset = get_heatmap_dataset(DATA_DIR)
 
 # 2. Velg datatype (f.eks. precipitation, temperature)
-available_types = sorted(_df['datatype'].unique())
+available_types = dataset.datatypes
 datatype = st.selectbox("Velg værtype", available_types)
 
 # 3. Finn maksimal verdi for valgt datatype (for skalering)
-max_monthly_value = _df[_df['datatype'] == datatype]["value"].max()
+max_monthly_value = dataset.max_value(datatype)
 
 # 4. Velg dato (bruk piltaster i Streamlit)
-dates = sorted(_df['referenceTimestamp'].unique())
+dates = dataset.dates
 selected_index = st.number_input("Bla gjennom dager", min_value=0, max_value=len(dates)-1, value=0, step=1)
 selected_date = dates[selected_index]
 st.write(f"📅 Valgt dato: {selected_date}")
@@ -37,12 +44,22 @@ radius    = 80
 intensity = 0.7
 threshold = 0.05
 
-# 6. Filtrer og interpoler data
-filtered_df = filter_data(_df, datatype, selected_date, max_monthly_value)
-interp_df = interpolate_data(filtered_df)
+# 6. Filtrer data, og hent den interpolerte dagen fra kuben (alle dager interpoleres én gang)
+engine = st.sidebar.selectbox("Interpolasjon", list(ENGINES), index=list(ENGINES).index("cubic"))
+filtered_df = dataset.filter(datatype, selected_date, max_monthly_value)
+cube = get_interpolation_cube(DATA_DIR, datatype, dataset, engine=engine)
+interp_df = cube.frame(selected_date, max_monthly_value)
 
-# 7. Lag kart og vis
-deck = make_map(interp_df, radius, intensity, threshold)
+# 7. Lag kart og vis. Som bilde sendes rutenettet som én PNG i stedet for ett punkt per gridpunkt
+render = st.sidebar.radio("Visning", ["Heatmap", "Bilde (PNG)"])
+if render == "Heatmap":
+    deck = make_map(interp_df, radius, intensity, threshold)
+else:
+    grid = cube.grid(selected_date)
+    deck = None
+    if grid is not None and not filtered_df.empty:
+        grid_lon, grid_lat = cube.axes(selected_date)
+        deck = make_bitmap_map(grid, grid_lon, grid_lat, filtered_df["value"].min(), max_monthly_value)
 if deck:
     st.pydeck_chart(deck)
 
@@ -65,3 +82,11 @@ with st.expander("📊 Rådata og statistikk"):
 if deck and st.button("💾 Eksporter heatmap til HTML"):
     deck.to_html(OUTFILE, open_browser=False)
     st.success(f"Heatmap lagret som {OUTFILE}")
+
+# 11. Eksport av flere dager som ett animert kart, med én byte per gridpunkt og dag
+first, last = st.select_slider("Dager i animasjonen", options=dates, value=(dates[0], dates[-1]))
+if st.button("🎞️ Eksporter animasjon til HTML"):
+    export_dates, frames, grid_lon, grid_lat = cube_frames(cube, dates[dates.index(first):dates.index(last) + 1])
+    size = export_animation(ANIMATION_OUTFILE, export_dates, frames, grid_lon, grid_lat,
+                            0.0, max_monthly_value, title=f"{datatype} {first} – {last}")
+    st.success(f"{len(export_dates)} dager lagret som {ANIMATION_OUTFILE} ({size / 1024:.0f} kB)")
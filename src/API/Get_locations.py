@@ -1,7 +1,45 @@
-import requests
+import os
+import sys
+import numpy as np
 import pandas as pd
 
-def fetch_all_stations(client_id, save=False, csv_filename="buskerud_stasjoner.csv", polygon = "POLYGON((8.2 59.3, 10.3 59.3, 10.3 61.3, 8.2 61.3, 8.2 59.3))"):
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from frost_client import FrostClient, FROST_BASE_URL
+from response_cache import ResponseCache
+
+STATION_REGISTRY_PATH = os.path.join("data", "Verstasjoner", "stations.csv")
+
+def parse_stations(data):
+    """
+    Trekker ut navn, id og koordinater fra data-listen i et svar fra sources-endepunktet.
+    Stasjoner uten navn, id eller gyldige koordinater hoppes over.
+    """
+    rows = []
+    for entry in data:
+        name = entry.get("name")
+        source_id = entry.get("id")
+        coords = entry.get("geometry", {}).get("coordinates")
+        
+        if name and source_id and coords and len(coords) == 2:
+            lon, lat = coords
+            rows.append({
+                "station_name": name,
+                "source_id": source_id,
+                "lon": lon,
+                "lat": lat
+            })
+    return rows
+
+def _get_sources(client_id, client, url, params):
+    """
+    Én forespørsel mot sources-endepunktet. Uten client lages en klient som lukkes etterpå.
+    """
+    if client is not None:
+        return client.get(url, params)
+    with FrostClient(client_id) as client:
+        return client.get(url, params)
+
+def fetch_all_stations(client_id, save=False, csv_filename="buskerud_stasjoner.csv", polygon = "POLYGON((8.2 59.3, 10.3 59.3, 10.3 61.3, 8.2 61.3, 8.2 59.3))", client=None, endpoint=None):
     """
     Henter værstasjoner, med buskerud som standard instilling.
     Args:
@@ -9,42 +47,28 @@ def fetch_all_stations(client_id, save=False, csv_filename="buskerud_stasjoner.c
         save (bool): Om data skal lagres som CSV.
         csv_filename (str): Filnavn for CSV-filen.
         polygon (str): Geometri i WKT-format for å spesifisere området.
+        client (FrostClient): Valgfri delt klient, f.eks. med ResponseCache. Uten client lages en som lukkes etterpå.
+        endpoint (str): Overstyrer sources-endepunktet, f.eks. for en lokal frost_stub_server.
     Returnerer en dict: { navn: [source_id, [lon, lat]] }
     Lagrer også en CSV med kolonnene: station_name, source_id, lon, lat
     """
-    url = "https://frost.met.no/sources/v0.jsonld"
-    
+    url = endpoint or f"{FROST_BASE_URL}/sources/v0.jsonld"
     
     params = {
         "geometry": polygon,
         "types": "SensorSystem"
     }
 
-    response = requests.get(url, params=params, auth=(client_id, ""))
+    response = _get_sources(client_id, client, url, params)
     
     if response.status_code != 200:
         print(f"⚠️  Feil ved henting av stasjoner: {response.status_code}")
         print(response.text)
         return {}
 
-    data = response.json().get("data", [])
-    rows = []
-    station_dict = {}
+    rows = parse_stations(response.json().get("data", []))
+    station_dict = {row["station_name"]: [row["source_id"], [row["lon"], row["lat"]]] for row in rows}
 
-    for entry in data:
-        name = entry.get("name")
-        source_id = entry.get("id")
-        coords = entry.get("geometry", {}).get("coordinates")
-        
-        if name and source_id and coords and len(coords) == 2:
-            lon, lat = coords
-            station_dict[name] = [source_id, coords]
-            rows.append({
-                "station_name": name,
-                "source_id": source_id,
-                "lon": lon,
-                "lat": lat
-            })
     if save:
         # Lag DataFrame og lagre som CSV
         df = pd.DataFrame(rows)
@@ -55,8 +79,7 @@ def fetch_all_stations(client_id, save=False, csv_filename="buskerud_stasjoner.c
 
     return station_dict
 
-if __name__ == "__main__":
-    counties = {
+COUNTIES = {
   "Viken": {
     "type": "Polygon",
     "coordinates": [
@@ -190,8 +213,78 @@ if __name__ == "__main__":
     ]
   }
 }
-for county, data in counties.items():
-    print(f"Fetching stations for {county}")
-    polygon = data["coordinates"][0]
-    polygon_str = "POLYGON((" + ", ".join([f"{lon} {lat}" for lon, lat in polygon]) + "))"
-    fetch_all_stations("5b9e3b06-3d3d-4049-9b86-b52c0e8cfb81", save=True, csv_filename=f"{county}_stations.csv", polygon=polygon_str)
\ No newline at end of file
+
+def fetch_national_stations(client_id, client=None, endpoint=None):
+    """
+    Henter alle norske værstasjoner i én forespørsel i stedet for én per fylke.
+    endpoint overstyrer sources-endepunktet, som i fetch_all_stations.
+    Returnerer en DataFrame med kolonnene: station_name, source_id, lon, lat
+    """
+    url = endpoint or f"{FROST_BASE_URL}/sources/v0.jsonld"
+    params = {
+        "country": "NO",
+        "types": "SensorSystem"
+    }
+
+    response = _get_sources(client_id, client, url, params)
+    if response.status_code != 200:
+        print(f"⚠️  Feil ved henting av stasjoner: {response.status_code}")
+        print(response.text)
+        return pd.DataFrame(columns=["station_name", "source_id", "lon", "lat"])
+
+    return pd.DataFrame(parse_stations(response.json().get("data", [])), columns=["station_name", "source_id", "lon", "lat"])
+
+def points_in_polygon(lon, lat, ring):
+    """
+    Vektorisert punkt-i-polygon (even-odd-regelen) for alle punkter mot én polygonring.
+    lon og lat er arrays med samme lengde, ring er en liste med [lon, lat]-hjørner.
+    """
+    ring = np.asarray(ring, dtype=float)
+    x1, y1 = ring[:-1, 0], ring[:-1, 1] # Kanter som (x1, y1) -> (x2, y2)
+    x2, y2 = ring[1:, 0], ring[1:, 1]
+    px = np.asarray(lon, dtype=float)[:, None] # Punkter langs første akse, kanter langs andre
+    py = np.asarray(lat, dtype=float)[:, None]
+
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    return (crosses & (px < x_cross)).sum(axis=1) % 2 == 1
+
+def assign_counties(stations_df, counties=COUNTIES):
+    """
+    Legger til kolonnen 'county' ved å teste alle stasjoner mot alle fylkespolygoner.
+    Stasjoner utenfor alle polygoner får NaN. Ved overlapp vinner første fylke i counties.
+    """
+    county = pd.Series(np.nan, index=stations_df.index, dtype=object)
+    for name, geometry in counties.items():
+        inside = points_in_polygon(stations_df["lon"].values, stations_df["lat"].values, geometry["coordinates"][0])
+        county = county.where(~(inside & county.isna().values), name)
+    return stations_df.assign(county=county)
+
+def build_station_registry(stations_df, counties=COUNTIES):
+    """
+    Lager ett samlet stasjonsregister indeksert på source_id, med fylke for hver stasjon.
+    Bare stasjoner som ligger i et av fylkene tas med.
+    """
+    registry = assign_counties(stations_df, counties).dropna(subset=["county"])
+    registry = registry.drop_duplicates(subset=["source_id"]).set_index("source_id")
+    return registry[["station_name", "lon", "lat", "county"]]
+
+def save_station_registry(registry, path=STATION_REGISTRY_PATH):
+    registry.to_csv(path, index=True, encoding="utf-8")
+    print(f"Stasjonsregister lagret som CSV: {path} ({len(registry)} stasjoner)")
+
+def load_station_registry(path=STATION_REGISTRY_PATH):
+    """
+    Leser stasjonsregisteret med source_id som indeks, slik at
+    registry.loc[source_id, 'county'] er et oppslag i en hashtabell.
+    """
+    return pd.read_csv(path, dtype={"source_id": str}).set_index("source_id")
+
+if __name__ == "__main__":
+    print("Henter alle stasjoner i Norge")
+    with FrostClient("5b9e3b06-3d3d-4049-9b86-b52c0e8cfb81", cache=ResponseCache()) as client: # Stasjonslister caches i en uke
+        stations = fetch_national_stations("5b9e3b06-3d3d-4049-9b86-b52c0e8cfb81", client=client)
+    registry = build_station_registry(stations)
+    print(registry["county"].value_counts())
+    save_station_registry(registry)
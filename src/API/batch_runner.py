@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from datetime import datetime
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frost_client import FrostClient, FROST_BASE_URL
+from response_cache import ResponseCache
+from Get_locations import load_station_registry, STATION_REGISTRY_PATH
+from weather_oslo_met import FrostDataFetcher
+from storage import PartitionedStore
+from instrumentation import StageProfiler
+
+"""
+Batch-kjøring av henting uten interaksjon, slik at den kan kjøres fra cron eller en container.
+En jobbfil (manifest) beskriver regioner × elementer × tidsperioder. Hver kombinasjon blir
+én jobb, og jobbene fordeles på en pool av arbeidere som deler én FrostClient.
+Mens én jobb prosesserer og lagrer, kan de andre hente data.
+Med process_workers > 1 deler alle jobbene én prosesspool til prosesseringen, slik at
+den skalerer med antall kjerner i stedet for å være bundet av én tråd.
+
+Eksempel på manifest:
+{
+    "client_id": "...",
+    "regions": ["Oslo", "Agder"],                  # eller "all" for alle fylker i registeret
+    "elements": ["sum(precipitation_amount P1D)"],
+    "time_ranges": ["2025-01-01/2025-02-01"],
+    "output_pattern": "Jan_2025/{element}_{region}.csv",
+    "output_format": "csv",                        # eller "store" for kolonnelageret i store_path
+    "max_workers": 4,
+    "process_workers": 1,
+    "chunked": false,
+    "incremental": false,
+    "streaming": false,                            # les store svar i biter, se json_stream.py
+    "cache": true,
+    "profile_path": "data/profile.jsonl",          # valgfritt, tid/rader per steg som JSON Lines, minne bare med max_workers 1
+    "base_url": "https://frost.met.no"             # valgfritt, f.eks. http://127.0.0.1:8080 for frost_stub_server
+}
+
+Kjøres med: python src/API/batch_runner.py src/API/manifests/jan_2025.json
+Returkode: 0 når alle jobber lykkes, 1 når minst én feiler, 2 ved ugyldig manifest,
+3 når kjøringen ikke kan starte av andre grunner, f.eks. et manglende stasjonsregister.
+"""
+
+EXIT_OK = 0
+EXIT_JOB_FAILED = 1
+EXIT_BAD_MANIFEST = 2
+EXIT_ERROR = 3
+
+REQUIRED_KEYS = ("client_id", "regions", "elements", "time_ranges")
+DEFAULTS = {
+    "output_pattern": "{region}/{element}_{start}_{end}.csv",
+    "max_workers": 4,
+    "process_workers": 1,
+    "max_connections": 4,
+    "rate_limit": 5.0,
+    "chunked": False,
+    "incremental": False,
+    "streaming": False,
+    "cache": True,
+    "registry_path": STATION_REGISTRY_PATH,
+    "output_format": "csv",
+    "store_path": os.path.join("data", "store"),
+    "profile_path": None,
+    "base_url": FROST_BASE_URL,
+}
+OUTPUT_FORMATS = ("csv", "store")
+PATTERN_FIELDS = ("region", "element", "start", "end")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def load_manifest(path):
+    """
+    Leser og validerer en jobbfil. Manglende valgfrie felt får standardverdier.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ManifestError(f"Kunne ikke lese manifest {path}: {e}")
+    return validate_manifest(manifest)
+
+def validate_manifest(manifest):
+    missing = [key for key in REQUIRED_KEYS if key not in manifest]
+    if missing:
+        raise ManifestError(f"Manifest mangler felt: {', '.join(missing)}")
+    for key in ("elements", "time_ranges"):
+        if not isinstance(manifest[key], list) or not manifest[key]:
+            raise ManifestError(f"'{key}' må være en ikke-tom liste")
+    if manifest["regions"] != "all" and (not isinstance(manifest["regions"], list) or not manifest["regions"]):
+        raise ManifestError("'regions' må være en ikke-tom liste eller \"all\"")
+    if manifest.get("output_format", DEFAULTS["output_format"]) not in OUTPUT_FORMATS:
+        raise ManifestError(f"'output_format' må være en av: {', '.join(OUTPUT_FORMATS)}")
+    for ref_time in manifest["time_ranges"]:
+        validate_time_range(ref_time)
+    validate_output_pattern(manifest.get("output_pattern", DEFAULTS["output_pattern"]))
+    return dict(DEFAULTS, **manifest)
+
+def validate_time_range(ref_time):
+    """
+    En tidsperiode må være "start/slutt" med to ISO-datoer, f.eks. "2025-01-01/2025-02-01".
+    """
+    parts = ref_time.split("/") if isinstance(ref_time, str) else []
+    if len(parts) != 2:
+        raise ManifestError(f"Ugyldig tidsperiode {ref_time!r}: forventet \"start/slutt\"")
+    for part in parts:
+        try:
+            datetime.fromisoformat(part.replace("Z", "+00:00"))
+        except ValueError:
+            raise ManifestError(f"Ugyldig tidsperiode {ref_time!r}: {part!r} er ikke en ISO-dato")
+
+def validate_output_pattern(pattern):
+    """
+    output_pattern kan bare bruke feltene i PATTERN_FIELDS, f.eks. "{region}/{element}_{start}_{end}.csv".
+    """
+    if not isinstance(pattern, str):
+        raise ManifestError("'output_pattern' må være en tekst")
+    try:
+        pattern.format(**{field: field for field in PATTERN_FIELDS})
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise ManifestError(f"Ugyldig output_pattern {pattern!r} ({e}). Tillatte felt: {', '.join(PATTERN_FIELDS)}")
+
+def expand_jobs(manifest, registry):
+    """
+    Lager én jobb per (region, element, tidsperiode).
+    Returnerer en liste med dicts som beskriver hver jobb.
+    """
+    regions = sorted(registry["county"].unique()) if manifest["regions"] == "all" else manifest["regions"]
+    unknown = [region for region in regions if region not in set(registry["county"])]
+    if unknown:
+        raise ManifestError(f"Ukjente regioner: {', '.join(unknown)}")
+
+    jobs = []
+    for region, element, ref_time in itertools.product(regions, manifest["elements"], manifest["time_ranges"]):
+        start, end = ref_time.split("/")
+        source_id = ",".join(registry.index[registry["county"] == region].astype(str))
+        jobs.append({
+            "name": f"{region} | {element} | {ref_time}",
+            "region": region,
+            "element": element,
+            "ref_time": ref_time,
+            "source_id": source_id,
+            "output_filename": manifest["output_pattern"].format(region=region, element=element, start=start, end=end),
+        })
+    return jobs
+
+def run_batch(manifest, client=None):
+    """
+    Kjører alle jobbene i manifestet over en pool av arbeidere.
+    Skriver fremdrift per jobb og en oppsummering, og returnerer (returkode, resultater).
+    Uten client lages en klient fra manifestet, som lukkes når jobbene er ferdige.
+    """
+    registry_path = os.path.join(os.getcwd(), manifest["registry_path"])
+    registry = load_station_registry(registry_path)
+    jobs = expand_jobs(manifest, registry)
+
+    # Prosesspoolen startes med spawn, siden arbeidertrådene ellers ville forket en flertrådet prosess
+    process_pool = None
+    if manifest["process_workers"] > 1:
+        process_pool = ProcessPoolExecutor(max_workers=manifest["process_workers"], mp_context=multiprocessing.get_context("spawn"))
+
+    store = None
+    if manifest["output_format"] == "store":
+        store = PartitionedStore(os.path.join(os.getcwd(), manifest["store_path"]))
+
+    owns_client = client is None
+    if owns_client:
+        cache = ResponseCache() if manifest["cache"] else None
+        client = FrostClient(manifest["client_id"], max_connections=manifest["max_connections"],
+                             rate_limit=manifest["rate_limit"], cache=cache)
+
+    print(f"Starter {len(jobs)} jobber med {manifest['max_workers']} arbeidere")
+    lock = threading.Lock()
+    done = [0]
+    batch_start = time.perf_counter()
+
+    def run_job(job):
+        profiler = None
+        if manifest["profile_path"]:
+            # tracemalloc har én minnetopp for hele prosessen, så minne måles bare når jobbene kjører én og én
+            profiler = StageProfiler(job["name"], track_memory=manifest["max_workers"] == 1,
+                                     jsonl_path=os.path.join(os.getcwd(), manifest["profile_path"]))
+        fetcher = FrostDataFetcher(
+            manifest["client_id"], job["source_id"], job["element"], job["ref_time"],
+            output_filename=job["output_filename"],
+            stationsdata_path=registry_path,
+            client=client,
+            process_pool=process_pool,
+            store=store,
+            region=job["region"],
+            profiler=profiler,
+            endpoint=f"{manifest['base_url'].rstrip('/')}/observations/v0.jsonld",
+        )
+        start = time.perf_counter()
+        try:
+            ok = fetcher.run(chunked=manifest["chunked"], incremental=manifest["incremental"], streaming=manifest["streaming"])
+            error = None if ok else "ingen data eller feil ved behandling"
+        except Exception as e: # En feilende jobb skal ikke stoppe de andre
+            ok, error = False, str(e)
+        seconds = time.perf_counter() - start
+        result = dict(job, ok=ok, error=error, seconds=seconds, observations=fetcher.n_observations)
+
+        with lock:
+            done[0] += 1
+            rate = fetcher.n_observations / seconds if seconds > 0 else 0.0
+            status = "OK " if ok else "FEIL"
+            print(f"[{done[0]}/{len(jobs)}] {status} {job['name']}: {fetcher.n_observations} obs på {seconds:.1f} s ({rate:.0f} obs/s)"
+                  + (f" - {error}" if error else ""))
+        return result
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=manifest["max_workers"]) as executor:
+            futures = [executor.submit(run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        if process_pool is not None:
+            process_pool.shutdown()
+        if owns_client:
+            client.close()
+
+    elapsed = time.perf_counter() - batch_start
+    failed = [r for r in results if not r["ok"]]
+    total_obs = sum(r["observations"] for r in results)
+    print(f"Ferdig: {len(results) - len(failed)} av {len(results)} jobber vellykket, "
+          f"{total_obs} observasjoner på {elapsed:.1f} s ({total_obs / elapsed if elapsed > 0 else 0:.0f} obs/s)")
+    for r in failed:
+        print(f"  Feilet: {r['name']} ({r['error']})")
+    return (EXIT_JOB_FAILED if failed else EXIT_OK), results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kjør henting fra Frost for alle jobber i et manifest.")
+    parser.add_argument("manifest", help="Sti til jobbfil (JSON)")
+    parser.add_argument("--workers", type=int, help="Overstyr max_workers fra manifestet")
+    parser.add_argument("--process-workers", type=int, help="Overstyr process_workers fra manifestet")
+    parser.add_argument("--dry-run", action="store_true", help="List jobbene uten å kjøre dem")
+    parser.add_argument("--profile", help="Skriv tid, rader og minne per steg til denne JSON Lines-filen")
+    parser.add_argument("--base-url", help="Overstyr base_url, f.eks. for å lastteste mot frost_stub_server")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = load_manifest(args.manifest)
+        if args.workers:
+            manifest["max_workers"] = args.workers
+        if args.process_workers:
+            manifest["process_workers"] = args.process_workers
+        if args.profile:
+            manifest["profile_path"] = args.profile
+        if args.base_url:
+            manifest["base_url"] = args.base_url
+        if args.dry_run:
+            registry = load_station_registry(os.path.join(os.getcwd(), manifest["registry_path"]))
+            for job in expand_jobs(manifest, registry):
+                target = manifest["store_path"] if manifest["output_format"] == "store" else os.path.join("data", job["output_filename"])
+                print(f"{job['name']} -> {target}")
+            return EXIT_OK
+        exit_code, _ = run_batch(manifest)
+    except ManifestError as e:
+        print(f"Ugyldig manifest: {e}")
+        return EXIT_BAD_MANIFEST
+    except OSError as e: # Manifestet er gyldig, men f.eks. stasjonsregisteret mangler
+        print(f"Kunne ikke starte kjøringen: {e}")
+        return EXIT_ERROR
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
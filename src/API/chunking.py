@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import gzip
+import hashlib
+import shutil
+import pandas as pd
+import isodate
+
+"""
+Deler store Frost-forespørsler opp i mindre vinduer.
+Frost har et tak på antall observasjoner per respons, og en forespørsel på ti år
+for hundre stasjoner blir enten avkortet eller feiler i sin helhet.
+Her deles referencetime opp i tidsvinduer og sources i grupper av stasjoner,
+og hvert ferdige vindu lagres som checkpoint på disk slik at en avbrutt jobb
+kan fortsette der den slapp.
+"""
+
+MAX_OBSERVATIONS = 100000 # Frost returnerer maks 100 000 observasjoner per respons
+MAX_SOURCES = 50 # Maks antall stasjoner per forespørsel
+# Et element kan ha flere timeOffsets og sensorer per stasjon og døgn, som estimate_obs_per_day ikke ser.
+# Vinduene planlegges derfor for en brøkdel av taket, og vinduer som likevel avkortes deles på nytt
+SAFETY_FACTOR = 4
+
+def split_sources(source_id, max_sources=MAX_SOURCES):
+    """
+    Deler en kommaseparert liste med stasjoner i grupper på maks max_sources.
+    """
+    sources = [s.strip() for s in source_id.split(",") if s.strip()]
+    return [",".join(sources[i:i + max_sources]) for i in range(0, len(sources), max_sources)]
+
+def split_reference_time(ref_time, window_days):
+    """
+    Deler et intervall på formen 'start/slutt' i vinduer på window_days dager.
+    Slutt er eksklusiv, slik Frost tolker referencetime. Andre former Frost godtar,
+    som én dato, 'latest' eller gjentatte intervaller, blir ett vindu uendret.
+    """
+    interval = _parse_interval(ref_time)
+    if interval is None:
+        return [ref_time]
+    start, end = interval
+    windows = []
+    current = start
+    while current < end:
+        window_end = min(current + pd.Timedelta(days=window_days), end)
+        windows.append(f"{format_reference_time(current)}/{format_reference_time(window_end)}")
+        current = window_end
+    return windows
+
+def _parse_interval(ref_time):
+    """
+    (start, slutt) for en referencetime på formen 'start/slutt', ellers None.
+    """
+    parts = ref_time.split("/")
+    if len(parts) != 2:
+        return None
+    try:
+        return pd.Timestamp(parts[0]), pd.Timestamp(parts[1])
+    except ValueError:
+        return None
+
+def format_reference_time(timestamp):
+    """
+    Formaterer et tidspunkt slik Frost forventer det i referencetime.
+    """
+    if timestamp == timestamp.normalize():
+        return timestamp.strftime("%Y-%m-%d")
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S")
+
+def estimate_obs_per_day(elements):
+    """
+    Anslår antall observasjoner per stasjon og døgn ut fra perioden i elementnavnet,
+    f.eks. 'sum(precipitation_amount P1D)' gir 1 og 'mean(air_temperature PT1H)' gir 24.
+    Elementer uten periode antas å være timesverdier. Flere timeOffsets eller sensorer
+    per element telles ikke, se SAFETY_FACTOR.
+    """
+    total = 0
+    for element in elements.split(","):
+        match = re.search(r"\b(P(?:\d+[YMWD])*(?:T[\dHMS.]+)?)\)", element)
+        try:
+            seconds = isodate.parse_duration(match.group(1)).total_seconds() if match else 3600
+        except (isodate.ISO8601Error, AttributeError):
+            seconds = 3600
+        total += max(1.0, 86400 / seconds) if seconds else 24
+    return total
+
+def plan_windows(source_id, elements, ref_time, max_observations=MAX_OBSERVATIONS, max_sources=MAX_SOURCES, safety_factor=SAFETY_FACTOR):
+    """
+    Lager en liste med (sources, referencetime) slik at hvert vindu anslås å holde seg
+    under max_observations, med safety_factor ganger så mange observasjoner per døgn
+    som estimate_obs_per_day. Vinduene er ordnet slik at de kan hentes uavhengig.
+    """
+    obs_per_day = estimate_obs_per_day(elements) * safety_factor
+    windows = []
+    for sources in split_sources(source_id, max_sources):
+        n_sources = len(sources.split(","))
+        window_days = max(1, int(max_observations // (n_sources * obs_per_day)))
+        for window in split_reference_time(ref_time, window_days):
+            windows.append((sources, window))
+    return windows
+
+
+def is_truncated(body, max_observations=MAX_OBSERVATIONS):
+    """
+    Om et svar fra observations-endepunktet er avkortet: Frost melder flere elementer i
+    totalItemCount enn i currentItemCount, eller svaret har like mange observasjoner som taket.
+    """
+    data = body.get("data", [])
+    if body.get("totalItemCount", len(data)) > body.get("currentItemCount", len(data)):
+        return True
+    return sum(len(item.get("observations", [])) for item in data) >= max_observations
+
+def split_window(sources, ref_time):
+    """
+    Deler et vindu i to: tidsrommet på midten i hele dager når det er mer enn ett døgn,
+    ellers stasjonene, og til slutt døgnet i timer. Uten intervall deles bare stasjonene.
+    Returnerer None når vinduet ikke kan deles mer.
+    """
+    interval = _parse_interval(ref_time)
+    parts = sources.split(",")
+    if interval is None: # Ikke et intervall, så bare stasjonene kan deles
+        start = end = None
+    else:
+        start, end = interval
+    if interval is not None and end - start > pd.Timedelta(days=1):
+        middle = start + pd.Timedelta(days=(end - start).days // 2)
+    elif len(parts) > 1:
+        half = len(parts) // 2
+        return [(",".join(parts[:half]), ref_time), (",".join(parts[half:]), ref_time)]
+    elif interval is not None and end - start > pd.Timedelta(hours=1):
+        middle = (start + (end - start) / 2).floor("h")
+    else:
+        return None
+    if not start < middle < end:
+        return None
+    return [(sources, f"{format_reference_time(start)}/{format_reference_time(middle)}"),
+            (sources, f"{format_reference_time(middle)}/{format_reference_time(end)}")]
+
+
+class Checkpoint:
+    """
+    Lagrer ferdige vinduer som komprimert JSON i en egen mappe per jobb.
+    Filer skrives først til en midlertidig fil og flyttes på plass,
+    slik at et krasj midt i skrivingen aldri etterlater et halvferdig vindu.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def job_key(*parts):
+        return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def has(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key):
+        with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, key, data):
+        tmp_path = self._path(key) + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path(key))
+
+    def completed(self):
+        return sorted(f[:-len(".json.gz")] for f in os.listdir(self.directory) if f.endswith(".json.gz"))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+"""
+Felles HTTP-klient for frost.met.no.
+Alle forespørsler går gjennom én requests.Session med tilkoblingspool, slik at
+TCP/TLS-tilkoblinger gjenbrukes mellom jobber og tråder.
+Klienten begrenser antall samtidige forespørsler, deler en rate limiter mellom
+alle tråder og prøver på nytt med eksponentiell backoff ved 429, 5xx og svar som brytes av.
+Med en ResponseCache hentes vellykkede svar fra disk i stedet for nettverket.
+"""
+
+FROST_BASE_URL = "https://frost.met.no"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token bucket som begrenser antall forespørsler per sekund på tvers av tråder.
+    pause() brukes når serveren svarer 429, slik at alle tråder venter samtidig.
+    """
+    def __init__(self, rate=10.0, burst=None):
+        self.rate = rate # Forespørsler per sekund, None eller 0 betyr ingen begrensning
+        self.capacity = burst if burst is not None else max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif not self.rate:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class FrostClient:
+    """
+    Tråd-sikker klient som deles mellom alle FrostDataFetcher-objekter i en kjøring.
+    Args:
+        client_id (str): Klient-ID for autentisering.
+        max_connections (int): Maks antall samtidige forespørsler (og størrelse på tilkoblingspoolen).
+        rate_limit (float): Maks antall forespørsler per sekund totalt.
+        max_retries (int): Antall nye forsøk ved 429, 5xx, nettverksfeil og avbrutte svar.
+        backoff_factor (float): Grunnlag i sekunder for eksponentiell backoff.
+        timeout (float): Timeout i sekunder per forespørsel.
+        cache (ResponseCache): Valgfri cache på disk for vellykkede svar.
+    """
+    def __init__(self, client_id, max_connections=8, rate_limit=10.0, max_retries=4, backoff_factor=0.5, timeout=60, cache=None):
+        self.client_id = client_id
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+
+        self.session = requests.Session()
+        self.session.auth = (client_id, '')
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt, retry_after=None):
+        """
+        Ventetid før neste forsøk. Retry-After fra serveren har forrang.
+        """
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        delay = self.backoff_factor * (2 ** attempt)
+        return delay + random.uniform(0, delay / 2) # Jitter så trådene ikke prøver igjen samtidig
+
+    def get(self, url, params=None):
+        """
+        Sender GET-forespørsel med rate limiting og nye forsøk.
+        Returnerer siste respons (også ved feilkode), eller kaster unntak ved vedvarende nettverksfeil.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                return cached
+
+        response = self._get_with_retry(url, params)
+        if self.cache is not None and response.status_code == 200:
+            self.cache.put(url, params, response.content)
+        return response
+
+    def get_streamed(self, url, params, consume):
+        """
+        Som get, men svaret leses i biter i stedet for å holdes i minnet som helhet.
+        consume(response) kalles mens tilkoblingen er åpen og leser med response.iter_content().
+        Brytes forbindelsen mens svaret leses, kalles consume på nytt med et nytt svar, så
+        consume må starte fra bunnen hver gang. Returnerer det consume returnerer.
+        Svar i cachen brukes, men nye svar lagres ikke der, siden det krever hele svaret i minnet.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                return consume(cached)
+        return self._get_with_retry(url, params, consume)
+
+    def _get_with_retry(self, url, params, consume=None):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                with self.semaphore:
+                    if consume is None:
+                        response = self.session.get(url, params=params, timeout=self.timeout)
+                    else:
+                        response = self.session.get(url, params=params, timeout=self.timeout, stream=True)
+                        if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                            with response: # Svaret leses mens tilkoblingen holdes
+                                return consume(response)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                # ChunkedEncodingError: forbindelsen ble brutt før hele svaret kom, så JSON-en er avkortet
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Nettverksfeil mot {url} ({e}), prøver igjen om {delay:.1f} s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            response.close()
+
+            delay = self._backoff(attempt, response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                self.rate_limiter.pause(delay) # Alle tråder venter når serveren ber oss roe ned
+            print(f"Statuskode {response.status_code} fra {url}, prøver igjen om {delay:.1f} s ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
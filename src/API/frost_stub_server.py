@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Get_locations import points_in_polygon
+from synthetic_frost import generate_observations, generate_stations
+
+"""
+Lokal stand-in for frost.met.no, slik at hentingen kan testes og lastestestes uten nettverk.
+Serveren svarer på /observations/v0.jsonld og /sources/v0.jsonld med innspilte eller
+syntetiske data, og filtrerer på sources, elements, referencetime og geometry som Frost.
+Feil kan legges inn med en viss sannsynlighet: forsinkelse, 429 med Retry-After, 5xx og
+svar som avbrytes midt i, slik at retry og rate limiting i FrostClient kan måles under stress.
+FrostDataFetcher, fetch_all_stations og batch_runner peker hit med endpoint/base_url.
+
+Kjøres med: python src/API/frost_stub_server.py --stations 100 --days 365 --port 8080 --error-rate 0.05
+"""
+
+OBSERVATIONS_PATH = "/observations/v0.jsonld"
+SOURCES_PATH = "/sources/v0.jsonld"
+
+
+def _station(source_id):
+    return str(source_id).split(":")[0]
+
+def _parse_polygon(wkt):
+    """
+    Ytre ring fra en WKT-POLYGON som [[lon, lat], ...].
+    """
+    body = wkt.strip()
+    if not body.upper().startswith("POLYGON"):
+        raise ValueError(f"Ugyldig geometry: {wkt}")
+    ring = body[body.index("((") + 2:body.index(")")]
+    return [[float(v) for v in point.split()] for point in ring.split(",")]
+
+def _parse_reference_time(value):
+    """
+    Tidsrom [start, slutt) fra 'start/slutt' eller ett tidspunkt, som UTC-tidsstempler.
+    """
+    parts = value.split("/")
+    start = pd.Timestamp(parts[0])
+    start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+    if len(parts) == 1:
+        return start, start + pd.Timedelta(1, "ns")
+    end = pd.Timestamp(parts[1])
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    return start, end
+
+
+class FrostStubData:
+    """
+    Data som serveren svarer med, indeksert per stasjon og sortert på referenceTime,
+    slik at et tidsrom for en stasjon er et binærsøk.
+    """
+    def __init__(self, observations, stations):
+        """
+        observations: liste som json_data['data'] fra observations-endepunktet.
+        stations: liste som json_data['data'] fra sources-endepunktet.
+        """
+        self.stations = stations
+        frame = pd.DataFrame({
+            "station": [_station(item["sourceId"]) for item in observations],
+            "time": pd.to_datetime([item["referenceTime"] for item in observations], utc=True).tz_localize(None),
+        })
+        order = np.lexsort((frame["time"].to_numpy(), frame["station"].to_numpy()))
+        self.items = {}
+        self.times = {}
+        for station, positions in frame.iloc[order].groupby("station", sort=False).indices.items():
+            rows = order[positions]
+            self.items[station] = [observations[i] for i in rows]
+            self.times[station] = frame["time"].to_numpy()[rows]
+        self.station_lon = np.array([s["geometry"]["coordinates"][0] for s in stations], dtype=float)
+        self.station_lat = np.array([s["geometry"]["coordinates"][1] for s in stations], dtype=float)
+
+    @classmethod
+    def synthetic(cls, n_stations=10, n_days=30, elements=("sum(precipitation_amount P1D)",), seed=0, **kwargs):
+        """
+        Syntetiske data fra synthetic_frost, med stasjoner spredt over Sør-Norge.
+        """
+        observations = generate_observations(n_stations=n_stations, n_days=n_days, elements=elements, seed=seed, **kwargs)
+        stations = [
+            {"id": row.source_id, "name": row.station_name, "country": "Norge", "countryCode": "NO",
+             "geometry": {"@type": "Point", "coordinates": [row.lon, row.lat]}}
+            for row in generate_stations(n_stations, seed=seed).itertuples()
+        ]
+        return cls(observations, stations)
+
+    @classmethod
+    def from_files(cls, observations_path, sources_path=None):
+        """
+        Innspilte svar fra Frost, lagret som JSON med en 'data'-liste.
+        """
+        with open(observations_path, encoding="utf-8") as f:
+            observations = json.load(f)["data"]
+        stations = []
+        if sources_path:
+            with open(sources_path, encoding="utf-8") as f:
+                stations = json.load(f)["data"]
+        return cls(observations, stations)
+
+    def observations(self, sources, elements=None, reference_time=None):
+        """
+        Observasjoner for stasjonene i sources, avgrenset til elements og tidsrommet.
+        """
+        if reference_time is not None:
+            start, end = (np.datetime64(t.tz_localize(None), "ns") for t in reference_time)
+        wanted = set(elements) if elements else None
+        result = []
+        for source in sources:
+            station = _station(source)
+            items = self.items.get(station, [])
+            if reference_time is not None:
+                times = self.times[station] if items else np.array([], dtype="datetime64[ns]")
+                items = items[np.searchsorted(times, start, "left"):np.searchsorted(times, end, "left")]
+            for item in items:
+                if wanted is None:
+                    result.append(item)
+                    continue
+                kept = [obs for obs in item["observations"] if obs["elementId"] in wanted]
+                if len(kept) == len(item["observations"]):
+                    result.append(item)
+                elif kept:
+                    result.append(dict(item, observations=kept))
+        return result
+
+    def sources(self, geometry=None, ids=None, country=None):
+        """
+        Stasjoner innenfor polygonet i geometry, med id i ids og/eller i landet country.
+        country sammenlignes med countryCode eller country i stasjonen, som hos Frost (NO eller Norge).
+        """
+        keep = np.ones(len(self.stations), dtype=bool)
+        if geometry:
+            keep &= points_in_polygon(self.station_lon, self.station_lat, _parse_polygon(geometry))
+        if ids:
+            wanted = {_station(i) for i in ids}
+            keep &= np.array([s["id"] in wanted for s in self.stations], dtype=bool)
+        if country:
+            wanted = country.lower()
+            keep &= np.array([wanted in (str(s.get("countryCode", "")).lower(), str(s.get("country", "")).lower())
+                              for s in self.stations], dtype=bool)
+        return [station for station, k in zip(self.stations, keep) if k]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Holder tilkoblingen åpen, som frost.met.no
+
+    def log_message(self, format, *args):
+        pass # Ingen logg per forespørsel, det blir for mye under lasttester
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        fault = stub.draw_fault()
+        if stub.latency or stub.latency_jitter:
+            time.sleep(stub.latency + random.uniform(0, stub.latency_jitter))
+
+        if fault == 429:
+            status, body = 429, {"error": {"code": 429, "message": "Too Many Requests", "reason": "Rate limit (stub)"}}
+        elif fault == 503:
+            status, body = 503, {"error": {"code": 503, "message": "Service Unavailable", "reason": "Feil lagt inn av stub"}}
+        elif url.path == OBSERVATIONS_PATH:
+            status, body = stub.observations_response(params)
+        elif url.path == SOURCES_PATH:
+            status, body = stub.sources_response(params)
+        else:
+            status, body = 404, {"error": {"code": 404, "message": "Not found", "reason": f"Ukjent sti {url.path}"}}
+
+        payload = json.dumps(body).encode("utf-8")
+        stub.record(status, fault, len(payload)) # Før svaret sendes, så stats() er oppdatert når klienten har svaret
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", str(stub.retry_after))
+        if fault == "truncate":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if fault == "truncate":
+            # Hele lengden er lovet, men forbindelsen lukkes halvveis som ved et brudd i nettverket
+            self.wfile.write(payload[:len(payload) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(payload)
+
+
+class FrostStubServer:
+    """
+    Kjører stand-in-serveren i en egen tråd.
+    Args:
+        data (FrostStubData): Data å svare med, standard er små syntetiske data.
+        host, port: Adresse. Port 0 velger en ledig port.
+        latency (float): Fast forsinkelse i sekunder per forespørsel.
+        latency_jitter (float): Tilfeldig ekstra forsinkelse, opptil så mange sekunder.
+        rate_limit_rate (float): Andel forespørsler som får 429 med Retry-After.
+        error_rate (float): Andel forespørsler som får 503.
+        truncate_rate (float): Andel svar som avbrytes halvveis.
+        retry_after (float): Verdien i Retry-After ved 429.
+        seed (int): Seed for hvilke forespørsler som får feil.
+    """
+    def __init__(self, data=None, host="127.0.0.1", port=0, latency=0.0, latency_jitter=0.0, rate_limit_rate=0.0,
+                 error_rate=0.0, truncate_rate=0.0, retry_after=1, seed=0):
+        self.data = data if data is not None else FrostStubData.synthetic()
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.bytes_sent = 0
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = None
+        self.started = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def draw_fault(self):
+        """
+        Trekker hvilken feil (om noen) neste forespørsel skal få.
+        """
+        with self.lock:
+            r = self.random.random()
+        if r < self.rate_limit_rate:
+            return 429
+        r -= self.rate_limit_rate
+        if r < self.error_rate:
+            return 503
+        r -= self.error_rate
+        if r < self.truncate_rate:
+            return "truncate"
+        return None
+
+    def record(self, status, fault, n_bytes):
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts[status] += 1
+            if fault == "truncate":
+                self.counts["truncated"] += 1
+            self.bytes_sent += n_bytes
+
+    def stats(self):
+        """
+        Antall forespørsler per statuskode, avbrutte svar og bytes sendt siden start.
+        """
+        with self.lock:
+            stats = dict(self.counts, bytes=self.bytes_sent)
+        if self.started is not None:
+            stats["seconds"] = time.perf_counter() - self.started
+        return stats
+
+    def observations_response(self, params):
+        if "sources" not in params or "referencetime" not in params:
+            return 400, {"error": {"code": 400, "message": "Bad Request", "reason": "sources og referencetime må oppgis"}}
+        try:
+            reference_time = _parse_reference_time(params["referencetime"])
+        except ValueError as e:
+            return 400, {"error": {"code": 400, "message": "Bad Request", "reason": f"Ugyldig referencetime: {e}"}}
+        elements = params["elements"].split(",") if params.get("elements") else None
+        data = self.data.observations(params["sources"].split(","), elements, reference_time)
+        if not data:
+            # Frost svarer 404 når ingen data passer til parameterne
+            return 404, {"error": {"code": 404, "message": "Not found", "reason": "No data found"}}
+        return 200, {"totalItemCount": len(data), "currentItemCount": len(data), "data": data}
+
+    def sources_response(self, params):
+        try:
+            stations = self.data.sources(params.get("geometry"), params["ids"].split(",") if params.get("ids") else None,
+                                         params.get("country"))
+        except ValueError as e:
+            return 400, {"error": {"code": 400, "message": "Bad Request", "reason": str(e)}}
+        return 200, {"totalItemCount": len(stations), "currentItemCount": len(stations), "data": stations}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokal stand-in for frost.met.no")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--stations", type=int, default=100, help="Antall syntetiske stasjoner")
+    parser.add_argument("--days", type=int, default=365, help="Antall syntetiske dager fra 2015-01-01")
+    parser.add_argument("--observations", help="Innspilt svar fra observations-endepunktet (JSON)")
+    parser.add_argument("--sources", help="Innspilt svar fra sources-endepunktet (JSON)")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.observations:
+        data = FrostStubData.from_files(args.observations, args.sources)
+    else:
+        data = FrostStubData.synthetic(n_stations=args.stations, n_days=args.days)
+    server = FrostStubServer(data, args.host, args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                             rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate, truncate_rate=args.truncate_rate)
+    print(f"Frost-stub kjører på {server.base_url} (Ctrl+C for å stoppe)")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(server.stats())
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import codecs
+import json
+
+"""
+Strømmende lesing av store JSON-svar fra Frost.
+I stedet for response.json() på hele svaret leses svaret i biter, og hvert element i
+data-listen tolkes for seg med json.JSONDecoder.raw_decode og gis videre med en gang.
+Da ligger bare én bit av svaret og ett element i minnet om gangen, ikke hele teksten,
+hele objekttreet og DataFrame-en samtidig.
+"""
+
+CHUNK_SIZE = 256 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """
+    Tekstbuffer over bitene, med posisjon. Lest tekst kastes etter hvert.
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def more(self):
+        """
+        Leser neste bit. Returnerer False når svaret er slutt.
+        """
+        if self.exhausted:
+            return False
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.buffer += text
+                return True
+        self.buffer += self.decoder.decode(b"", final=True)
+        self.exhausted = True
+        return True
+
+    def peek(self):
+        """
+        Neste tegn som ikke er mellomrom, uten å flytte posisjonen. Tom streng ved slutt.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.more():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Forventet '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self, decoder):
+        """
+        Tolker én hel JSON-verdi. Leser flere biter til verdien er komplett.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+                # Et tall helt på slutten av bufferen kan fortsette i neste bit
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.more()
+
+
+def iter_json_items(chunks, key="data"):
+    """
+    Gir elementene i listen under key i et JSON-objekt, ett og ett, fra en iterator over
+    bytes (f.eks. response.iter_content()). Andre felt på toppnivå leses og hoppes over.
+    Kaster json.JSONDecodeError hvis svaret er ugyldig eller avkortet.
+    """
+    reader = _Reader(chunks)
+    decoder = json.JSONDecoder()
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value(decoder)
+        reader.expect(":")
+        if name == key:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value(decoder)
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                        break
+                    reader.expect(",")
+        else:
+            reader.value(decoder)
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        reader.expect(",")
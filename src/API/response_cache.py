@@ -0,0 +1,185 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+import pandas as pd
+
+"""
+Cache på disk for svar fra Frost API.
+Nøkkelen er en hash av endepunkt og normaliserte parametere, så samme spørring
+gir samme fil uansett rekkefølge på parametere eller stasjoner.
+Svarene lagres gzip-komprimert. Levetiden avhenger av endepunktet:
+stasjonslister endres sjelden, og observasjoner for et avsluttet historisk
+tidsvindu endres aldri. Når cachen blir for stor slettes filene som er brukt minst nylig.
+"""
+
+HOUR = 3600
+DAY = 24 * HOUR
+DEFAULT_TTL = {
+    "sources": 7 * DAY, # Stasjonslister endres sjelden
+    "observations": HOUR, # Åpne tidsvinduer kan få nye observasjoner
+}
+CLOSED_WINDOW_MARGIN = pd.Timedelta(days=2) # Frost kan etterregistrere data litt bakover i tid
+LIST_PARAMS = ("sources", "elements") # Kommaseparerte lister der rekkefølgen ikke betyr noe
+
+
+class CachedResponse:
+    """
+    Minimal erstatning for requests.Response når svaret kommer fra cache.
+    """
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        chunk_size = chunk_size or len(self.content) or 1
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+def normalize_params(params):
+    """
+    Gjør parametere om til en stabil form: sorterte nøkler, uten mellomrom,
+    og sorterte elementer i kommaseparerte lister.
+    """
+    normalized = {}
+    for key, value in (params or {}).items():
+        value = str(value).strip()
+        if key in LIST_PARAMS:
+            value = ",".join(sorted(v.strip() for v in value.split(",") if v.strip()))
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+
+class ResponseCache:
+    """
+    Args:
+        directory (str): Mappe for cache-filer, standard er data/.cache.
+        max_bytes (int): Maks total størrelse før de minst brukte filene slettes.
+        ttl (dict): Overstyrer levetid i sekunder per endepunkt ('sources', 'observations').
+    """
+    def __init__(self, directory=None, max_bytes=500 * 1024 * 1024, ttl=None):
+        self.directory = directory or os.path.join(os.getcwd(), "data", ".cache")
+        self.max_bytes = max_bytes
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.lock = threading.Lock()
+        self.total_bytes = None # Løpende total for filene, regnes ut første gang det trengs
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(url, params):
+        payload = json.dumps({"url": url, "params": normalize_params(params)}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def ttl_for(self, url, params):
+        """
+        Levetid i sekunder, eller None hvis svaret aldri blir utdatert.
+        """
+        endpoint = urlparse(url).path.strip("/").split("/")[0]
+        if endpoint == "observations":
+            ref_time = (params or {}).get("referencetime", "")
+            if "/" in ref_time:
+                end = pd.Timestamp(ref_time.split("/")[1])
+                end = end.tz_localize("UTC") if end.tzinfo is None else end
+                if end < pd.Timestamp.now(tz="UTC") - CLOSED_WINDOW_MARGIN:
+                    return None # Avsluttet historisk vindu
+        return self.ttl.get(endpoint, HOUR)
+
+    def get(self, url, params=None):
+        """
+        Returnerer en CachedResponse, eller None hvis svaret mangler eller er utløpt.
+        En annen tråd kan slette filen med evict mens den leses, det regnes også som manglende.
+        """
+        path = self._path(self.key(url, params))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        ttl = self.ttl_for(url, params)
+        now = time.time()
+        if ttl is not None and now - stat.st_mtime > ttl:
+            self.misses += 1
+            return None
+
+        try:
+            with gzip.open(path, "rb") as f:
+                content = f.read()
+            os.utime(path, (now, stat.st_mtime)) # atime brukes som "sist brukt", mtime som "lagret"
+        except (OSError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse(content)
+
+    def put(self, url, params, content):
+        path = self._path(self.key(url, params))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(content)
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self.size()
+            try:
+                self.total_bytes -= os.stat(path).st_size # Filen som erstattes
+            except FileNotFoundError:
+                pass
+            self.total_bytes += os.stat(tmp_path).st_size
+            os.replace(tmp_path, path)
+            full = self.total_bytes > self.max_bytes
+        if full:
+            self.evict()
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith(".json.gz"))
+
+    def evict(self):
+        """
+        Sletter de minst nylig brukte filene til cachen er under max_bytes.
+        Kalles av put bare når den løpende totalen er over max_bytes, og regner totalen ut på nytt.
+        """
+        with self.lock:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json.gz")]
+            stats = []
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                stats.append((stat.st_atime, stat.st_size, entry.path))
+            stats.sort()
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in stats:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+            self.total_bytes = total
+
+    def clear(self):
+        with self.lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json.gz"):
+                    os.remove(entry.path)
+            self.total_bytes = 0
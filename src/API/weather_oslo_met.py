@@ -1,11 +1,21 @@
-import requests
 import pandas as pd
 import os
 import sys
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 modul_path = os.path.join(os.getcwd(), "src")
 sys.path.append(modul_path)
-from data_processing import process_weather_data
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from data_processing import process_weather_data, process_weather_data_parallel, ObservationBuffer, clean_columns, preprocess_dataframe
+from instrumentation import NO_PROFILER
+from frost_client import FrostClient, FROST_BASE_URL
+from json_stream import iter_json_items, CHUNK_SIZE
+from chunking import Checkpoint, plan_windows, format_reference_time, is_truncated, split_window, MAX_OBSERVATIONS, MAX_SOURCES
+
+# Rådata før første nye dag som renses sammen med de nye dagene ved inkrementell henting.
+# Et år dekker alle årstider, så statistikken for uteliggere ikke følger sesongen
+INCREMENTAL_CONTEXT = "365D"
 
 
 """
@@ -13,20 +23,35 @@ Denne klassen henter værdata fra frost.met.no og lagrer som csv
 Vi laget en klasse for å gjøre det enklere å teste og justere koden for gjenbruk
 init for alle nødvendige parametere
 fetch_data for å hente data fra frost.met.no, ved bruk av requests
+fetch_data_streaming for å lese store svar i biter rett inn i kolonner
+fetch_data_chunked for å hente lange perioder i vinduer med checkpoint på disk
+fetch_data_incremental for å bare hente det som mangler i eksisterende csv
+with_raw_history for å rense de nye dataene sammen med rådataene fra tidligere kjøringer
 process_data for å tilpasse dataene til et bedre format
 save_to_csv for å lagre dataene som csv med pandas DataFrame
 run for å kjøre hele prosessen
+Flere fetchere kan dele én FrostClient og kjøres parallelt med run_concurrently
 """
 class FrostDataFetcher:
-    def __init__(self, client_id, source_id, elements, ref_time, output_filename="met_data.csv", stationsdata_path=None):
+    def __init__(self, client_id, source_id, elements, ref_time, output_filename="met_data.csv", stationsdata_path=None, client=None, endpoint=None,
+                 process_workers=1, process_pool=None, store=None, region=None, profiler=None, incremental_context=INCREMENTAL_CONTEXT):
         """
         Alle variabler som trengs for å hente data fra frost.met.no
+        client kan deles mellom flere fetchere for felles tilkoblingspool og rate limit. Uten client
+        lager fetcheren sin egen, som lukkes etter run() eller close(), eller ved bruk i en with-blokk
+        endpoint kan overstyres, f.eks. for å teste mot en lokal server
+        process_workers > 1 eller en delt process_pool gir parallell prosessering per stasjon
+        store (PartitionedStore) og region lagrer i kolonnelageret i stedet for CSV
+        profiler (StageProfiler) måler tid, rader og minne for henting, prosessering og lagring
+        incremental_context er hvor mye tidligere rådata som renses med de nye dagene (se with_raw_history), None gir alt
         """
         self.client_id = client_id
         self.source_id = source_id
         self.elements = elements
         self.ref_time = ref_time
-        self.endpoint = 'https://frost.met.no/observations/v0.jsonld'
+        self.owns_client = client is None # Bare en klient fetcheren har laget selv, skal lukkes av den
+        self.client = client if client is not None else FrostClient(client_id)
+        self.endpoint = endpoint or f'{FROST_BASE_URL}/observations/v0.jsonld'
         self.parameters = {
             'sources': self.source_id,
             'elements': elements,
@@ -34,9 +59,17 @@ class FrostDataFetcher:
         }
         self.output_filename = output_filename # Filnavn for å lagre data som csv
         self.stationsdata_path = stationsdata_path # Sti til stationsdata.csv, hvis nødvendig
+        self.used_checkpoints = [] # Checkpoint-mapper som kan slettes når resultatet er lagret
+        self.n_observations = 0 # Antall observasjoner hentet i siste kjøring, brukes i rapporter
+        self.process_workers = process_workers
+        self.process_pool = process_pool
+        self.store = store
+        self.region = region
+        self.profiler = profiler
+        self.incremental_context = pd.Timedelta(incremental_context) if incremental_context is not None else None
     
-    def fetch_data(self):
-        response = requests.get(self.endpoint, self.parameters, auth=(self.client_id, '')) # Henter data fra frost.met.no
+    def fetch_data(self, parameters=None):
+        response = self.client.get(self.endpoint, parameters or self.parameters) # Henter data fra frost.met.no
         
         if response.status_code == 200: # Hvis henting er vellykket
             json_data = response.json() # Konverter til json
@@ -48,13 +81,237 @@ class FrostDataFetcher:
             print(f'Melding: {response.json()["error"]["message"]}') # Bruk innebygd feilmelding
             print(f'Årsak: {response.json()["error"]["reason"]}')
             return None
+
+    def fetch_data_streaming(self, parameters=None):
+        """
+        Som fetch_data, men svaret leses i biter og hvert element i data-listen går rett
+        inn i en ObservationBuffer. Rå bytes, objekttreet og DataFrame-en fra json_normalize
+        ligger aldri i minnet samtidig, så minnetoppen blir mye lavere for store svar.
+        Returnerer en DataFrame i formatet fra clean_columns, eller None ved feil.
+        """
+        def consume(response):
+            if response.status_code != 200:
+                print(f'Feil! Returnerte statuskode {response.status_code}')
+                print(f'Melding: {response.json()["error"]["message"]}')
+                print(f'Årsak: {response.json()["error"]["reason"]}')
+                return None
+            return ObservationBuffer().extend(iter_json_items(response.iter_content(CHUNK_SIZE)))
+
+        buffer = self.client.get_streamed(self.endpoint, parameters or self.parameters, consume)
+        if buffer is None:
+            return None
+        print('Data hentet fra frost.met.no!')
+        return buffer.to_frame()
+
+    def _fetch_window(self, sources, ref_time, max_observations=MAX_OBSERVATIONS):
+        """
+        Henter ett vindu. Frost svarer 404 når vinduet ikke har data, det regnes som tomt.
+        Et avkortet svar (se is_truncated) deles med split_window og hentes på nytt i to deler.
+        """
+        parameters = dict(self.parameters, sources=sources, referencetime=ref_time)
+        response = self.client.get(self.endpoint, parameters)
+        if response.status_code == 404:
+            return []
+        if response.status_code != 200:
+            print(f'Feil for vindu {ref_time}! Returnerte statuskode {response.status_code}')
+            return None
+        body = response.json()
+        if not is_truncated(body, max_observations):
+            return body['data']
+        parts = split_window(sources, ref_time)
+        if parts is None:
+            print(f'Vindu {ref_time} for {sources} er avkortet og kan ikke deles mer')
+            return body['data']
+        print(f'Vindu {ref_time} ble avkortet, henter det i to deler')
+        data = []
+        for part_sources, part_time in parts:
+            part = self._fetch_window(part_sources, part_time, max_observations)
+            if part is None:
+                return None
+            data.extend(part)
+        return data
+
+    def checkpoint_dir(self, source_id=None, ref_time=None):
+        """
+        Egen checkpoint-mappe per jobb, avledet fra endepunkt og parametere.
+        """
+        key = Checkpoint.job_key(self.endpoint, source_id or self.source_id, self.elements, ref_time or self.ref_time)
+        return os.path.join(os.getcwd(), "data", ".checkpoints", key)
+
+    def fetch_data_chunked(self, max_observations=MAX_OBSERVATIONS, max_sources=MAX_SOURCES, max_workers=1, checkpoint_dir=None, source_id=None, ref_time=None):
+        """
+        Henter data i vinduer som hver holder seg under Frost sitt tak på observasjoner.
+        Ferdige vinduer lagres på disk, så en ny kjøring etter krasj hopper over dem.
+        source_id og ref_time overstyrer jobbens egne, f.eks. ved inkrementell henting.
+        Returnerer samme liste som fetch_data, eller None hvis et vindu feilet.
+        """
+        source_id = source_id or self.source_id
+        ref_time = ref_time or self.ref_time
+        windows = plan_windows(source_id, self.elements, ref_time, max_observations, max_sources)
+        checkpoint = Checkpoint(checkpoint_dir or self.checkpoint_dir(source_id, ref_time))
+        self.used_checkpoints.append(checkpoint)
+        keys = [Checkpoint.job_key(i, sources, ref_time) for i, (sources, ref_time) in enumerate(windows)]
+        remaining = [(key, window) for key, window in zip(keys, windows) if not checkpoint.has(key)]
+        print(f"{len(windows)} vinduer totalt, {len(windows) - len(remaining)} allerede ferdige")
+
+        def fetch_and_save(item):
+            key, (sources, ref_time) = item
+            window_data = self._fetch_window(sources, ref_time, max_observations)
+            if window_data is not None:
+                checkpoint.save(key, window_data)
+            return window_data is not None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            ok = list(executor.map(fetch_and_save, remaining))
+        if not all(ok):
+            print(f"{ok.count(False)} vinduer feilet, kjør på nytt for å fortsette fra checkpoint")
+            return None
+
+        data = []
+        for key in keys: # Samme rekkefølge som vinduene uansett hvilke som ble hentet nå
+            data.extend(checkpoint.load(key))
+        print(f'Data hentet fra frost.met.no i {len(windows)} vinduer!')
+        return data
+
+    def latest_timestamps(self):
+        """
+        Finner nyeste referenceTimestamp per stasjon i eksisterende utfil, eller i lageret.
+        Stasjons-ID normaliseres (uten ':0') slik at den kan sammenlignes med sources.
+        """
+        if self.store is not None:
+            return self.store.latest_timestamps(element=self.elements.split(","), region=self.region)
+        if not os.path.exists(self.output_path()):
+            return pd.Series(dtype="datetime64[ns, UTC]")
+        existing = pd.read_csv(self.output_path(), usecols=['sourceId', 'referenceTimestamp'])
+        existing['referenceTimestamp'] = pd.to_datetime(existing['referenceTimestamp'], utc=True)
+        return existing.groupby(_stations(existing['sourceId']))['referenceTimestamp'].max()
+
+    def raw_history_path(self):
+        """
+        Rådata for inkrementell henting: data/.raw/<output_filename>, eller <lager>/.raw/<region>/<elementer>.csv.
+        """
+        if self.store is not None:
+            return os.path.join(self.store.root, ".raw", quote(str(self.region), safe=''), quote(self.elements, safe='') + ".csv")
+        return os.path.join(os.getcwd(), "data", ".raw", self.output_filename)
+
+    def load_raw_history(self):
+        """
+        Rådataene fra tidligere inkrementelle kjøringer i formatet fra clean_columns, eller None.
+        """
+        path = self.raw_history_path()
+        if not os.path.exists(path):
+            return None
+        history = pd.read_csv(path)
+        history['referenceTimestamp'] = pd.to_datetime(history['referenceTimestamp'], utc=True)
+        return history
+
+    def save_raw_history(self, raw):
+        path = self.raw_history_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw.to_csv(path + ".tmp", index=False, encoding="utf-8")
+        os.replace(path + ".tmp", path) # Halvskrevne rådata ville gitt hull i neste kjøring
+
+    def with_raw_history(self, data):
+        """
+        Uteliggere og utfylling regnes over serien til en stasjon, så de nye dagene alene kan
+        gi et annet resultat enn en full kjøring. De nye observasjonene renses derfor sammen med
+        rådata fra incremental_context før første nye tidsstempel per stasjon, og utfilen
+        erstattes fra halve konteksten før. Statistikken for uteliggere og regresjonen for hull
+        i endene regnes da over konteksten i stedet for hele serien, så verdiene kan avvike litt
+        fra en full kjøring. Med incremental_context=None renses hele serien, og utfilen blir lik.
+        Rader fra og med første nye tidsstempel erstattes i rådataene, siden dagen med nyeste
+        måling hentes på nytt, og bare konteksten før nyeste dag beholdes. Arbeidet per kjøring
+        vokser dermed med de nye dagene og konteksten, ikke med hele historikken.
+        Returnerer (serien som skal renses, rådata som skal lagres, tidsstempel per stasjon
+        som utfilen erstattes fra), der seriene er i formatet fra clean_columns.
+        """
+        df = (self.profiler or NO_PROFILER).run("json_normalize", pd.json_normalize, data)
+        new = preprocess_dataframe(clean_columns(df))
+        new['sourceId'] = new['sourceId'].astype(str)
+        first = new.groupby('sourceId')['referenceTimestamp'].min()
+        history = self.load_raw_history()
+        if history is None:
+            raw = new
+        else:
+            replaced = history['referenceTimestamp'] >= history['sourceId'].astype(str).map(first)
+            raw = pd.concat([history[~replaced], new], ignore_index=True)
+
+        series = raw[raw['sourceId'].isin(first.index)]
+        if self.incremental_context is not None:
+            series = series[series['referenceTimestamp'] >= series['sourceId'].map(first) - self.incremental_context]
+            latest = raw.groupby('sourceId')['referenceTimestamp'].transform('max').dt.floor('D')
+            raw = raw[raw['referenceTimestamp'] >= latest - self.incremental_context]
+        replace_from = series.groupby('sourceId')['referenceTimestamp'].min()
+        if self.incremental_context is not None:
+            replace_from = replace_from.clip(lower=first - self.incremental_context / 2)
+        replace_from = replace_from.groupby(_stations(replace_from.index.to_series())).min()
+        return series.reset_index(drop=True), raw.reset_index(drop=True), replace_from
+
+    def plan_incremental(self):
+        """
+        Grupperer stasjonene etter hvor langt de allerede er hentet, og lager én
+        (sources, referencetime) per gruppe som bare dekker det som mangler.
+        Dagen med nyeste måling hentes på nytt, duplikater fjernes ved fletting.
+        """
+        start, end = (pd.Timestamp(t) for t in self.ref_time.split("/"))
+        start = start.tz_localize('UTC') if start.tzinfo is None else start
+        end = end.tz_localize('UTC') if end.tzinfo is None else end
+        latest = self.latest_timestamps()
+
+        groups = {}
+        for source in self.source_id.split(","):
+            source = source.strip()
+            station = source.split(":")[0]
+            source_start = max(start, latest[station].floor('D')) if station in latest.index else start
+            if source_start < end:
+                groups.setdefault(source_start, []).append(source)
+
+        return [
+            (",".join(sources), f"{format_reference_time(group_start.tz_localize(None))}/{format_reference_time(end.tz_localize(None))}")
+            for group_start, sources in sorted(groups.items())
+        ]
+
+    def fetch_data_incremental(self, chunked=False):
+        """
+        Henter bare observasjoner som er nyere enn det som ligger i utfilen.
+        Returnerer en liste (tom hvis alt er oppdatert), eller None ved feil.
+        """
+        data = []
+        for sources, ref_time in self.plan_incremental():
+            print(f"Henter {ref_time} for {len(sources.split(','))} stasjoner")
+            if chunked:
+                window_data = self.fetch_data_chunked(source_id=sources, ref_time=ref_time)
+            else:
+                window_data = self._fetch_window(sources, ref_time)
+            if window_data is None:
+                return None
+            data.extend(window_data)
+        return data
+
+    def merge_with_existing(self, df, replace_from=None):
+        """
+        Fletter nye rader inn i eksisterende utfil. Med replace_from (tidsstempel per stasjon,
+        fra with_raw_history) erstattes stasjonens rader fra og med tidsstempelet. Ved duplikat på
+        (sourceId, referenceTimestamp, datatype) vinner den nye raden.
+        """
+        if not os.path.exists(self.output_path()):
+            return df
+        existing = pd.read_csv(self.output_path())
+        existing['referenceTimestamp'] = pd.to_datetime(existing['referenceTimestamp'], utc=True)
+        if replace_from is not None:
+            existing = existing[~(existing['referenceTimestamp'] >= _stations(existing['sourceId']).map(replace_from))]
+        merged = pd.concat([existing, df], ignore_index=True)
+        merged = merged.drop_duplicates(subset=['sourceId', 'referenceTimestamp', 'datatype'], keep='last')
+        return merged.sort_values('referenceTimestamp', kind='stable').reset_index(drop=True)
     
     def process_data(self, data):
         """
         Tilpasser dataene til et bedre format
+        data er listen fra fetch_data, eller DataFrame-en fra fetch_data_streaming som allerede er renset
         """
+        cleaned = isinstance(data, pd.DataFrame)
         try:
-            df = pd.json_normalize(data)
+            df = data if cleaned else (self.profiler or NO_PROFILER).run("json_normalize", pd.json_normalize, data)
             #print(df.iloc[1, 2])
             #print(df.head())
             #print(f"Data inneholder {len(df)} rader og {len(df.columns)} kolonner.")
@@ -63,29 +320,131 @@ class FrostDataFetcher:
         except Exception as e:
             print(f"Feil ved konvertering av data til DataFrame: {e}")
             return None
-        df = process_weather_data(df, self.stationsdata_path) # Kall funksjonen for å behandle dataene
+        if self.process_workers > 1 or self.process_pool is not None:
+            df = process_weather_data_parallel(df, self.stationsdata_path, max_workers=self.process_workers, executor=self.process_pool,
+                                               cleaned=cleaned, profiler=self.profiler)
+        else:
+            df = process_weather_data(df, self.stationsdata_path, profiler=self.profiler, cleaned=cleaned) # Kall funksjonen for å behandle dataene
         return df
     
+    def output_path(self):
+        return os.path.join(os.getcwd(), "data", self.output_filename)
+
     def save_to_csv(self, df):
         try:
 
-            output_path = os.path.join(os.getcwd(), "data", self.output_filename)
+            output_path = self.output_path()
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
             df.to_csv(output_path, index=False, encoding="utf-8") # Lagre som csv med sti
             print(f"Data lagret som CSV på {output_path}")
 
         except Exception as e: # Hvis feil oppstår under lagring
             print(f"Feil ved lagring som CSV-fil: {e}")
+
+    def save(self, df):
+        """
+        Lagrer i kolonnelageret hvis det er satt, ellers som CSV.
+        Lageret erstatter selv eksisterende rader, så flettingen trengs bare for CSV.
+        """
+        if self.store is not None:
+            rows = self.store.write(df, self.region)
+            print(f"{rows} rader lagret i {self.store.root} for {self.region}")
+        else:
+            self.save_to_csv(df)
     
-    def run(self): # Egen metode for å kjøre hele prosessen
-        data = self.fetch_data()
-        if data:
-            df = self.process_data(data)
+    def close(self):
+        """
+        Lukker klienten hvis fetcheren laget den selv. En delt klient lukkes av den som eier den.
+        """
+        if self.owns_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, chunked=False, incremental=False, streaming=False): # Egen metode for å kjøre hele prosessen
+        """
+        streaming=True leser svaret i biter med fetch_data_streaming. Gjelder bare vanlig henting,
+        vinduene ved chunked og incremental er allerede begrenset i størrelse.
+        incremental=True henter bare nye dager, og renser dem sammen med rådata fra incremental_context
+        før (se with_raw_history), så bare radene fra halve konteksten før og utover skrives på nytt.
+        Klienten lukkes etterpå hvis fetcheren laget den selv.
+        """
+        try:
+            return self._run(chunked, incremental, streaming)
+        finally:
+            self.close()
+
+    def _run(self, chunked, incremental, streaming):
+        profiler = self.profiler or NO_PROFILER
+        streaming = streaming and not (chunked or incremental)
+        with profiler.stage("fetch") as record:
+            if incremental:
+                data = self.fetch_data_incremental(chunked)
+            elif streaming:
+                data = self.fetch_data_streaming()
+            else:
+                data = self.fetch_data_chunked() if chunked else self.fetch_data()
+            record["rows_out"] = len(data) if data is not None else 0
+        if incremental and data == []:
+            print("Ingen nye observasjoner, utfilen er oppdatert")
+            return True
+        if data is not None and len(data):
+            if streaming:
+                self.n_observations = len(data) # Én rad per observasjon
+            else:
+                self.n_observations = sum(len(item.get('observations', [])) for item in data)
+            raw = None
+            if incremental:
+                data, raw, replace_from = self.with_raw_history(data)
+            df = profiler.run("process", self.process_data, data)
             if df is not None:
-                self.save_to_csv(df)
+                with profiler.stage("save", rows_in=len(df)):
+                    if incremental:
+                        df = df[df['referenceTimestamp'] >= _stations(df['sourceId']).map(replace_from)]
+                    if incremental and self.store is None:
+                        df = self.merge_with_existing(df, replace_from)
+                    self.save(df)
+                    if raw is not None:
+                        self.save_raw_history(raw)
+                for checkpoint in self.used_checkpoints:
+                    checkpoint.clear() # Jobben er ferdig, checkpoint trengs ikke lenger
+                self.used_checkpoints = []
+                return True
             else:
                 print("Feil ved behandling av data")
         else:
             print("Ingen data å behandle")
+        return False
+
+
+def _stations(source_ids):
+    """
+    Stasjons-ID uten spesifikasjon av måleinstrument (uten ':0').
+    """
+    return source_ids.astype(str).str.split(':').str[0]
+
+
+def run_concurrently(fetchers, max_workers=4):
+    """
+    Kjører flere FrostDataFetcher-jobber parallelt i en trådpool.
+    Fetcherne bør dele samme FrostClient, slik at tilkoblinger og rate limit deles.
+    Returnerer en dict {output_filename: True/False} med resultatet for hver jobb.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetcher.run): fetcher for fetcher in fetchers}
+        for future in as_completed(futures):
+            fetcher = futures[future]
+            try:
+                results[fetcher.output_filename] = future.result()
+            except Exception as e: # En feilende jobb skal ikke stoppe de andre
+                print(f"Feil i jobb {fetcher.output_filename}: {e}")
+                results[fetcher.output_filename] = False
+    return results
 
 
 if __name__ == "__main__":
@@ -102,35 +461,8 @@ if __name__ == "__main__":
     fetch3.run()
     """
     
-    for station_name in ['Agder', 'Innlandet', 'Oslo', 'Viken', 'Vestfold og Telemark', 'Møre og Romsdal', 'Nordland', 'Vestland', 'Trøndelag', 'Troms og Finnmark', 'Rogaland']:
-        
-        # Hent alle lokasjoner i regionen
-        stationsdata_path = os.path.join(os.getcwd(), "data", "Verstasjoner", f"{station_name}_stations.csv")
-        stations_df = pd.read_csv(stationsdata_path)
-
-        # Vis antall og spør bruker før videre kjøring
-        print(f"Det er funnet følgende antall stasjoner i {station_name}: {len(stations_df)}")
-        confirm = input("Vil du hente data for alle disse? (ja/nei): ").strip().lower()
-        if confirm != "ja":
-            print("Avbrutt av bruker.")
-            pass
-
-        else:
-            elements = [
-                "sum(precipitation_amount P1D)",
-            ]
-            
-            source_id_total = ",".join(stations_df['source_id'].unique().astype(str))
-
-            for element in elements:
-                print(f"Henter data for alle stasjoner med element '{element}'")
-                fetch = FrostDataFetcher(
-                    client_id,
-                    source_id_total,
-                    element, 
-                    "2025-01-01/2025-02-01",
-                    output_filename=f"Jan_2025/{element}_{station_name}.csv",
-                    stationsdata_path=stationsdata_path # Sti til stationsdata.csv
-                )
-                fetch.run()
-
+    # Henting for alle fylker styres av en jobbfil og kjøres uten spørsmål underveis,
+    # slik at den kan kjøres fra cron eller en container. Se batch_runner.py for formatet.
+    from batch_runner import main
+    manifest_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manifests", "jan_2025.json")
+    sys.exit(main([manifest_path] + sys.argv[1:]))
@@ -1,9 +1,15 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
-from sklearn.linear_model import LinearRegression
 from datetime import timedelta
+from functools import lru_cache
 import isodate
+from schema import apply_schema
+from station_index import get_station_index
+from instrumentation import NO_PROFILER
 
 """
 Denne metoden renser og prosesserer værdata fra frost.met.no.
@@ -13,106 +19,488 @@ Dette er for å forbrede dataene for lagring i csv og videre analyse.
 def clean_columns(df):
     """
     Ekspanderer observations-kolonnen og trekker ut relevante felter.
+    Vektorisert: én rad per observasjon med explode, og hver unike referenceTime
+    og timeOffset tolkes bare én gang før tidsstempler regnes ut kolonnevis.
     """
-    rows = []
-    for _, row in df.iterrows():
-        source_id = row['sourceId']
-        ref_time = pd.to_datetime(row['referenceTime'])
-        for obs in row['observations']:
-            time_offset = isodate.parse_duration(obs.get('timeOffset', 'PT0H'))
-            adj_time = ref_time + timedelta(seconds=time_offset.total_seconds())
-            rows.append({
-                'sourceId': source_id,
-                'referenceTimestamp': adj_time,
-                'datatype': obs['elementId'],
-                'value': obs['value'],
-                'unit': obs['unit'],
-            })
-    return pd.DataFrame(rows)
+    columns = ['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit']
+    expanded = df[['sourceId', 'referenceTime', 'observations']].explode('observations', ignore_index=True)
+    expanded = expanded[expanded['observations'].notna()] # Tomme observasjonslister gir NaN etter explode
+    if expanded.empty:
+        return pd.DataFrame(columns=columns)
+
+    observations = expanded['observations'].tolist()
+    offsets = [obs.get('timeOffset', 'PT0H') for obs in observations]
+
+    # Hver unike verdi tolkes én gang og fordeles tilbake med koder
+    ref_codes, ref_uniques = pd.factorize(expanded['referenceTime'])
+    offset_codes, offset_uniques = pd.factorize(pd.Series(offsets))
+
+    # Tekst som gjentas på hver rad lagres som kategorier, se schema.py
+    return pd.DataFrame({
+        'sourceId': pd.Categorical(expanded['sourceId'].values),
+        'referenceTimestamp': _timestamps(ref_codes, ref_uniques, offset_codes, offset_uniques),
+        'datatype': pd.Categorical([obs['elementId'] for obs in observations]),
+        'value': [obs['value'] for obs in observations],
+        'unit': pd.Categorical([obs['unit'] for obs in observations]),
+    }, columns=columns)
+
+def _timestamps(ref_codes, ref_uniques, offset_codes, offset_uniques):
+    """
+    referenceTime + timeOffset per rad, der hver unike verdi bare tolkes én gang.
+    """
+    try:
+        ref_times = pd.DatetimeIndex(pd.to_datetime(ref_uniques))
+    except (ValueError, TypeError): # Blandede formater eller tidssoner tolkes én og én
+        ref_times = pd.DatetimeIndex([pd.to_datetime(t) for t in ref_uniques])
+    offset_deltas = pd.TimedeltaIndex([timedelta(seconds=_parse_offset(o)) for o in offset_uniques])
+    return ref_times.take(ref_codes) + offset_deltas.take(offset_codes)
+
+@lru_cache(maxsize=None)
+def _parse_offset(offset):
+    return isodate.parse_duration(offset).total_seconds()
+
+
+class ObservationBuffer:
+    """
+    Bygger samme tabell som clean_columns direkte fra data-elementer, ett og ett, f.eks. fra
+    et strømmende svar (se API/json_stream.py). Tekst og tidspunkt lagres som heltallskoder
+    inn i ordbøker og verdiene i en float-array, så verken objekttreet for hele svaret eller
+    json_normalize trengs. Resultatet sendes til process_weather_data med cleaned=True.
+    """
+    CATEGORIES = ('sourceId', 'datatype', 'unit')
+
+    def __init__(self):
+        self.lookups = {name: {} for name in ('sourceId', 'referenceTime', 'timeOffset', 'datatype', 'unit')}
+        self.codes = {name: array('i') for name in self.lookups}
+        self.values = array('d')
+
+    def __len__(self):
+        return len(self.values)
+
+    def _code(self, name, value):
+        if value is None and name in self.CATEGORIES:
+            return -1 # Manglende tekst blir NaN i kategorien, som i clean_columns
+        lookup = self.lookups[name]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        return code
+
+    def add(self, item):
+        """
+        Legger til ett element fra data-listen, med én rad per observasjon.
+        """
+        observations = item.get('observations') or ()
+        source_code = self._code('sourceId', item.get('sourceId'))
+        ref_code = self._code('referenceTime', item.get('referenceTime'))
+        for obs in observations:
+            self.codes['sourceId'].append(source_code)
+            self.codes['referenceTime'].append(ref_code)
+            self.codes['timeOffset'].append(self._code('timeOffset', obs.get('timeOffset', 'PT0H')))
+            self.codes['datatype'].append(self._code('datatype', obs.get('elementId')))
+            self.codes['unit'].append(self._code('unit', obs.get('unit')))
+            value = obs.get('value')
+            try:
+                self.values.append(value)
+            except TypeError: # Tekst eller manglende verdi tolkes som i to_numeric(errors='coerce')
+                try:
+                    self.values.append(float(value))
+                except (TypeError, ValueError):
+                    self.values.append(np.nan)
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+        return self
+
+    def _column_codes(self, name):
+        return np.frombuffer(self.codes[name], dtype=np.int32) if len(self) else np.array([], dtype=np.int32)
+
+    def _categorical(self, name):
+        """
+        Kategori med sorterte kategorier, som pd.Categorical(values) i clean_columns.
+        """
+        uniques = list(self.lookups[name])
+        order = sorted(range(len(uniques)), key=uniques.__getitem__)
+        remap = np.empty(len(uniques) + 1, dtype=np.int32)
+        remap[order] = np.arange(len(uniques), dtype=np.int32)
+        remap[-1] = -1 # Kode -1 (manglende) peker hit og forblir -1
+        return pd.Categorical.from_codes(remap[self._column_codes(name)], categories=[uniques[i] for i in order])
+
+    def to_frame(self):
+        """
+        DataFrame med samme kolonner og typer som clean_columns.
+        """
+        columns = ['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit']
+        if not len(self):
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame({
+            'sourceId': self._categorical('sourceId'),
+            'referenceTimestamp': _timestamps(self._column_codes('referenceTime'), list(self.lookups['referenceTime']),
+                                              self._column_codes('timeOffset'), list(self.lookups['timeOffset'])),
+            'datatype': self._categorical('datatype'),
+            'value': np.frombuffer(self.values, dtype=np.float64).copy(),
+            'unit': self._categorical('unit'),
+        }, columns=columns)
 
 def preprocess_dataframe(df):
     """
     Konverterer verdier og tidsstempel, fjerner ugyldige rader.
+    Tidsstempler uten tidssone regnes som UTC.
     """
     df['value'] = pd.to_numeric(df['value'], errors='coerce')
-    df['referenceTimestamp'] = pd.to_datetime(df['referenceTimestamp'], errors='coerce')
+    df['referenceTimestamp'] = pd.to_datetime(df['referenceTimestamp'], errors='coerce', utc=True)
     df = df.dropna(subset=['referenceTimestamp'])
     return df
 
-def remove_outliers(df):
+# Standard terskel per metode for flag_outliers
+OUTLIER_THRESHOLDS = {'mad': 3.5, 'zscore': 3.0, 'iqr': 1.5}
+
+def flag_outliers(df, method='mad', threshold=None, window=None, by=('sourceId', 'datatype')):
     """
-    Fjerner outliers med Z-score.
+    Markerer uteliggere i kolonnen 'is_outlier' uten å endre verdiene.
+    Statistikken regnes per gruppe, som standard per stasjon og datatype, i én gruppert
+    og vektorisert operasjon, slik at stasjoner med ulikt klima ikke blandes.
+    Args:
+        method (str): 'mad' gir robust z-score 0.6745 * |x - median| / MAD (standard terskel 3.5).
+                      Når MAD er 0 brukes gjennomsnittlig absolutt avvik i stedet.
+                      'zscore' gir vanlig z-score med populasjonsstandardavvik (standard terskel 3).
+                      'iqr' markerer verdier utenfor [Q1 - k*IQR, Q3 + k*IQR] (standard k=1.5).
+        threshold (float): Overstyrer standard terskel for metoden.
+        window (int eller str): Rullerende, sentrert statistikk over et antall observasjoner (int)
+                      eller et tidsvindu (f.eks. '30D') per gruppe. None bruker hele gruppen.
+        by (tuple): Kolonnene som definerer en gruppe.
+    Manglende verdier blir aldri markert.
     """
-    df['value'] = df.groupby('datatype')['value'].transform(
-        lambda x: x.where(np.abs(zscore(x.dropna())) < 3, np.nan)
-    )
+    if method not in OUTLIER_THRESHOLDS:
+        raise ValueError(f"Ukjent metode for uteliggere: {method}. Velg blant {', '.join(OUTLIER_THRESHOLDS)}.")
+    threshold = OUTLIER_THRESHOLDS[method] if threshold is None else threshold
+    values = df['value'].to_numpy(dtype=float)
+    if df.empty:
+        df['is_outlier'] = np.zeros(0, dtype=bool)
+        return df
+
+    stat = _GroupStat(df, values, list(by), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'mad':
+            median = stat('median', values)
+            deviation = np.abs(values - median)
+            mad = stat('median', deviation)
+            scale = np.where(mad > 0, mad / 0.6745, stat('mean', deviation) * 1.253314)
+            outlier = deviation / scale > threshold
+        elif method == 'zscore':
+            outlier = np.abs(values - stat('mean', values)) / stat('std', values) > threshold
+        else:
+            q1, q3 = stat('quantile', values, 0.25), stat('quantile', values, 0.75)
+            iqr = q3 - q1
+            outlier = (values < q1 - threshold * iqr) | (values > q3 + threshold * iqr)
+
+    df['is_outlier'] = outlier & ~np.isnan(values)
     return df
 
+class _GroupStat:
+    """
+    Regner ut gruppestatistikk og sprer den tilbake til hver rad, i radrekkefølgen til df.
+    Uten vindu brukes groupby.transform, med vindu en rullerende groupby sortert på (gruppe, tid).
+    """
+    def __init__(self, df, values, by, window):
+        self.key = df.groupby(by, sort=False, observed=True).ngroup().to_numpy()
+        self.window = window
+        if window is not None:
+            times = df['referenceTimestamp'].to_numpy(dtype='datetime64[ns]')
+            self.order = np.lexsort((times, self.key))
+            self.times = times[self.order]
+
+    def __call__(self, how, values, *args):
+        if self.window is None:
+            series = pd.Series(values).groupby(self.key)
+            if how == 'std':
+                return series.transform('std', ddof=0).to_numpy()
+            return series.transform(how, *args).to_numpy()
+
+        frame = pd.DataFrame({'key': self.key[self.order], 'time': self.times, 'value': values[self.order]})
+        on = 'time' if isinstance(self.window, str) else None
+        rolling = frame.groupby('key', sort=False).rolling(self.window, on=on, center=True, min_periods=1)['value']
+        if how == 'std':
+            result = rolling.std(ddof=0)
+        else:
+            result = getattr(rolling, how)(*args)
+        out = np.empty(len(values))
+        out[self.order] = result.to_numpy() # Gruppene kommer ut i sortert rekkefølge
+        return out
+
+def remove_outliers(df, method='mad', threshold=None, window=None, by=('sourceId', 'datatype')):
+    """
+    Fjerner uteliggere ved å sette dem til NaN. Se flag_outliers for metodene.
+    """
+    df = flag_outliers(df, method, threshold, window, by)
+    df['value'] = df['value'].mask(df['is_outlier'])
+    return df.drop(columns=['is_outlier'])
+
 def resample_and_aggregate(df):
     """
     Beholder siste måling per dag og stasjon.
+    Stabil sortering gjør at like tidsstempler alltid gir samme rad.
     """
-    df = df.sort_values('referenceTimestamp')
+    df = df.sort_values('referenceTimestamp', kind='stable')
     df['date'] = df['referenceTimestamp'].dt.floor('D')
-    df = df.groupby(['date', 'sourceId']).tail(1)
+    df = df.groupby(['date', 'sourceId'], observed=True).tail(1)
     df = df.drop(columns=['date'])
     return df
 
-def fill_missing_values(df):
+def fill_missing_values(df, method='time', fallback='regression'):
     """
-    Fyller manglende verdier med lineær regresjon per datatype.
+    Fyller manglende verdier per stasjon og datatype, i én vektorisert operasjon.
+    Hull mellom to kjente verdier interpoleres lineært, enten i tid (method='time')
+    eller etter posisjon (method='linear'). Hull i starten eller slutten av en serie,
+    der det bare finnes kjente verdier på én side, fylles med fallback:
+    'regression' (lineær regresjon over tid for serien), 'nearest' (nærmeste kjente verdi) eller None.
     """
-    for datatype in df['datatype'].unique():
-        subset = df[df['datatype'] == datatype].copy()
-        if subset.empty:
-            continue
+    if df.empty:
+        return df
+
+    group = df.groupby(['sourceId', 'datatype'], sort=False, observed=True).ngroup().to_numpy()
+    times = df['referenceTimestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+    values = df['value'].to_numpy(dtype=float)
 
-        subset = subset.sort_values('referenceTimestamp')
-        subset['time_numeric'] = (subset['referenceTimestamp'] - subset['referenceTimestamp'].min()).dt.total_seconds()
+    # Sorter etter (serie, tid), så hver serie ligger samlet og i tidsrekkefølge
+    order = np.lexsort((times, group))
+    g, t, v = group[order], times[order], values[order]
+    n = len(v)
+    positions = np.arange(n)
+    known = ~np.isnan(v)
+    if known.all():
+        return df
+    x = t if method == 'time' else positions.astype(float)
 
-        missing_mask = subset['value'].isna()
-        if missing_mask.any() and not subset['value'].isna().all():
-            reg = LinearRegression()
-            known_x = subset.loc[~missing_mask, 'time_numeric'].values.reshape(-1, 1)
-            known_y = subset.loc[~missing_mask, 'value'].values
-            reg.fit(known_x, known_y)
+    # Nærmeste kjente verdi før og etter hver rad, bare gyldig innenfor samme serie
+    prev = np.maximum.accumulate(np.where(known, positions, -1))
+    next_ = np.minimum.accumulate(np.where(known, positions, n)[::-1])[::-1]
+    has_prev = (prev >= 0) & (g[np.clip(prev, 0, n - 1)] == g)
+    has_next = (next_ < n) & (g[np.clip(next_, 0, n - 1)] == g)
+    prev, next_ = np.clip(prev, 0, n - 1), np.clip(next_, 0, n - 1)
 
-            pred_x = subset.loc[missing_mask, 'time_numeric'].values.reshape(-1, 1)
-            subset.loc[missing_mask, 'value'] = reg.predict(pred_x)
+    filled = v.copy()
+    between = ~known & has_prev & has_next
+    span = x[next_] - x[prev]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(span > 0, (x - x[prev]) / span, 0.0)
+    filled[between] = (v[prev] + weight * (v[next_] - v[prev]))[between]
 
-        df.update(subset.drop(columns=['time_numeric']))
+    edge = ~known & ~between
+    if fallback == 'nearest':
+        filled[edge & has_prev] = v[prev][edge & has_prev]
+        filled[edge & has_next] = v[next_][edge & has_next]
+    elif fallback == 'regression' and edge.any():
+        filled[edge] = _group_regression(g, t, v, known)[edge]
+
+    result = np.empty(n)
+    result[order] = filled
+    df['value'] = result
     return df
 
+def _group_regression(group, x, y, known):
+    """
+    Lineær regresjon y = a + b*x per gruppe på kjente verdier, regnet ut med bincount.
+    Returnerer predikert verdi for alle rader. Grupper med én kjent verdi får konstant linje,
+    grupper uten kjente verdier får NaN.
+    """
+    n_groups = group.max() + 1
+    gk, xk, yk = group[known], x[known], y[known]
+    count = np.bincount(gk, minlength=n_groups).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = np.bincount(gk, weights=xk, minlength=n_groups) / count
+        mean_y = np.bincount(gk, weights=yk, minlength=n_groups) / count
+        dx = xk - mean_x[gk]
+        sxx = np.bincount(gk, weights=dx * dx, minlength=n_groups)
+        sxy = np.bincount(gk, weights=dx * (yk - mean_y[gk]), minlength=n_groups)
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)
+    return mean_y[group] + slope[group] * (x - mean_x[group])
+
 def add_station_metadata(df, stationsdata_path):
     """
     Legger til stasjonsnavn og koordinater hvis metadata er tilgjengelig.
+    Stasjonsfilen leses én gang per prosess og deles, se station_index.py.
     """
     try:
-        metadata = pd.read_csv(stationsdata_path, dtype={'source_id': str})
-        df['sourceId'] = df['sourceId'].astype(str).str.split(':').str[0] # Fjerner spesikikkasjon av hvilke måleinstrument på værstasjonen
-        metadata['source_id'] = metadata['source_id'].astype(str)
-
-        df = df.merge(metadata[['source_id', 'station_name', 'lon', 'lat']],
-                      how='left',
-                      left_on='sourceId',
-                      right_on='source_id')
-        df = df.drop(columns=['source_id'])
+        index = get_station_index(stationsdata_path)
     except FileNotFoundError:
         print(f"Advarsel: Fant ikke fil på {stationsdata_path}. Koordinater og stasjonsnavn blir ikke lagt til.")
-    return df
+        return df
+    return index.join(df) # Fjerner også spesifikasjon av hvilke måleinstrument på værstasjonen fra sourceId
 
-def process_weather_data(df, stationsdata_path=None):
+def process_weather_data(df, stationsdata_path=None, outlier_method='mad', outlier_window=None, keep_outliers=False, profiler=None, cleaned=False):
     """
     Hovedprosess som kjører hele rensingen og prosesseringen.
+    Med cleaned=True er df allerede i formatet fra clean_columns, f.eks. fra ObservationBuffer.
+    Uteliggere finnes per stasjon og datatype med outlier_method og outlier_window (se flag_outliers).
+    Med keep_outliers=True beholdes verdiene, og kolonnen is_outlier tas med i resultatet.
+    Med en StageProfiler (se instrumentation.py) måles tid, rader og minne for hvert steg.
+    """
+    stage = (profiler or NO_PROFILER).run
+    if not cleaned:
+        df = stage('clean_columns', clean_columns, df)
+    df = stage('preprocess_dataframe', preprocess_dataframe, df)
+    df = stage('remove_outliers', _handle_outliers, df, outlier_method, outlier_window, keep_outliers)
+    df = stage('resample_and_aggregate', resample_and_aggregate, df)
+    df = stage('fill_missing_values', fill_missing_values, df)
+
+    if stationsdata_path:
+        df = stage('add_station_metadata', add_station_metadata, df, stationsdata_path)
+
+    return stage('select_output_columns', _select_output_columns, df)
+
+def _handle_outliers(df, method, window, keep_outliers):
+    if keep_outliers:
+        return flag_outliers(df, method, window=window)
+    return remove_outliers(df, method, window=window)
+
+def _select_output_columns(df):
+    columns = ['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit']
+    if 'lon' in df.columns:
+        columns += ['lon', 'lat']
+    if 'is_outlier' in df.columns:
+        columns += ['is_outlier']
+    return apply_schema(df[columns])
+
+"""
+Prosessering i biter med hele stasjoner.
+Hver bit må inneholde hele stasjoner, slik at resampling per dag og stasjon blir lik.
+Både uteliggere og utfylling regnes per stasjon, så hver bit kan behandles ferdig
+for seg i én runde uten felles statistikk. Mellomresultatene fra rensing og resampling
+avhenger derfor av størrelsen på én bit. Minnebruken er likevel bare begrenset når
+bitene kommer fra en iterator som leser dem etter tur, og resultatet skrives til CSV:
+en hel DataFrame som input, eller et resultat i minnet, ligger der uansett i sin helhet.
+"""
+
+def iter_station_chunks(df, stations_per_chunk=50):
+    """
+    Deler resultatet fra json_normalize i biter med stations_per_chunk hele stasjoner.
+    """
+    positions = df.groupby('sourceId', sort=False).indices
+    station_ids = list(positions)
+    for i in range(0, len(station_ids), stations_per_chunk):
+        rows = np.concatenate([positions[s] for s in station_ids[i:i + stations_per_chunk]])
+        yield df.iloc[np.sort(rows)]
+
+def process_weather_data_chunked(chunks, stationsdata_path=None, output_path=None, stations_per_chunk=50,
+                                 outlier_method='mad', outlier_window=None, keep_outliers=False):
+    """
+    Variant av process_weather_data i biter med samme rader. Se over for når minnebruken er begrenset.
+    Args:
+        chunks: Resultatet fra json_normalize, eller en iterator av slike DataFrames der hver inneholder hele stasjoner.
+        stationsdata_path (str): Sti til stasjonsfil, som i process_weather_data.
+        output_path (str): Skriv resultatet bit for bit til denne CSV-filen i stedet for å returnere det.
+        stations_per_chunk (int): Antall stasjoner per bit når chunks er én DataFrame.
+        outlier_method, outlier_window, keep_outliers: Som i process_weather_data.
+    Returnerer en DataFrame, eller antall rader skrevet hvis output_path er satt.
+    DataFrame-en sorteres som i process_weather_data (tidsstempel, deretter opprinnelig rad), så den
+    er lik resultatet derfra med ny indeks, når bitene har indeksen fra json_normalize som i iter_station_chunks.
+    CSV-filen skrives bit for bit og har de samme radene, men i rekkefølgen til bitene.
     """
-    df = clean_columns(df)
-    df = preprocess_dataframe(df)
-    df = remove_outliers(df)
-    df = resample_and_aggregate(df)
-    df = fill_missing_values(df)
+    if isinstance(chunks, pd.DataFrame):
+        chunks = iter_station_chunks(chunks, stations_per_chunk)
+
+    columns = ['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit']
+    results, source_rows, rows_written = [], [], 0
+    for chunk in chunks:
+        df = preprocess_dataframe(clean_columns(chunk))
+        if df.empty:
+            continue
+        df['_row'] = _observation_rows(chunk)[df.index.to_numpy()]
+        df = _handle_outliers(df, outlier_method, outlier_window, keep_outliers)
+        df = fill_missing_values(resample_and_aggregate(df))
+        if stationsdata_path:
+            df = add_station_metadata(df, stationsdata_path)
+        rows = df['_row'].to_numpy()
+        df = _select_output_columns(df)
+        if output_path:
+            df.to_csv(output_path, mode='w' if rows_written == 0 else 'a', header=rows_written == 0, index=False, encoding="utf-8")
+            rows_written += len(df)
+        else:
+            results.append(df)
+            source_rows.append(rows)
+
+    if output_path:
+        if rows_written == 0: # Ingen rader skal ikke etterlate filen fra en tidligere kjøring
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False, encoding="utf-8")
+        return rows_written
+    if not results:
+        return pd.DataFrame(columns=columns)
+    df = apply_schema(pd.concat(results, ignore_index=True)) # Bitene har ulike kategorier
+    # Samme rekkefølge som resample_and_aggregate: tidsstempel, deretter opprinnelig rad
+    times = df['referenceTimestamp'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((np.arange(len(df)), np.concatenate(source_rows), times))
+    return df.iloc[order].reset_index(drop=True)
+
+def _observation_rows(chunk):
+    """
+    Indeksen til raden i chunk for hver observasjon, i samme rekkefølge som clean_columns gir dem.
+    """
+    expanded = chunk['observations'].explode()
+    return expanded.index[expanded.notna().to_numpy()].to_numpy()
+
+"""
+Parallell prosessering i en prosesspool, valgfritt.
+Alt etter clean_columns er uavhengig per stasjon. Rensing og konvertering gjøres derfor
+vektorisert i hovedprosessen, og bare flate kolonner sendes til arbeiderne, i få og store
+deler med hele stasjoner. Resultatene settes sammen i samme rekkefølge som process_weather_data gir.
+"""
+
+def partition_by_station(df, n_partitions):
+    """
+    Deler en renset DataFrame i opptil n_partitions deler med hele stasjoner og omtrent like mange rader.
+    """
+    codes, _ = pd.factorize(df['sourceId'])
+    rows_per_station = np.bincount(codes)
+    start = np.cumsum(rows_per_station) - rows_per_station
+    station_part = (start * n_partitions // max(len(df), 1)).astype(np.intp)
+    row_part = station_part[codes]
+    order = np.argsort(row_part, kind='stable')
+    bounds = np.cumsum(np.bincount(row_part, minlength=n_partitions))[:-1]
+    return [df.iloc[rows] for rows in np.split(order, bounds) if len(rows)]
+
+def _process_partition(df, outlier_method, outlier_window, keep_outliers):
+    df = _handle_outliers(df, outlier_method, outlier_window, keep_outliers)
+    return fill_missing_values(resample_and_aggregate(df))
+
+def process_weather_data_parallel(df, stationsdata_path=None, max_workers=None, executor=None, partitions_per_worker=2,
+                                  outlier_method='mad', outlier_window=None, keep_outliers=False, cleaned=False, profiler=None):
+    """
+    Parallell variant av process_weather_data med samme resultat.
+    Args:
+        df: Resultatet fra json_normalize, eller fra clean_columns/ObservationBuffer med cleaned=True.
+        max_workers (int): Antall prosesser, standard er antall kjerner.
+        executor: En eksisterende ProcessPoolExecutor som kan deles mellom flere kall.
+        partitions_per_worker (int): Antall deler per arbeider, for jevnere fordeling.
+        profiler (StageProfiler): Som i process_weather_data, men uteliggere, resampling og utfylling
+                      blir ett steg, 'process_partitions'. Minnet i arbeiderprosessene måles ikke.
+    """
+    stage = (profiler or NO_PROFILER).run
+    if not cleaned:
+        df = stage('clean_columns', clean_columns, df)
+    df = stage('preprocess_dataframe', preprocess_dataframe, df)
+    workers = max_workers or os.cpu_count() or 1
+    df = stage('process_partitions', _process_partitions, df, workers, executor, partitions_per_worker,
+               (outlier_method, outlier_window, keep_outliers))
 
     if stationsdata_path:
-        df = add_station_metadata(df, stationsdata_path)
+        df = stage('add_station_metadata', add_station_metadata, df, stationsdata_path)
+    return stage('select_output_columns', _select_output_columns, df)
+
+def _process_partitions(df, workers, executor, partitions_per_worker, options):
+    parts = partition_by_station(df, workers * partitions_per_worker)
 
-    return df[['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit', 'lon', 'lat'] if 'lon' in df.columns else ['sourceId', 'referenceTimestamp', 'datatype', 'value', 'unit']]
+    if len(parts) < 2 or (workers == 1 and executor is None):
+        results = [_process_partition(part, *options) for part in parts]
+    elif executor is not None:
+        results = list(executor.map(_process_partition, parts, *(repeat(o) for o in options)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_process_partition, parts, *(repeat(o) for o in options)))
 
+    if not results:
+        return _process_partition(df, *options)
+    # Samme rekkefølge som resample_and_aggregate: tidsstempel, deretter opprinnelig rad
+    df = pd.concat(results)
+    return df.iloc[np.lexsort((df.index.to_numpy(), df['referenceTimestamp'].to_numpy(dtype='datetime64[ns]')))]
@@ -0,0 +1,221 @@
+import os
+import html
+import json
+import zlib
+import base64
+from string import Template
+import numpy as np
+from heatmap_utils import MAP_STYLE, MAPBOX_TOKEN, heat_colormap, mercator_rows, grid_bounds, plot_legend
+
+"""
+Eksport av flere dager som ett animert kart i én HTML-fil.
+I stedet for deck.to_html for én dag, med ett JSON-objekt per gridpunkt, legges alle dagene
+på ett felles rutenett, kvantiseres til én byte per gridpunkt (0 betyr ingen verdi) og
+komprimeres med zlib. Nettleseren pakker ut dataene med DecompressionStream, fargelegger dem
+med samme fargeskala som legenden og viser dem som et bilde i et deck.gl BitmapLayer, med
+glidebryter og avspillingsknapp for datoene.
+"""
+
+LEVELS = 255 # Antall verdinivåer. Nivå 0 er gjennomsiktig (ingen verdi)
+DECKGL_URL = "https://unpkg.com/deck.gl@9.0.*/dist.min.js"
+MAPBOX_GL_URL = "https://api.tiles.mapbox.com/mapbox-gl-js/v1.13.0/mapbox-gl"
+
+
+def quantize(frames, min_val, max_val):
+    """
+    Verdiene som uint8: 1 for min_val eller lavere, LEVELS for max_val eller høyere, og 0 for NaN.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    span = max_val - min_val if max_val > min_val else 1.0
+    levels = 1 + np.rint(np.clip((frames - min_val) / span, 0, 1) * (LEVELS - 1))
+    return np.where(np.isnan(frames), 0, levels).astype(np.uint8)
+
+
+def palette():
+    """
+    RGBA for hvert nivå fra quantize, med fargeskalaen fra heat_colormap. Nivå 0 er gjennomsiktig.
+    """
+    colors = np.zeros((LEVELS + 1, 4), dtype=np.uint8)
+    colors[1:] = heat_colormap()(np.linspace(0, 1, LEVELS), bytes=True)
+    return colors
+
+
+def cube_frames(cube, dates=None):
+    """
+    Dagene fra en InterpolationCube på ett felles rutenett, som dekker alle dagenes rutenett og
+    har like mange punkter som kuben. Hver dag hentes med nærmeste gridpunkt.
+    Returnerer (dates, frames (dag × lat × lon), grid_lon, grid_lat).
+    """
+    dates = [d for d in (cube.dates if dates is None else dates) if d in cube.index]
+    extents = np.array([cube.meta['extents'][cube.index[d]] for d in dates], dtype=np.float64).reshape(-1, 4)
+    grid_res = cube.meta['grid_res']
+    if not len(dates):
+        return dates, np.empty((0, grid_res, grid_res)), np.zeros(grid_res), np.zeros(grid_res)
+    grid_lon = np.linspace(extents[:, 0].min(), extents[:, 1].max(), grid_res)
+    grid_lat = np.linspace(extents[:, 2].min(), extents[:, 3].max(), grid_res)
+
+    frames = np.full((len(dates), grid_res, grid_res), np.nan, dtype=np.float32)
+    for i, selected_date in enumerate(dates):
+        day_lon, day_lat = cube.axes(selected_date)
+        columns = _nearest_index(day_lon, grid_lon)
+        rows = _nearest_index(day_lat, grid_lat)
+        inside = (rows >= 0)[:, None] & (columns >= 0)[None, :]
+        day = np.asarray(cube.grid(selected_date))[np.maximum(rows, 0)[:, None], np.maximum(columns, 0)[None, :]]
+        frames[i][inside] = day[inside]
+    return dates, frames, grid_lon, grid_lat
+
+
+def _nearest_index(axis, targets):
+    """
+    Indeksen i den jevne aksen nærmest hver verdi i targets, eller -1 utenfor aksen.
+    """
+    if len(axis) < 2 or axis[-1] == axis[0]:
+        return np.where(np.isclose(targets, axis[0]), 0, -1)
+    step = (axis[-1] - axis[0]) / (len(axis) - 1)
+    index = np.rint((targets - axis[0]) / step).astype(np.int64)
+    outside = (targets < axis[0] - step / 2) | (targets > axis[-1] + step / 2)
+    return np.where(outside, -1, np.clip(index, 0, len(axis) - 1))
+
+
+def encode_frames(frames, grid_lat, min_val, max_val):
+    """
+    Rader i Mercator-rekkefølge (se mercator_rows), kvantisert og komprimert. Returnerer base64-tekst.
+    """
+    levels = quantize(np.asarray(frames)[:, mercator_rows(grid_lat)], min_val, max_val)
+    return base64.b64encode(zlib.compress(levels.tobytes(), 9)).decode("ascii")
+
+
+def export_animation(path, dates, frames, grid_lon, grid_lat, min_val, max_val, title="Værkart", unit="mm", interval_ms=600):
+    """
+    Skriver dagene som ett animert kart i en selvstendig HTML-fil (bare deck.gl og kartbiblioteket
+    hentes fra nettet). Returnerer størrelsen på filen i bytes.
+    Tittelen og datatypen kommer fra filnavn, så tekst escapes før den settes inn i HTML-en.
+    """
+    frames = np.asarray(frames)
+    west, south, east, north = grid_bounds(grid_lon, grid_lat)
+    legend = plot_legend(min_val, max_val)
+    page = _TEMPLATE.substitute(
+        title=html.escape(title),
+        deckgl_url=DECKGL_URL,
+        mapbox_gl_url=MAPBOX_GL_URL,
+        token=json.dumps(MAPBOX_TOKEN),
+        style=json.dumps(MAP_STYLE),
+        dates=_script_json(list(dates)),
+        shape=json.dumps(list(frames.shape)),
+        bounds=json.dumps([west, south, east, north]),
+        view=json.dumps({"latitude": (south + north) / 2, "longitude": (west + east) / 2, "zoom": 4.5, "pitch": 0}),
+        palette=json.dumps(palette().flatten().tolist()),
+        interval=int(interval_ms),
+        legend=base64.b64encode(legend.getvalue()).decode("ascii"),
+        range=html.escape(f"{min_val:.1f} {unit} – {max_val:.1f} {unit}"),
+        last=max(len(dates) - 1, 0),
+        payload=encode_frames(frames, grid_lat, min_val, max_val),
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return os.path.getsize(path)
+
+
+def _script_json(value):
+    """
+    JSON som trygt kan stå inne i <script>, uten å kunne avslutte taggen.
+    """
+    return json.dumps(value).replace("</", "<\\/")
+
+
+_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8" />
+  <title>$title</title>
+  <script src="$deckgl_url"></script>
+  <script src="$mapbox_gl_url.js"></script>
+  <link href="$mapbox_gl_url.css" rel="stylesheet" />
+  <style>
+    body { margin: 0; font-family: sans-serif; }
+    #map { position: absolute; top: 0; bottom: 0; width: 100%; }
+    #controls { position: absolute; left: 10px; bottom: 10px; right: 10px; padding: 8px 12px; background: rgba(255, 255, 255, 0.9); border-radius: 4px; display: flex; align-items: center; gap: 10px; }
+    #day { flex: 1; }
+    #legend { height: 40px; }
+  </style>
+</head>
+<body>
+  <div id="map"></div>
+  <div id="controls">
+    <button id="play">▶</button>
+    <input id="day" type="range" min="0" max="$last" value="0" step="1" />
+    <span id="date"></span>
+    <img id="legend" src="data:image/png;base64,$legend" title="$range" />
+  </div>
+  <script>
+    const DATES = $dates;
+    const SHAPE = $shape;
+    const BOUNDS = $bounds;
+    const PALETTE = new Uint8Array($palette);
+    const INTERVAL = $interval;
+    const PAYLOAD = "$payload";
+
+    async function decode() {
+      const compressed = Uint8Array.from(atob(PAYLOAD), c => c.charCodeAt(0));
+      const stream = new Blob([compressed]).stream().pipeThrough(new DecompressionStream("deflate"));
+      return new Uint8Array(await new Response(stream).arrayBuffer());
+    }
+
+    async function toBitmaps(levels) {
+      const days = SHAPE[0], rows = SHAPE[1], cols = SHAPE[2], size = rows * cols;
+      const bitmaps = [];
+      for (let d = 0; d < days; d++) {
+        const image = new ImageData(cols, rows);
+        for (let i = 0; i < size; i++) {
+          const k = levels[d * size + i] * 4;
+          image.data[i * 4] = PALETTE[k];
+          image.data[i * 4 + 1] = PALETTE[k + 1];
+          image.data[i * 4 + 2] = PALETTE[k + 2];
+          image.data[i * 4 + 3] = PALETTE[k + 3];
+        }
+        bitmaps.push(await createImageBitmap(image));
+      }
+      return bitmaps;
+    }
+
+    mapboxgl.accessToken = $token;
+    const map = new deck.DeckGL({
+      container: "map",
+      mapStyle: $style,
+      initialViewState: $view,
+      controller: true,
+      layers: []
+    });
+
+    const slider = document.getElementById("day");
+    const label = document.getElementById("date");
+    const button = document.getElementById("play");
+    let bitmaps = [];
+    let timer = null;
+
+    function show(day) {
+      slider.value = day;
+      label.textContent = DATES[day] || "";
+      map.setProps({layers: [new deck.BitmapLayer({id: "frame", image: bitmaps[day], bounds: BOUNDS, opacity: 0.8})]});
+    }
+
+    slider.addEventListener("input", () => show(Number(slider.value)));
+    button.addEventListener("click", () => {
+      if (timer) {
+        clearInterval(timer);
+        timer = null;
+        button.textContent = "▶";
+      } else {
+        timer = setInterval(() => show((Number(slider.value) + 1) % DATES.length), INTERVAL);
+        button.textContent = "⏸";
+      }
+    });
+
+    decode().then(toBitmaps).then(result => {
+      bitmaps = result;
+      if (bitmaps.length) show(0);
+    });
+  </script>
+</body>
+</html>
+""")
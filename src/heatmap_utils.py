@@ -1,13 +1,16 @@
 import os
 import glob
+import base64
+import threading
 import pandas as pd
 import numpy as np
-from scipy.interpolate import griddata
-from scipy.spatial import cKDTree
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 from io import BytesIO
 import pydeck as pdk
+from storage import PartitionedStore
+from schema import compact_loaded, memory_report
+from interpolation import interpolate
 
 """
 Denne metodne leser inn data fra CSV-filer, filtrerer og interpolerer dem,
@@ -28,16 +31,36 @@ MAPBOX_TOKEN = (
 )
 MAP_STYLE = f"mapbox://styles/mapbox/light-v9?access_token={MAPBOX_TOKEN}"
 
-def load_data(data_dir):
+# Navnet på Frost-elementene i heatmap-appen, det samme som prefikset i filnavn som Precipitation_data.csv
+DATATYPE_LABELS = {
+    "sum(precipitation_amount P1D)": "Precipitation",
+    "sum(duration_of_sunshine P1D)": "Sunshine",
+    "max(surface_air_pressure P1D)": "Pressure",
+}
+
+# Innlastede datasett per mappe, med fingeravtrykket av filene de ble lest fra
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+def datatype_label(name):
+    """
+    Navnet på en datatype i heatmap-appen, fra et Frost-element eller prefikset i et filnavn.
+    Navn som ikke står i DATATYPE_LABELS beholdes.
+    """
+    return DATATYPE_LABELS.get(name, name)
+
+def load_data(data_dir, report=False):
     """
     Leser alle CSV-filer i mappen 'data/Jan_2025/' og kombinerer dem til én DataFrame.
-    Hver fil antas å ha format: <datatype>_dato.csv
+    Hver fil antas å ha format: <datatype>_dato.csv eller <element>_<region>.csv (som batch-kjøringen lager),
+    og datatypen blir datatype_label av prefikset, f.eks. 'Precipitation' for begge.
+    Med report=True skrives minnebruken for resultatet.
     """
     dfs = []
     for path in glob.glob(os.path.join(data_dir, "*.csv")):
         print(path)
         fname = os.path.splitext(os.path.basename(path))[0]
-        mtype = fname.split("_")[0]
+        mtype = datatype_label(fname.rsplit("_", 1)[0])
 
         df = pd.read_csv(path)
         df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], utc=True)
@@ -45,7 +68,98 @@ def load_data(data_dir):
         df["datatype"] = mtype
         dfs.append(df)
 
-    return pd.concat(dfs, ignore_index=True)
+    return _compact(pd.concat(dfs, ignore_index=True), data_dir, report)
+
+def _compact(df, name, report):
+    """
+    Kompakt skjema (se schema.compact_loaded), og datoene som kategorier siden de gjentas for hver stasjon.
+    """
+    df = compact_loaded(df, name, report=False)
+    df[TIMESTAMP] = df[TIMESTAMP].astype("category")
+    if report:
+        memory_report(df, name)
+    return df
+
+def load_data_from_store(store_dir, datatype=None, start=None, end=None, report=False):
+    """
+    Leser fra kolonnelageret (se storage.py) i stedet for CSV, med samme format som load_data.
+    Lageret bruker Frost-elementene, som gjøres om til de samme datatypene som i load_data
+    med datatype_label. datatype kan være enten datatypen eller elementet.
+    Med start og end, f.eks. én dag, leses bare radene i det tidsrommet. report som i load_data.
+    """
+    elements = None
+    if datatype is not None:
+        elements = [element for element, label in DATATYPE_LABELS.items() if label == datatype] or [datatype]
+    df = PartitionedStore(store_dir).read(element=elements, start=start, end=end)
+    if not df.empty:
+        df[TIMESTAMP] = df[TIMESTAMP].dt.date.astype(str)
+        df["datatype"] = df["datatype"].astype(str).map(datatype_label)
+    return _compact(df, store_dir, report)
+
+def data_fingerprint(data_dir):
+    """
+    (filnavn, endringstid, størrelse) for hver CSV-fil i mappen. Endres når en fil
+    legges til, fjernes eller skrives på nytt, og er billig å regne ut ved hver rerun.
+    """
+    fingerprint = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        stat = os.stat(path)
+        fingerprint.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+class HeatmapDataset:
+    """
+    Data for heatmap-appen med verdiene som ellers regnes ut ved hver rerun:
+    sorterte datatyper og datoer, maksverdi per datatype og radene per (datatype, dato),
+    slik at filtreringen for én dag er et oppslag i stedet for et søk gjennom alle rader.
+    """
+    def __init__(self, df):
+        self.df = df
+        self.datatypes = sorted(df['datatype'].dropna().unique())
+        self.dates = sorted(df[TIMESTAMP].dropna().unique())
+        self.max_values = df.groupby('datatype', observed=True)[VALUE].max().to_dict()
+        self.rows = df.groupby(['datatype', TIMESTAMP], observed=True).indices
+
+    def max_value(self, datatype):
+        return self.max_values.get(datatype, np.nan)
+
+    def filter(self, datatype, selected_date, max_value=None):
+        """
+        Samme resultat som filter_data(self.df, ...). Standard max_value er maksverdien for datatypen.
+        """
+        max_value = self.max_value(datatype) if max_value is None else max_value
+        positions = self.rows.get((datatype, selected_date), np.array([], dtype=np.intp))
+        df2 = self.df.take(positions)
+        df2['scaled_value'] = df2[VALUE] / max_value
+        df2['scaled_value'] = df2['scaled_value'].clip(0, 1)
+        return df2
+
+def get_heatmap_dataset(data_dir):
+    """
+    Delt HeatmapDataset for mappen. CSV-filene leses bare på nytt når data_fingerprint endres,
+    så en rerun i Streamlit koster bare en glob og stat av filene.
+    """
+    version = data_fingerprint(data_dir)
+    key = os.path.abspath(data_dir)
+    with _datasets_lock:
+        cached = _datasets.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    dataset = HeatmapDataset(load_data(data_dir))
+    with _datasets_lock:
+        _datasets[key] = (version, dataset)
+    return dataset
+
+def clear_heatmap_cache(data_dir=None):
+    """
+    Glemmer innlastede datasett, for én mappe eller alle.
+    """
+    with _datasets_lock:
+        if data_dir is None:
+            _datasets.clear()
+        else:
+            _datasets.pop(os.path.abspath(data_dir), None)
 
 def filter_data(df, datatype, selected_date, max_value):
     """
@@ -62,10 +176,11 @@ def filter_data(df, datatype, selected_date, max_value):
 
     return df2
 
-def interpolate_data(df, grid_res=200, cutoff_radius_km=75):
+def interpolate_data(df, grid_res=200, cutoff_radius_km=75, engine='cubic', **options):
     """
     Interpolerer måledata over et rutenett (grid), men ekskluderer områder
     som ligger for langt unna et faktisk datapunkt.
+    engine velger interpolasjonen: 'cubic' (standard), 'linear', 'nearest' eller 'idw' (se interpolation.py).
     """
     df_clean = df.dropna(subset=[LON, LAT, 'scaled_value'])
 
@@ -75,34 +190,29 @@ def interpolate_data(df, grid_res=200, cutoff_radius_km=75):
     # Lag et jevnt grid over området
     grid_lon = np.linspace(df_clean[LON].min(), df_clean[LON].max(), grid_res)
     grid_lat = np.linspace(df_clean[LAT].min(), df_clean[LAT].max(), grid_res)
-    grid_x, grid_y = np.meshgrid(grid_lon, grid_lat)
-    grid_points = np.c_[grid_x.flatten(), grid_y.flatten()]
 
     # Punktverdier fra rådata
     points = df_clean[[LON, LAT]].values
     values = df_clean['scaled_value'].values
+    grid_z = interpolate_grid(points, values, grid_lon, grid_lat, cutoff_radius_km, engine, **options)
 
-    # Interpoler verdier til grid-punktene
-    grid_z = griddata(points, values, (grid_x, grid_y), method='cubic')
-
-    # Avstand fra hvert gridpunkt til nærmeste datapunkt
-    tree = cKDTree(points)
-    dist, _ = tree.query(grid_points, k=1)
-    dist_km = dist * 111  # grader til km
-
-    # Fjern grid-punkter som er for langt unna
-    grid_z_flat = grid_z.flatten()
-    grid_z_flat[dist_km > cutoff_radius_km] = np.nan
-
-    # Returner som DataFrame
+    # Returner gridpunktene med verdi som DataFrame, med posisjonen i hele rutenettet som indeks
+    rows, columns = np.nonzero(~np.isnan(grid_z))
     interp_df = pd.DataFrame({
-        LON: grid_points[:, 0],
-        LAT: grid_points[:, 1],
-        'scaled_value': grid_z_flat
-    }).dropna()
+        LON: grid_lon[columns],
+        LAT: grid_lat[rows],
+        'scaled_value': grid_z[rows, columns]
+    }, index=rows * grid_res + columns)
 
     return interp_df
 
+def interpolate_grid(points, values, grid_lon, grid_lat, cutoff_radius_km=75, engine='cubic', **options):
+    """
+    Interpolerer values i points (lon, lat) til rutenettet grid_lat × grid_lon med motoren engine.
+    Returnerer en 2-D array (lat × lon) med NaN der nærmeste punkt er lenger unna enn cutoff_radius_km.
+    """
+    return interpolate(points, values, grid_lon, grid_lat, cutoff_radius_km, engine, **options)
+
 def make_map(df, radius, intensity, threshold):
     """
     Lager et pydeck heatmap basert på input-data.
@@ -136,15 +246,97 @@ def make_map(df, radius, intensity, threshold):
         map_style=MAP_STYLE
     )
 
-def plot_legend(min_val, max_val):
+def mercator_y(lat):
     """
-    Lager en fargeskala/legende for nedbørverdier.
-    Returnerer som bilde i minnet (BytesIO).
+    Web Mercator y (uten skalering) for breddegraden, som kartet og pydeck bruker.
+    """
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+def mercator_rows(grid_lat, n_rows=None):
+    """
+    For hver rad i bildet, ovenfra og ned, raden i rutenettet (stigende grid_lat) som ligger nærmest.
+    Bildet strekkes lineært i Mercator mellom hjørnene, mens rutenettet er jevnt i breddegrad,
+    så radene velges jevnt i Mercator y for at bildet skal ligge riktig på kartet.
+    """
+    grid_lat = np.asarray(grid_lat, dtype=np.float64)
+    n_rows = n_rows or len(grid_lat)
+    half = (grid_lat[-1] - grid_lat[0]) / (len(grid_lat) - 1) / 2 if len(grid_lat) > 1 else 0.0
+    top, bottom = mercator_y(grid_lat[-1] + half), mercator_y(grid_lat[0] - half)
+    centres = top - (np.arange(n_rows) + 0.5) * (top - bottom) / n_rows
+    lat = np.degrees(2 * np.arctan(np.exp(centres)) - np.pi / 2)
+    return np.abs(grid_lat[None, :] - lat[:, None]).argmin(axis=1)
+
+def grid_bounds(grid_lon, grid_lat):
+    """
+    [vest, sør, øst, nord] for bildet av rutenettet, med en halv celle utenfor gridpunktene på hver side.
+    """
+    half_lon = (grid_lon[-1] - grid_lon[0]) / (len(grid_lon) - 1) / 2 if len(grid_lon) > 1 else 0.0
+    half_lat = (grid_lat[-1] - grid_lat[0]) / (len(grid_lat) - 1) / 2 if len(grid_lat) > 1 else 0.0
+    return [float(grid_lon[0] - half_lon), float(grid_lat[0] - half_lat),
+            float(grid_lon[-1] + half_lon), float(grid_lat[-1] + half_lat)]
+
+def render_grid_png(grid, grid_lat, min_val, max_val):
+    """
+    Tegner et interpolert rutenett (lat × lon, stigende grid_lat) som PNG med samme fargeskala
+    som plot_legend fra min_val til max_val. Gridpunkter uten verdi (NaN) blir gjennomsiktige.
+    Returnerer PNG-filen som bytes.
+    """
+    grid = np.asarray(grid, dtype=np.float64)[mercator_rows(grid_lat)]
+    norm = mpl.colors.Normalize(vmin=min_val, vmax=max_val, clip=True)
+    rgba = heat_colormap()(norm(np.nan_to_num(grid, nan=min_val)), bytes=True)
+    rgba[np.isnan(grid)] = 0
+
+    buf = BytesIO()
+    plt.imsave(buf, rgba, format="png", pil_kwargs={"optimize": True})
+    return buf.getvalue()
+
+def make_bitmap_map(grid, grid_lon, grid_lat, min_val, max_val, opacity=0.8):
+    """
+    Som make_map, men rutenettet sendes som ett PNG-bilde i et BitmapLayer i stedet for ett
+    punkt per gridpunkt. Størrelsen på kartet avhenger da ikke av antall gridpunkter.
+    """
+    if grid is None or np.isnan(grid).all():
+        return None  # Ikke vis noe hvis det ikke er data
+
+    west, south, east, north = grid_bounds(grid_lon, grid_lat)
+    image = "data:image/png;base64," + base64.b64encode(render_grid_png(grid, grid_lat, min_val, max_val)).decode("ascii")
+    view_state = pdk.ViewState(
+        latitude=(south + north) / 2,
+        longitude=(west + east) / 2,
+        zoom=6,
+        pitch=0
+    )
+
+    # Pydeck bildelag. Strenger i anførselstegn sendes som tekst og ikke som uttrykk
+    layer = pdk.Layer(
+        "BitmapLayer",
+        data=None,
+        image=f'"{image}"',
+        bounds=[west, south, east, north],
+        opacity=opacity
+    )
+
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=view_state,
+        map_style=MAP_STYLE
+    )
+
+def heat_colormap():
+    """
+    Fargeskalaen hvit-gul-rød som brukes i legenden og i bildene fra render_grid_png.
     """
     from matplotlib.colors import LinearSegmentedColormap
 
     colors = ["white", "yellow", "red"]  # Fargeskala
-    cmap = LinearSegmentedColormap.from_list("custom_heat", colors)
+    return LinearSegmentedColormap.from_list("custom_heat", colors)
+
+def plot_legend(min_val, max_val):
+    """
+    Lager en fargeskala/legende for nedbørverdier.
+    Returnerer som bilde i minnet (BytesIO).
+    """
+    cmap = heat_colormap()
 
     fig, ax = plt.subplots(figsize=(6, 0.5))
     fig.subplots_adjust(bottom=0.5)
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+
+"""
+Måling av tid, rader inn/ut og minnetopp per steg i prosesseringen og hentingen.
+Et StageProfiler-objekt sendes inn i process_weather_data eller FrostDataFetcher, og
+hvert steg blir én post i rapporten. Steg inne i andre steg får navn som
+'process/clean_columns'. Rapporten kan hentes som liste eller DataFrame, skrives ut,
+eller legges til i en JSON Lines-fil, én linje per steg, for å følge utviklingen over tid.
+
+Minnetoppen måles med tracemalloc, som også teller numpy og pandas sine arrays. tracemalloc har
+én topp for hele prosessen, og et steg nullstiller den når det starter. Derfor måler bare én tråd
+minne om gangen: steg som starter i andre tråder mens den måler, får peak_mb None i stedet for å
+nullstille toppen til den første. Allokeringer i de andre trådene telles likevel med, så med
+flere tråder kan tallene bli for høye. Mål minne med én arbeider for pålitelige tall.
+tracemalloc gjør koden tregere, så måling av minne kan slås av med track_memory=False.
+"""
+
+_file_lock = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing_users = [0] # Antall steg som måler minne nå, så tracemalloc bare stoppes av det siste
+_tracing_owner = [None] # Tråden som måler minne nå
+_tracing_started = [False] # Om tracemalloc ble startet her og skal stoppes av det siste steget
+
+
+def _rows(obj):
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+class StageProfiler:
+    def __init__(self, name="run", track_memory=True, jsonl_path=None):
+        """
+        name: Navn på kjøringen, tas med i hver post, f.eks. jobbnavnet.
+        jsonl_path: Fil som hver post legges til i når steget er ferdig.
+        """
+        self.name = name
+        self.track_memory = track_memory
+        self.jsonl_path = jsonl_path
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, stage_name, rows_in=None):
+        """
+        Måler en blokk. Sett record['rows_out'] i blokken for å registrere rader ut.
+        Minne måles bare hvis ingen annen tråd måler minne nå, ellers blir peak_mb None.
+        """
+        tracked = False
+        frame = {"name": stage_name, "peak": 0}
+        if self.track_memory:
+            with _tracing_lock:
+                if _tracing_owner[0] in (None, threading.get_ident()):
+                    tracked = True
+                    if _tracing_users[0] == 0:
+                        _tracing_owner[0] = threading.get_ident()
+                        _tracing_started[0] = not tracemalloc.is_tracing() # Ellers startet utenfra
+                        if _tracing_started[0]:
+                            tracemalloc.start()
+                    _tracing_users[0] += 1
+        if tracked:
+            # Toppen nullstilles for dette steget, så steg utenfor tar vare på toppen så langt
+            peak = tracemalloc.get_traced_memory()[1]
+            for outer in self._stack:
+                outer["peak"] = max(outer["peak"], peak)
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        self._stack.append(frame)
+        record = {
+            "run": self.name,
+            "stage": "/".join(f["name"] for f in self._stack),
+            "started": datetime.now(timezone.utc).isoformat(),
+            "seconds": None,
+            "rows_in": rows_in,
+            "rows_out": None,
+            "peak_mb": None,
+        }
+        self.records.append(record) # I rekkefølgen stegene starter, så ytre steg kommer først
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._stack.pop()
+            if tracked:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_mb"] = max(peak - memory_before, 0) / 1e6
+                with _tracing_lock:
+                    _tracing_users[0] -= 1
+                    if _tracing_users[0] == 0:
+                        _tracing_owner[0] = None
+                        if _tracing_started[0]:
+                            tracemalloc.stop()
+            if self.jsonl_path:
+                self._write(record)
+
+    def run(self, stage_name, func, data, *args, **kwargs):
+        """
+        Kjører func(data, *args, **kwargs) som ett steg, med rader inn og ut fra len().
+        """
+        with self.stage(stage_name, rows_in=_rows(data)) as record:
+            result = func(data, *args, **kwargs)
+            record["rows_out"] = _rows(result)
+        return result
+
+    def _write(self, record):
+        directory = os.path.dirname(os.path.abspath(self.jsonl_path))
+        os.makedirs(directory, exist_ok=True)
+        with _file_lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def report(self):
+        """
+        Postene som en DataFrame, i rekkefølgen stegene startet.
+        """
+        return pd.DataFrame(self.records, columns=["run", "stage", "started", "seconds", "rows_in", "rows_out", "peak_mb"])
+
+    def summary(self):
+        """
+        Skriver en tabell med tid, rader og minnetopp per steg.
+        """
+        print(f"Profil for {self.name}:")
+        for record in self.records:
+            depth = record["stage"].count("/")
+            name = "  " * depth + record["stage"].split("/")[-1]
+            rows = f"{record['rows_in']} -> {record['rows_out']}" if record["rows_in"] is not None else ""
+            memory = f"{record['peak_mb']:.1f} MB" if record["peak_mb"] is not None else ""
+            print(f"  {name:<32} {record['seconds']:8.3f} s  {rows:>24}  {memory:>10}")
+
+
+class _NoProfiler:
+    """
+    Brukes når ingen profiler er gitt, og kjører bare funksjonen.
+    """
+    @contextmanager
+    def stage(self, stage_name, rows_in=None):
+        yield {}
+
+    def run(self, stage_name, func, data, *args, **kwargs):
+        return func(data, *args, **kwargs)
+
+
+NO_PROFILER = _NoProfiler()
+
+def load_profile(path):
+    """
+    Leser en JSON Lines-fil skrevet av StageProfiler til en DataFrame.
+    """
+    return pd.read_json(path, lines=True)
@@ -0,0 +1,292 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+from scipy.spatial import Delaunay, cKDTree
+from scipy.interpolate import CloughTocher2DInterpolator, griddata
+
+"""
+Romlig interpolasjon for heatmapene, med flere motorer bak samme API.
+- cubic og linear: griddata (Clough-Tocher og barysentrisk) over en Delaunay-triangulering.
+  Gir ingenting utenfor det konvekse skallet til stasjonene.
+- nearest og idw: nærmeste stasjon og invers avstandsvekting av de k nærmeste, med et
+  cKDTree i projiserte koordinater (km). Fyller også utenfor skallet.
+For alle motorene blir gridpunkter lenger unna enn cutoff_radius_km fra nærmeste stasjon NaN,
+med samme regel (grader × 111) som interpolate_data alltid har brukt. Masken over disse
+gridpunktene lages én gang per stasjonssett og rutenett, og bare punktene innenfor interpoleres.
+
+Når stasjonene er de samme fra dag til dag, kan triangulering, naboer, vekter og cutoff-maske
+regnes ut én gang (GridInterpolator). Alle motorene er lineære i verdiene, så en ny dag er da
+bare et matriseprodukt mellom vektene og verdivektoren.
+"""
+
+KM_PER_DEGREE = 111.0
+DEFAULT_K = 8
+DEFAULT_POWER = 2
+
+# Antall tilpassede interpolatorer som holdes i minnet (en kubisk med 130 stasjoner på 200×200 er ~20 MB)
+MAX_CACHED = 8
+# Antall cutoff-masker for rutenett som holdes i minnet (200×200 er 40 kB)
+MAX_CACHED_MASKS = 64
+
+_interpolators = OrderedDict()
+_interpolators_lock = threading.Lock()
+_masks = OrderedDict()
+_masks_lock = threading.Lock()
+
+
+def project_km(points, lat0):
+    """
+    Ekvirektangulær projeksjon av (lon, lat) til km rundt breddegraden lat0, slik at
+    avstandene i øst-vest-retning blir riktige også nord i landet.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    return np.c_[points[:, 0] * KM_PER_DEGREE * np.cos(np.radians(lat0)), points[:, 1] * KM_PER_DEGREE]
+
+
+def neighbour_weights(points, xi, k=DEFAULT_K, power=DEFAULT_POWER):
+    """
+    Indeksene til de k nærmeste stasjonene for hvert punkt i xi, og normaliserte vekter 1 / avstand**power.
+    Et punkt som ligger på en stasjon får bare verdien til den stasjonen.
+    """
+    lat0 = float(np.mean(np.asarray(points)[:, 1]))
+    k = min(k, len(points))
+    dist, idx = cKDTree(project_km(points, lat0)).query(project_km(xi, lat0), k=k)
+    dist, idx = dist.reshape(len(xi), k), idx.reshape(len(xi), k)
+    with np.errstate(divide='ignore'):
+        weights = 1 / dist ** power
+    exact = dist[:, 0] == 0
+    weights[exact] = 0
+    weights[exact, 0] = 1
+    return idx, weights / weights.sum(axis=1, keepdims=True)
+
+
+def _griddata(method):
+    def engine(points, values, xi):
+        return griddata(points, values, xi, method=method)
+    return engine
+
+
+def _idw(points, values, xi, k=DEFAULT_K, power=DEFAULT_POWER):
+    idx, weights = neighbour_weights(points, xi, k, power)
+    return (weights * np.asarray(values, dtype=np.float64)[idx]).sum(axis=1)
+
+
+def _nearest(points, values, xi):
+    return _idw(points, values, xi, k=1)
+
+
+# Motorene tar punkter (n × 2), verdier (n) og punktene det skal interpoleres til (m × 2)
+ENGINES = {
+    'cubic': _griddata('cubic'),
+    'linear': _griddata('linear'),
+    'nearest': _nearest,
+    'idw': _idw,
+}
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Ukjent motor '{engine}', bruk en av {tuple(ENGINES)}")
+
+
+def cutoff_mask(points, xi, cutoff_radius_km):
+    """
+    True for punktene i xi som ligger lenger unna enn cutoff_radius_km fra nærmeste stasjon.
+    """
+    bound = cutoff_radius_km / KM_PER_DEGREE
+    dist, _ = cKDTree(points).query(xi, k=1, distance_upper_bound=np.nextafter(bound, np.inf))
+    return dist * KM_PER_DEGREE > cutoff_radius_km
+
+
+def _disc_mask(points, grid_lon, grid_lat, cutoff_radius_km):
+    """
+    Gridpunktene innenfor cutoff_radius_km fra minst én stasjon, ved å merke sirkelen rundt hver
+    stasjon i et lite vindu av rutenettet. Samme regel som cutoff_mask, men uten å slå opp hvert gridpunkt.
+    """
+    radius = cutoff_radius_km / KM_PER_DEGREE
+    mask = np.zeros((len(grid_lat), len(grid_lon)), dtype=bool)
+    for lon, lat in points:
+        i0 = np.searchsorted(grid_lat, lat - radius, side='left')
+        i1 = np.searchsorted(grid_lat, lat + radius, side='right')
+        j0 = np.searchsorted(grid_lon, lon - radius, side='left')
+        j1 = np.searchsorted(grid_lon, lon + radius, side='right')
+        if i0 >= i1 or j0 >= j1:
+            continue
+        dy = grid_lat[i0:i1, None] - lat
+        dx = grid_lon[None, j0:j1] - lon
+        mask[i0:i1, j0:j1] |= np.sqrt(dx * dx + dy * dy) * KM_PER_DEGREE <= cutoff_radius_km
+    return mask
+
+
+def grid_mask(points, grid_lon, grid_lat, cutoff_radius_km=75):
+    """
+    Delt maske (lat × lon) over gridpunktene som ligger innenfor cutoff_radius_km fra en stasjon.
+    grid_lon og grid_lat må være stigende, som fra np.linspace. Masken regnes ut én gang per
+    stasjonssett og rutenett, og de MAX_CACHED_MASKS sist brukte holdes i minnet.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    grid_lon = np.asarray(grid_lon, dtype=np.float64)
+    grid_lat = np.asarray(grid_lat, dtype=np.float64)
+    key = _key(points, grid_lon, grid_lat, cutoff_radius_km, None, {})
+    with _masks_lock:
+        if key in _masks:
+            _masks.move_to_end(key)
+            return _masks[key]
+    mask = _disc_mask(points, grid_lon, grid_lat, cutoff_radius_km)
+    mask.setflags(write=False)
+    with _masks_lock:
+        _masks[key] = mask
+        while len(_masks) > MAX_CACHED_MASKS:
+            _masks.popitem(last=False)
+    return mask
+
+
+def evaluate(points, values, xi, cutoff_radius_km=75, engine='cubic', **options):
+    """
+    Interpolerer verdiene i points til punktene xi med motoren, og NaN utenfor cutoff-radiusen.
+    Motoren kjøres bare for punktene innenfor radiusen.
+    """
+    _check_engine(engine)
+    points = np.asarray(points, dtype=np.float64)
+    xi = np.asarray(xi, dtype=np.float64)
+    inside = ~cutoff_mask(points, xi, cutoff_radius_km)
+    result = np.full(len(xi), np.nan)
+    if inside.any():
+        result[inside] = ENGINES[engine](points, values, xi[inside], **options)
+    return result
+
+
+def interpolate(points, values, grid_lon, grid_lat, cutoff_radius_km=75, engine='cubic', **options):
+    """
+    Interpolerer til rutenettet grid_lat × grid_lon. Returnerer en 2-D array (lat × lon).
+    Bare gridpunktene innenfor cutoff-radiusen (se grid_mask) interpoleres, resten blir NaN.
+    """
+    _check_engine(engine)
+    points = np.asarray(points, dtype=np.float64)
+    grid_lon = np.asarray(grid_lon, dtype=np.float64)
+    grid_lat = np.asarray(grid_lat, dtype=np.float64)
+    rows, columns = np.nonzero(grid_mask(points, grid_lon, grid_lat, cutoff_radius_km))
+    result = np.full((len(grid_lat), len(grid_lon)), np.nan)
+    if len(rows):
+        result[rows, columns] = ENGINES[engine](points, values, np.c_[grid_lon[columns], grid_lat[rows]], **options)
+    return result
+
+
+def leave_one_out(points, values, grid_lon, grid_lat, cutoff_radius_km=75, engine='cubic', **options):
+    """
+    For hver stasjon: verdien heatmapet viser i gridpunktet nærmest stasjonen når stasjonen er
+    utelatt fra interpolasjonen. NaN der motoren ikke gir noen verdi (utenfor skallet eller cutoff).
+    Feilen avhenger dermed både av motoren og av hvor fint rutenettet er.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    grid_lon, grid_lat = np.asarray(grid_lon), np.asarray(grid_lat)
+    predictions = np.full(len(points), np.nan)
+    for i in range(len(points)):
+        others = np.arange(len(points)) != i
+        node = [[grid_lon[np.abs(grid_lon - points[i, 0]).argmin()], grid_lat[np.abs(grid_lat - points[i, 1]).argmin()]]]
+        try:
+            predictions[i] = evaluate(points[others], values[others], node, cutoff_radius_km, engine, **options)[0]
+        except ValueError:  # QhullError, f.eks. for få stasjoner igjen til en triangulering
+            pass
+    return predictions
+
+
+class GridInterpolator:
+    """
+    Triangulering eller naboer, vekter og cutoff-maske for ett sett med punkter (lon, lat) og
+    ett rutenett. 'linear' gir barysentriske vekter (tre per gridpunkt), 'nearest' og 'idw' gir
+    én og k vekter per gridpunkt, alle som glisne matriser. 'cubic' gir Clough-Tocher-
+    interpolasjonen fra griddata som en tett matrise. Gir samme resultat som interpolate().
+    """
+    def __init__(self, points, grid_lon, grid_lat, cutoff_radius_km=75, method='cubic', **options):
+        _check_engine(method)
+        self.points = np.asarray(points, dtype=np.float64)
+        self.method = method
+        self.shape = (len(grid_lat), len(grid_lon))
+        grid_x, grid_y = np.meshgrid(grid_lon, grid_lat)
+        xi = np.c_[grid_x.flatten(), grid_y.flatten()]
+
+        inside = grid_mask(self.points, grid_lon, grid_lat, cutoff_radius_km).flatten()
+        n = len(self.points)
+        if method in ('nearest', 'idw'):
+            self.cells = np.flatnonzero(inside)
+            k = 1 if method == 'nearest' else options.get('k', DEFAULT_K)
+            idx, weights = neighbour_weights(self.points, xi[self.cells], k, options.get('power', DEFAULT_POWER))
+            rows = np.repeat(np.arange(len(self.cells)), idx.shape[1])
+            self.weights = sparse.csr_matrix((weights.flatten(), (rows, idx.flatten())), shape=(len(self.cells), n))
+            return
+
+        tri = Delaunay(self.points)
+        simplex = tri.find_simplex(xi)
+        self.cells = np.flatnonzero(inside & (simplex >= 0))
+        if method == 'linear':
+            transform = tri.transform[simplex[self.cells]]
+            b = np.einsum('ijk,ik->ij', transform[:, :2], xi[self.cells] - transform[:, 2])
+            weights = np.c_[b, 1 - b.sum(axis=1)]
+            rows = np.repeat(np.arange(len(self.cells)), 3)
+            columns = tri.simplices[simplex[self.cells]].flatten()
+            self.weights = sparse.csr_matrix((weights.flatten(), (rows, columns)), shape=(len(self.cells), n))
+        else:
+            # Kolonne j er interpolasjonen av enhetsvektoren for punkt j
+            self.weights = CloughTocher2DInterpolator(tri, np.eye(n))(xi[self.cells]).astype(np.float32)
+
+    def __call__(self, values):
+        """
+        Interpolerer verdiene i punktene (samme rekkefølge som points). Med én verdivektor
+        returneres et rutenett (lat × lon). Med en matrise (punkter × dager) interpoleres alle
+        dagene i ett matriseprodukt, og resultatet har formen (dag, lat, lon).
+        """
+        values = np.asarray(values, dtype=self.weights.dtype)
+        result = np.full((self.shape[0] * self.shape[1],) + values.shape[1:], np.nan)
+        result[self.cells] = self.weights @ values
+        if values.ndim == 1:
+            return result.reshape(self.shape)
+        return np.moveaxis(result, 1, 0).reshape((values.shape[1],) + self.shape)
+
+
+def _key(points, grid_lon, grid_lat, cutoff_radius_km, method, options):
+    digest = hashlib.sha1()
+    for array in (points, grid_lon, grid_lat):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest(), float(cutoff_radius_km), method, tuple(sorted(options.items()))
+
+
+def get_interpolator(points, grid_lon, grid_lat, cutoff_radius_km=75, method='cubic', **options):
+    """
+    Delt GridInterpolator for punktene og rutenettet. De sist brukte MAX_CACHED holdes i minnet.
+    """
+    key = _key(points, grid_lon, grid_lat, cutoff_radius_km, method, options)
+    with _interpolators_lock:
+        if key in _interpolators:
+            _interpolators.move_to_end(key)
+            return _interpolators[key]
+    interpolator = GridInterpolator(points, grid_lon, grid_lat, cutoff_radius_km, method, **options)
+    with _interpolators_lock:
+        _interpolators[key] = interpolator
+        while len(_interpolators) > MAX_CACHED:
+            _interpolators.popitem(last=False)
+    return interpolator
+
+
+def clear_interpolator_cache():
+    """
+    Glemmer delte interpolatorer og masker.
+    """
+    with _interpolators_lock:
+        _interpolators.clear()
+    with _masks_lock:
+        _masks.clear()
+
+
+def interpolate_cached(points, values, grid_lon, grid_lat, cutoff_radius_km=75, method='cubic', **options):
+    """
+    Som interpolate(), men med en delt GridInterpolator. Punktene sorteres først, så samme
+    stasjoner i en annen rekkefølge bruker samme interpolator.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    interpolator = get_interpolator(points[order], grid_lon, grid_lat, cutoff_radius_km, method, **options)
+    return interpolator(np.asarray(values)[order])
@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from heatmap_utils import LON, LAT, VALUE, interpolate_grid, data_fingerprint
+from interpolation import interpolate_cached
+
+"""
+Forhåndsberegnet interpolasjon for heatmap-appen.
+I stedet for å kjøre griddata og cKDTree hver gang datoen endres, interpoleres hver dag
+for en datatype én gang inn i en 3-D array (dato × lat × lon). Arrayen lagres som .npy
+ved siden av dataene og åpnes med minnemapping, så ett bilde er et utsnitt av arrayen.
+Når nye dager kommer til, interpoleres bare dagene med nye eller endrede målinger.
+"""
+
+CUBE_DIR = ".cube"
+
+# Tilpasning av en kubisk GridInterpolator koster fra 3 til 20 kall til griddata, etter hvor
+# mange gridpunkter som ligger innenfor cutoff-radiusen, så den brukes bare for stasjonssett
+# som går igjen i minst så mange dager
+REUSE_MIN_DAYS = 8
+# Antall dager som interpoleres i samme matriseprodukt
+BLOCK_DAYS = 32
+
+# Åpne kuber per sti, med fingeravtrykket av dataene de ble bygget fra
+_cubes = {}
+_cubes_lock = threading.Lock()
+# Én lås per sti rundt bygging og bytte, siden Streamlit kjører øktene i hver sin tråd
+_build_locks = {}
+
+
+def cube_path(data_dir, datatype, engine='cubic'):
+    """
+    Mappen for kuben til en datatype, under <data_dir>/.cube/. Andre motorer enn 'cubic' får egen kube.
+    """
+    name = re.sub(r"[^\w.-]+", "_", str(datatype)).strip("_") or "datatype"
+    if engine != 'cubic':
+        name = f"{name}-{engine}"
+    return os.path.join(data_dir, CUBE_DIR, name)
+
+
+def _interpolate_day(day, grid_lon, grid_lat, cutoff_radius_km, engine, datatype, selected_date):
+    """
+    Interpolerer én dag med interpolate_grid. Gir NaN hvis trianguleringen feiler.
+    """
+    try:
+        return interpolate_grid(day[[LON, LAT]].values, day[VALUE].clip(lower=0).values, grid_lon, grid_lat, cutoff_radius_km, engine)
+    except ValueError as e:  # QhullError er en ValueError, f.eks. når alle stasjonene ligger på en linje
+        print(f"Kunne ikke interpolere {datatype} {selected_date}: {e}")
+        return np.nan
+
+
+def _parameters(meta):
+    return meta['grid_res'], meta['cutoff_radius_km'], meta.get('engine', 'cubic')
+
+
+def _station_key(day):
+    """
+    Stasjonene for én dag, uavhengig av rekkefølgen.
+    """
+    return frozenset(zip(day[LON].tolist(), day[LAT].tolist()))
+
+
+def _day_digest(day):
+    """
+    Sjekksum av posisjonene og verdiene for én dag. Lik sjekksum betyr at dagen ikke må interpoleres på nytt.
+    """
+    digest = hashlib.sha1()
+    for column in (LON, LAT, VALUE):
+        digest.update(np.ascontiguousarray(day[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+class InterpolationCube:
+    """
+    En lagret kube, åpnet med minnemapping. values har formen (dato, lat, lon) med
+    uskalerte verdier (negative verdier satt til 0), og NaN utenfor cutoff-radiusen.
+    Som i interpolate_data dekker rutenettet for hver dato stasjonene som har målinger den dagen,
+    og hjørnene står i meta['extents'].
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.dates = self.meta['dates']
+        self.index = {date: i for i, date in enumerate(self.dates)}
+        self.values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+
+    @classmethod
+    def open(cls, path):
+        """
+        Åpner kuben i path, eller returnerer None hvis den mangler eller ikke kan leses.
+        """
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Kunne ikke lese kuben i {path}: {e}")
+            return None
+
+    def __len__(self):
+        return len(self.dates)
+
+    def grid(self, selected_date):
+        """
+        Interpolert rutenett (lat × lon) for datoen, eller None hvis datoen ikke finnes.
+        """
+        i = self.index.get(selected_date)
+        return None if i is None else self.values[i]
+
+    def axes(self, selected_date):
+        """
+        (grid_lon, grid_lat) for datoen.
+        """
+        lon_min, lon_max, lat_min, lat_max = self.meta['extents'][self.index[selected_date]]
+        grid_res = self.meta['grid_res']
+        return np.linspace(lon_min, lon_max, grid_res), np.linspace(lat_min, lat_max, grid_res)
+
+    def frame(self, selected_date, max_value):
+        """
+        Samme resultat som interpolate_data(filter_data(..., max_value)) med samme motor, innenfor avrundingen i float32:
+        lon, lat og scaled_value for punktene innenfor cutoff-radiusen.
+        Verdiene skaleres med max_value først her, så kuben gjelder for alle maksverdier.
+        """
+        grid = self.grid(selected_date)
+        if grid is None:
+            return pd.DataFrame({LON: [], LAT: [], 'scaled_value': []})
+        values = np.asarray(grid, dtype=np.float64).flatten()
+        keep = ~np.isnan(values)
+        grid_x, grid_y = np.meshgrid(*self.axes(selected_date))
+        return pd.DataFrame({
+            LON: grid_x.flatten()[keep],
+            LAT: grid_y.flatten()[keep],
+            'scaled_value': values[keep] / max_value,
+        })
+
+
+def _build_lock(path):
+    with _cubes_lock:
+        return _build_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def build_cube(dataset, datatype, path, grid_res=200, cutoff_radius_km=75, fingerprint=None, engine='cubic'):
+    """
+    Interpolerer alle datoene for datatypen i et HeatmapDataset med motoren engine (se interpolation.py)
+    og lagrer kuben i path. Alle motorene er lineære i verdiene, så å interpolere max(verdi, 0) og
+    dele på maksverdien etterpå gir det samme som å interpolere scaled_value fra filter_data.
+    Finnes det en kube med samme rutenett fra før, gjenbrukes dagene der målingene er uendret.
+    Stasjonssett som går igjen minst REUSE_MIN_DAYS dager interpoleres med en delt GridInterpolator.
+    Kuben skrives til en midlertidig mappe og byttes inn når den er komplett, med én lås per sti
+    rundt bygging og bytte.
+    """
+    with _build_lock(path):
+        return _build_cube(dataset, datatype, path, grid_res, cutoff_radius_km, fingerprint, engine)
+
+
+def _build_cube(dataset, datatype, path, grid_res, cutoff_radius_km, fingerprint, engine):
+    days = {}
+    for selected_date in dataset.dates:
+        positions = dataset.rows.get((datatype, selected_date))
+        if positions is not None:
+            days[selected_date] = dataset.df.take(positions).dropna(subset=[LON, LAT, VALUE])
+    dates = list(days)
+
+    # En gammel kube kan bare gjenbrukes hvis rutenettet er like fint, cutoff den samme og motoren den samme
+    old = InterpolationCube.open(path)
+    if old is not None and _parameters(old.meta) != (grid_res, cutoff_radius_km, engine):
+        old = None
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}-")
+    values = open_memmap(os.path.join(tmp, 'values.npy'), mode='w+', dtype=np.float32,
+                         shape=(len(dates), grid_res, grid_res))
+    digests = {}
+    extents = []
+    todo = []
+    for i, selected_date in enumerate(dates):
+        day = days[selected_date]
+        digests[selected_date] = _day_digest(day)
+        extents.append([float(day[LON].min()), float(day[LON].max()), float(day[LAT].min()), float(day[LAT].max())]
+                       if len(day) else [0.0, 0.0, 0.0, 0.0])
+        if old is not None and old.meta['digests'].get(selected_date) == digests[selected_date]:
+            values[i] = old.grid(selected_date)
+        else:
+            todo.append(i)
+
+    # Dager med samme stasjoner interpoleres samlet med en delt GridInterpolator når det lønner seg
+    groups = {}
+    for i in todo:
+        groups.setdefault(_station_key(days[dates[i]]), []).append(i)
+    for group in groups.values():
+        if len(days[dates[group[0]]]) < 3:
+            values[group] = np.nan  # Ikke nok data til interpolasjon
+            continue
+        grid_lon = np.linspace(extents[group[0]][0], extents[group[0]][1], grid_res)
+        grid_lat = np.linspace(extents[group[0]][2], extents[group[0]][3], grid_res)
+        if len(group) < REUSE_MIN_DAYS:
+            for i in group:
+                values[i] = _interpolate_day(days[dates[i]], grid_lon, grid_lat, cutoff_radius_km, engine, datatype, dates[i])
+            continue
+        for start in range(0, len(group), BLOCK_DAYS):
+            block = group[start:start + BLOCK_DAYS]
+            sorted_days = [days[dates[i]].sort_values([LON, LAT]) for i in block]
+            points = sorted_days[0][[LON, LAT]].values
+            stacked = np.column_stack([day[VALUE].clip(lower=0).values for day in sorted_days])
+            try:
+                values[block] = interpolate_cached(points, stacked, grid_lon, grid_lat, cutoff_radius_km, engine)
+            except ValueError as e:
+                print(f"Kunne ikke interpolere {datatype} {dates[block[0]]}–{dates[block[-1]]}: {e}")
+                values[block] = np.nan
+    computed = len(todo)
+    values.flush()
+    del values
+
+    meta = {
+        'datatype': datatype,
+        'dates': dates,
+        'extents': extents,
+        'grid_res': grid_res,
+        'cutoff_radius_km': cutoff_radius_km,
+        'engine': engine,
+        'digests': digests,
+        'fingerprint': fingerprint,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Bytt inn den nye kuben, og fjern den gamle etterpå
+    previous = None
+    if os.path.exists(path):
+        previous = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}-old-")
+        os.replace(path, os.path.join(previous, os.path.basename(path)))
+    os.replace(tmp, path)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+    print(f"Interpolerte {computed} av {len(dates)} dager for {datatype}")
+    return InterpolationCube(path)
+
+
+def get_interpolation_cube(data_dir, datatype, dataset, grid_res=200, cutoff_radius_km=75, engine='cubic'):
+    """
+    Delt kube for datatypen i mappen. Kuben bygges (eller oppdateres med de nye dagene)
+    bare når data_fingerprint for mappen er endret siden den ble lagret. Samtidige kall for
+    samme kube venter på hverandre, så den bygges bare én gang.
+    """
+    path = cube_path(data_dir, datatype, engine)
+    key = os.path.abspath(path)
+    version = [list(entry) for entry in data_fingerprint(data_dir)]
+    parameters = (version, grid_res, cutoff_radius_km, engine)
+    with _cubes_lock:
+        cached = _cubes.get(key)
+    if cached is not None and cached[0] == parameters:
+        return cached[1]
+    with _build_lock(path):
+        with _cubes_lock:
+            cached = _cubes.get(key)
+        if cached is not None and cached[0] == parameters: # Bygget av en annen tråd mens vi ventet
+            return cached[1]
+        cube = InterpolationCube.open(path)
+        if cube is None or cube.meta.get('fingerprint') != version or _parameters(cube.meta) != (grid_res, cutoff_radius_km, engine):
+            cube = build_cube(dataset, datatype, path, grid_res, cutoff_radius_km, fingerprint=version, engine=engine)
+        with _cubes_lock:
+            _cubes[key] = (parameters, cube)
+    return cube
+
+
+def clear_cube_cache(data_dir=None):
+    """
+    Glemmer åpne kuber, for én mappe eller alle. Filene på disk beholdes.
+    """
+    with _cubes_lock:
+        if data_dir is None:
+            _cubes.clear()
+        else:
+            prefix = os.path.join(os.path.abspath(data_dir), CUBE_DIR) + os.sep
+            for key in [key for key in _cubes if key.startswith(prefix)]:
+                del _cubes[key]
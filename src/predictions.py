@@ -1,13 +1,27 @@
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
+from storage import PartitionedStore
+from schema import compact_loaded
 
-def read_csv_data(filename):
+def read_csv_data(filename, report=False):
+    """
+    Leser en CSV-fil fra FrostDataFetcher i det kompakte skjemaet (se schema.compact_loaded).
+    Med report=True skrives minnebruken.
+    """
     df = pd.read_csv(filename)
     df = df[df['sourceId'].notna()]
-    df['referenceTimestamp'] = pd.to_datetime(df['referenceTimestamp'])
+    df['referenceTimestamp'] = pd.to_datetime(df['referenceTimestamp'], utc=True)
     df['value'] = pd.to_numeric(df['value'])
-    return df[df['value'].notna()]
+    return compact_loaded(df[df['value'].notna()], filename, report)
+
+def read_store_data(store_dir, source_id, element=None, start=None, end=None, report=False):
+    """
+    Leser én stasjon fra kolonnelageret, med samme format som read_csv_data.
+    Bare radene for stasjonen leses fra disk.
+    """
+    df = PartitionedStore(store_dir).read(element=element, sources=[source_id], start=start, end=end)
+    return compact_loaded(df[df['value'].notna()], f"{store_dir} {source_id}", report)
 
 def resample_and_engineer_features(df, freq):
     df = df.set_index('referenceTimestamp').resample(freq)['value'].mean().to_frame()
@@ -49,7 +63,12 @@ def create_forecast(model, start_time, last_time, freq, periods, period_len):
     })
 
 def predict_from_csv(filename, freq, periods):
-    df = read_csv_data(filename)
+    return predict_from_dataframe(read_csv_data(filename), freq, periods)
+
+def predict_from_store(store_dir, source_id, freq, periods, element=None):
+    return predict_from_dataframe(read_store_data(store_dir, source_id, element), freq, periods)
+
+def predict_from_dataframe(df, freq, periods):
     df, start_time, period_len = resample_and_engineer_features(df, freq)
     model = train_linear_model(df)
     forecast_df = create_forecast(model, start_time, df.index.max(), freq, periods, period_len)
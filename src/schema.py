@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+"""
+Felles skjema for værdata i minnet, brukt av lasterne og av prosesseringen.
+Tekst som gjentas på hver rad (sourceId, datatype, unit) lagres som kategorier, altså én
+heltallskode per rad og hver streng bare én gang. Verdier og koordinater lagres som float32,
+og tidsstempler som datetime64 med tidssone UTC. Lasterne legger i tillegg til stasjonsnummeret
+som heltall (station_code) og kan skrive minnebruken for rammen de returnerer.
+"""
+
+CATEGORY_COLUMNS = ('sourceId', 'datatype', 'unit', 'station_name')
+FLOAT_COLUMNS = ('value', 'lon', 'lat')
+TIMESTAMP_COLUMN = 'referenceTimestamp'
+
+
+def to_utc(timestamps):
+    """
+    Gjør tidsstempler tidssonebevisste i UTC med oppløsning i nanosekunder, uansett kilde.
+    Tidsstempler uten tidssone regnes som UTC.
+    """
+    if isinstance(timestamps, pd.Series) and pd.api.types.is_datetime64_any_dtype(timestamps):
+        # Allerede tidsstempler, så bare tidssone og oppløsning endres
+        timestamps = timestamps.dt.tz_localize('UTC') if timestamps.dt.tz is None else timestamps.dt.tz_convert('UTC')
+    else:
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    return timestamps.astype('datetime64[ns, UTC]')
+
+def apply_schema(df, value_dtype=np.float32):
+    """
+    Konverterer kolonnene som finnes til det kompakte skjemaet og returnerer en ny DataFrame.
+    Kolonner som allerede har riktig type blir ikke kopiert.
+    """
+    df = df.copy(deep=False)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in FLOAT_COLUMNS:
+        if column in df.columns and df[column].dtype != value_dtype:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(value_dtype)
+    if TIMESTAMP_COLUMN in df.columns and pd.api.types.is_datetime64_any_dtype(df[TIMESTAMP_COLUMN]):
+        df[TIMESTAMP_COLUMN] = to_utc(df[TIMESTAMP_COLUMN])
+    return df
+
+def station_codes(source_ids):
+    """
+    Heltallskode per rad for stasjons-ID: 'SN18700' og 'SN18700:0' gir 18700.
+    Tolkes én gang per unike ID. ID-er som ikke har formen SN<tall> gir -1.
+    """
+    ids = pd.Categorical(source_ids)
+    numbers = pd.Series(ids.categories.astype(str)).str.extract(r'^SN(\d+)', expand=False)
+    codes = np.append(numbers.fillna(-1).astype(np.int64).to_numpy(), -1) # Siste plass er for manglende ID
+    return codes[ids.codes].astype(np.int32)
+
+def compact_loaded(df, name, report=False):
+    """
+    Skjemaet for en ramme fra en laster: apply_schema og station_code (se station_codes) når sourceId finnes.
+    Med report=True skrives minnebruken med memory_report under navnet name.
+    """
+    df = apply_schema(df)
+    if 'sourceId' in df.columns:
+        df['station_code'] = station_codes(df['sourceId'])
+    if report:
+        memory_report(df, name)
+    return df
+
+def memory_report(df, name="DataFrame", verbose=True):
+    """
+    Minnebruk per kolonne i byte, med strenger inkludert. Skriver en oppsummering hvis verbose.
+    """
+    usage = df.memory_usage(deep=True, index=True)
+    if verbose:
+        columns = ", ".join(f"{column} {size / 1e6:.1f}" for column, size in usage.items())
+        print(f"{name}: {usage.sum() / 1e6:.1f} MB for {len(df)} rader ({columns} MB)")
+    return usage
@@ -0,0 +1,109 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+"""
+Stasjonsmetadata som lastes én gang per prosess og deles mellom alle koblinger.
+Indeksen holder navn, koordinater og fylke i arrays, med normalisert stasjons-ID
+(uten ':0') som nøkkel. En kobling slår opp hver unike sourceId én gang, og fordeler
+resultatet til radene med heltallskoder, i stedet for å splitte tekst og flette per rad.
+Indeksen lastes på nytt når stasjonsfilen endres.
+"""
+
+METADATA_COLUMNS = ('station_name', 'lon', 'lat')
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize_station_id(source_id):
+    """
+    Fjerner spesifikasjonen av måleinstrument på værstasjonen: 'SN18700:0' gir 'SN18700'.
+    """
+    return str(source_id).split(':')[0]
+
+def _normalized_categorical(source_ids):
+    """
+    Stasjons-ID som kategori, normalisert én gang per unike verdi.
+    """
+    ids = pd.Categorical(source_ids)
+    codes, categories = pd.factorize(pd.Index([normalize_station_id(c) for c in ids.categories]), sort=True)
+    return pd.Categorical.from_codes(np.append(codes, -1)[ids.codes], categories=categories) # Kode -1 er manglende ID
+
+
+class StationIndex:
+    def __init__(self, metadata):
+        """
+        metadata: DataFrame med source_id og kolonner som station_name, lon, lat og county.
+        Ved flere rader for samme stasjon brukes den første.
+        """
+        metadata = metadata.dropna(subset=['source_id'])
+        ids = pd.Series([normalize_station_id(s) for s in metadata['source_id']], index=metadata.index)
+        keep = ~ids.duplicated().to_numpy()
+        self.ids = ids.to_numpy()[keep]
+        self.positions = {station: i for i, station in enumerate(self.ids)}
+        # Hver kolonne får en ekstra NaN på slutten, slik at posisjon -1 gir manglende verdi
+        self.columns = {
+            column: np.append(metadata[column].to_numpy()[keep], np.nan)
+            for column in metadata.columns if column != 'source_id'
+        }
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls(pd.read_csv(path, dtype={'source_id': str}))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self, ids):
+        per_category = np.array([self.positions.get(c, -1) for c in ids.categories] + [-1], dtype=np.intp)
+        return per_category[ids.codes]
+
+    def lookup(self, source_ids):
+        """
+        Posisjon i indeksen per element, eller -1 for ukjente stasjoner.
+        """
+        return self._positions(_normalized_categorical(source_ids))
+
+    def get(self, source_ids, column):
+        """
+        Verdien i column for hver stasjon, med NaN for ukjente stasjoner.
+        """
+        return self.columns[column][self.lookup(source_ids)]
+
+    def join(self, df, columns=METADATA_COLUMNS):
+        """
+        Som en venstre-fletting på normalisert sourceId: sourceId normaliseres, og
+        kolonnene legges til bakerst. Radrekkefølgen beholdes, indeksen nummereres på nytt.
+        """
+        ids = _normalized_categorical(df['sourceId'])
+        positions = self._positions(ids)
+
+        df = df.reset_index(drop=True)
+        df['sourceId'] = ids
+        for column in columns:
+            df[column] = self.columns[column][positions]
+        return df
+
+
+def get_station_index(path):
+    """
+    Delt indeks for stasjonsfilen i path. Lastes bare på nytt når endringstid eller størrelse endres.
+    Gir FileNotFoundError hvis filen ikke finnes.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    index = StationIndex.from_csv(path)
+    with _indexes_lock:
+        _indexes[key] = (version, index)
+    return index
+
+def clear_station_indexes():
+    with _indexes_lock:
+        _indexes.clear()
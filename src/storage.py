@@ -0,0 +1,288 @@
+import os
+import json
+import glob
+import shutil
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+from schema import apply_schema
+
+"""
+Kolonnebasert lagring av prosesserte værdata, partisjonert på element, region og måned.
+Hver partisjon er en mappe med én .npy-fil per kolonne og en meta.json:
+
+    data/store/<element>/<region>/<YYYY-MM>/
+        meta.json                # antall rader, tidsrom, kolonnetyper, ordbøker og rader per stasjon
+        referenceTimestamp.npy   # int64, nanosekunder siden epoch i UTC
+        value.npy, lon.npy, lat.npy
+        sourceId.npy, unit.npy   # int32-koder inn i ordbøkene i meta.json
+
+Radene er sortert på (stasjon, tid), og meta.json har start og slutt for hver stasjon.
+Ved lesing velges partisjoner ut fra mappenavnene, og innenfor en partisjon finnes
+tidsrommet med binærsøk per stasjon i en minnemappet tidskolonne. Én dag eller én
+stasjon leser derfor bare de radene som trengs, uten å tolke tekst eller datoer.
+"""
+
+STORE_PATH = os.path.join(os.getcwd(), "data", "store")
+KEY_COLUMNS = ['sourceId', 'referenceTimestamp', 'datatype']
+TIMESTAMP = 'referenceTimestamp'
+
+
+def _to_ns(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    timestamp = timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+    return timestamp.value
+
+def _as_list(value):
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+def _station(source_id):
+    return str(source_id).split(':')[0]
+
+
+class PartitionedStore:
+    """
+    Leser og skriver partisjonene under root. Skriving til samme partisjon fra flere
+    tråder skjer én om gangen, slik at jobber for samme region og måned ikke mister rader.
+    """
+    def __init__(self, root=STORE_PATH):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, path):
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def partition_path(self, element, region, month):
+        return os.path.join(self.root, quote(element, safe=''), quote(region, safe=''), month)
+
+    def partitions(self, element=None, region=None, start=None, end=None):
+        """
+        Finner partisjoner som kan inneholde rader for filtrene, bare ut fra mappenavnene.
+        Returnerer en liste med (element, region, måned, sti).
+        """
+        elements, regions = _as_list(element), _as_list(region)
+        first_month = pd.Timestamp(_to_ns(start)).strftime('%Y-%m') if start is not None else None
+        last_month = pd.Timestamp(_to_ns(end) - 1).strftime('%Y-%m') if end is not None else None
+
+        found = []
+        for path in sorted(glob.glob(os.path.join(self.root, '*', '*', '*', 'meta.json'))):
+            path = os.path.dirname(path)
+            rest, month = os.path.split(path)
+            rest, region_name = os.path.split(rest)
+            element_name = unquote(os.path.basename(rest))
+            region_name = unquote(region_name)
+            if elements is not None and element_name not in elements:
+                continue
+            if regions is not None and region_name not in regions:
+                continue
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            found.append((element_name, region_name, month, path))
+        return found
+
+    def write(self, df, region):
+        """
+        Skriver prosesserte data for en region til partisjoner per element og måned.
+        Rader med samme (sourceId, referenceTimestamp, datatype) som allerede finnes blir erstattet.
+        Returnerer antall rader skrevet.
+        """
+        if df.empty:
+            return 0
+        df = df.copy()
+        df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], utc=True)
+        months = df[TIMESTAMP].dt.tz_convert(None).to_numpy().astype('datetime64[M]').astype(str)
+
+        for (element, month), part in df.groupby([df['datatype'].to_numpy(), months], sort=False):
+            path = self.partition_path(element, region, month)
+            with self._lock(path):
+                if os.path.exists(os.path.join(path, 'meta.json')):
+                    part = pd.concat([self._read_partition(path), part], ignore_index=True)
+                    part = part.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+                self._write_partition(path, part, element, region, month)
+        return len(df)
+
+    def _write_partition(self, path, df, element, region, month):
+        """
+        Skriver en partisjon til en midlertidig mappe og bytter den inn når den er komplett.
+        """
+        df = df.drop(columns=['datatype'])
+        codes, stations = pd.factorize(df['sourceId'].astype(str), sort=True)
+        timestamps = df[TIMESTAMP].dt.tz_convert(None).to_numpy().astype('datetime64[ns]').astype(np.int64)
+        order = np.lexsort((timestamps, codes))
+        codes, timestamps = codes[order], timestamps[order]
+        df = df.iloc[order]
+
+        counts = np.bincount(codes, minlength=len(stations))
+        stops = np.cumsum(counts)
+        meta = {
+            'element': element,
+            'region': region,
+            'month': month,
+            'rows': len(df),
+            'min_time': int(timestamps.min()),
+            'max_time': int(timestamps.max()),
+            'columns': list(df.columns),
+            'dtypes': {},
+            'dictionaries': {'sourceId': list(stations)},
+            'stations': [[int(start), int(stop)] for start, stop in zip(stops - counts, stops)],
+        }
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{month}-")
+        for column in df.columns:
+            if column == TIMESTAMP:
+                values = timestamps
+                meta['dtypes'][column] = 'timestamp'
+            elif column == 'sourceId':
+                values = codes.astype(np.int32)
+                meta['dtypes'][column] = 'dictionary'
+            elif pd.api.types.is_numeric_dtype(df[column]) or pd.api.types.is_bool_dtype(df[column]):
+                values = df[column].to_numpy()
+                meta['dtypes'][column] = str(values.dtype)
+            else:
+                column_codes, uniques = pd.factorize(df[column])
+                values = column_codes.astype(np.int32)
+                meta['dtypes'][column] = 'dictionary'
+                meta['dictionaries'][column] = [str(u) for u in uniques]
+            np.save(os.path.join(tmp, f"{column}.npy"), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        # Bytt inn den nye partisjonen, og fjern den gamle etterpå
+        old = None
+        if os.path.exists(path):
+            old = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{month}-old-")
+            os.replace(path, os.path.join(old, month))
+        os.replace(tmp, path)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _load_meta(self, path):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _select_rows(self, path, meta, start_ns, end_ns, sources):
+        """
+        Finner radene i en partisjon som oppfyller filtrene, som en liste med (start, stopp).
+        """
+        stations = meta['dictionaries']['sourceId']
+        segments = [
+            (start, stop) for name, (start, stop) in zip(stations, meta['stations'])
+            if sources is None or _station(name) in sources
+        ]
+        if start_ns is None and end_ns is None:
+            return segments
+        if (start_ns is not None and meta['max_time'] < start_ns) or (end_ns is not None and meta['min_time'] >= end_ns):
+            return []
+
+        timestamps = np.load(os.path.join(path, f"{TIMESTAMP}.npy"), mmap_mode='r')
+        selected = []
+        for start, stop in segments:
+            times = timestamps[start:stop]
+            lo = start + (np.searchsorted(times, start_ns) if start_ns is not None else 0)
+            hi = start + (np.searchsorted(times, end_ns) if end_ns is not None else stop - start)
+            if hi > lo:
+                selected.append((int(lo), int(hi)))
+        return selected
+
+    def _read_partition(self, path, start_ns=None, end_ns=None, sources=None, columns=None):
+        meta = self._load_meta(path)
+        segments = self._select_rows(path, meta, start_ns, end_ns, sources)
+        wanted = [column for column in meta['columns'] if columns is None or column in columns]
+        rows = np.concatenate([np.arange(start, stop) for start, stop in segments]) if segments else np.zeros(0, dtype=np.intp)
+
+        data = {}
+        for column in wanted:
+            values = np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')[rows]
+            kind = meta['dtypes'][column]
+            if kind == 'timestamp':
+                data[column] = pd.to_datetime(values, utc=True)
+            elif kind == 'dictionary':
+                data[column] = pd.Categorical.from_codes(values, categories=meta['dictionaries'][column]) # Kode -1 blir NaN
+            else:
+                data[column] = np.asarray(values)
+        df = pd.DataFrame(data, columns=wanted)
+        if columns is None or 'datatype' in columns:
+            position = wanted.index(TIMESTAMP) + 1 if TIMESTAMP in wanted else len(wanted)
+            df.insert(position, 'datatype', meta['element'])
+        return df
+
+    def read(self, element=None, region=None, start=None, end=None, sources=None, columns=None):
+        """
+        Leser rader som oppfyller filtrene. Tidsrommet er halvåpent, [start, end).
+        Args:
+            element, region (str eller liste): Hvilke elementer og regioner.
+            start, end: Tidsrom i UTC, f.eks. '2025-01-05' og '2025-01-06' for én dag.
+            sources (liste): Stasjons-ID, med eller uten ':0'.
+            columns (liste): Kolonner som skal leses. Standard er alle.
+        """
+        start_ns = _to_ns(start) if start is not None else None
+        end_ns = _to_ns(end) if end is not None else None
+        sources = {_station(source) for source in _as_list(sources)} if sources is not None else None
+        parts = [
+            self._read_partition(path, start_ns, end_ns, sources, columns)
+            for _, _, _, path in self.partitions(element, region, start, end)
+        ]
+        parts = [part for part in parts if not part.empty]
+        if not parts:
+            return pd.DataFrame(columns=columns or ['sourceId', TIMESTAMP, 'datatype', 'value', 'unit'])
+        df = pd.concat(parts, ignore_index=True)
+        if TIMESTAMP in df.columns:
+            df = df.sort_values(TIMESTAMP, kind='stable').reset_index(drop=True)
+        return apply_schema(df) # Partisjonene har hver sin ordbok, så kategoriene slås sammen her
+
+    def latest_timestamps(self, element=None, region=None):
+        """
+        Nyeste referenceTimestamp per stasjon (uten ':0'), slik FrostDataFetcher.latest_timestamps gir.
+        Leser bare siste rad per stasjon i hver partisjon.
+        """
+        latest = {}
+        for _, _, _, path in self.partitions(element, region):
+            meta = self._load_meta(path)
+            timestamps = np.load(os.path.join(path, f"{TIMESTAMP}.npy"), mmap_mode='r')
+            for name, (start, stop) in zip(meta['dictionaries']['sourceId'], meta['stations']):
+                if stop > start:
+                    station = _station(name)
+                    latest[station] = max(latest.get(station, timestamps[stop - 1]), timestamps[stop - 1])
+        if not latest:
+            return pd.Series(dtype="datetime64[ns, UTC]")
+        return pd.Series(pd.to_datetime(np.array(list(latest.values()), dtype=np.int64), utc=True), index=list(latest))
+
+    def export_csv(self, path, **filters):
+        """
+        Skriver rader som oppfyller filtrene til CSV med samme kolonner som save_to_csv.
+        """
+        df = self.read(**filters)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        df.to_csv(path, index=False, encoding="utf-8")
+        return len(df)
+
+    def import_csv(self, path, region):
+        """
+        Leser en CSV fra save_to_csv og skriver den til lageret.
+        """
+        df = pd.read_csv(path)
+        df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP], utc=True)
+        return self.write(df, region)
+
+    def import_csv_dir(self, data_dir):
+        """
+        Importerer alle CSV-filer i en mappe med navn <element>_<region>.csv, som batch-kjøringen lager.
+        """
+        total = 0
+        for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+            region = os.path.splitext(os.path.basename(path))[0].rsplit("_", 1)[-1]
+            total += self.import_csv(path, region)
+        return total
+
+
+if __name__ == "__main__":
+    store = PartitionedStore()
+    rows = store.import_csv_dir(os.path.join(os.getcwd(), "data", "Jan_2025"))
+    print(f"Importerte {rows} rader til {store.root}")
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+"""
+Deterministisk generator for syntetiske data på samme form som Frost API.
+Brukes til ytelsestester og til å teste uten nettverk. Samme argumenter og seed
+gir alltid nøyaktig samme data.
+"""
+
+# Verdifordeling og enhet per element
+ELEMENTS = {
+    "sum(precipitation_amount P1D)": {"unit": "mm", "mean": 3.0, "std": 4.0, "min": 0.0},
+    "sum(duration_of_sunshine P1D)": {"unit": "h", "mean": 4.0, "std": 3.0, "min": 0.0},
+    "max(surface_air_pressure P1D)": {"unit": "hPa", "mean": 1005.0, "std": 12.0, "min": None},
+    "mean(air_temperature P1D)": {"unit": "degC", "mean": 5.0, "std": 8.0, "min": None},
+}
+
+def station_ids(n_stations, first_id=10000):
+    return [f"SN{first_id + i}" for i in range(n_stations)]
+
+def generate_observations(n_stations=10, n_days=30, elements=("sum(precipitation_amount P1D)",), time_offsets=("PT6H",),
+                          start="2015-01-01", gap_fraction=0.0, outlier_fraction=0.0, seed=0):
+    """
+    Lager en liste som tilsvarer json_data['data'] fra observations-endepunktet.
+    Hvert element er én (stasjon, dag) med én observasjon per element og timeOffset.
+    Args:
+        n_stations (int): Antall stasjoner.
+        n_days (int): Antall dager fra start.
+        elements (tuple): Elementnavn, se ELEMENTS.
+        time_offsets (tuple): timeOffset-verdier per dag, f.eks. ('PT0H', 'PT6H').
+        gap_fraction (float): Andel (stasjon, dag) som mangler helt.
+        outlier_fraction (float): Andel verdier som blir ekstreme uteliggere.
+        seed (int): Seed for tilfeldige tall.
+    """
+    rng = np.random.RandomState(seed)
+    sources = station_ids(n_stations)
+    days = pd.date_range(start, periods=n_days, freq="D")
+    ref_times = days.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    n_obs = len(elements) * len(time_offsets)
+    # Én matrise med verdier per (stasjon, dag, observasjon), med litt sesongvariasjon
+    season = np.sin(2 * np.pi * days.dayofyear.values / 365.25)[None, :, None]
+    values = np.empty((n_stations, n_days, n_obs))
+    for i, element in enumerate(elements):
+        spec = ELEMENTS[element]
+        block = slice(i * len(time_offsets), (i + 1) * len(time_offsets))
+        station_bias = rng.normal(0, spec["std"] / 2, size=(n_stations, 1, 1))
+        noise = rng.normal(0, spec["std"], size=(n_stations, n_days, len(time_offsets)))
+        values[:, :, block] = spec["mean"] + station_bias + spec["std"] * season + noise
+        if spec["min"] is not None:
+            values[:, :, block] = np.maximum(values[:, :, block], spec["min"])
+
+    outliers = rng.random_sample(values.shape) < outlier_fraction
+    values[outliers] = values[outliers] * 20 + 100
+    values = np.round(values, 1)
+    present = rng.random_sample((n_stations, n_days)) >= gap_fraction
+
+    obs_keys = [(element, ELEMENTS[element]["unit"], offset) for element in elements for offset in time_offsets]
+    data = []
+    for s, source in enumerate(sources):
+        source_id = f"{source}:0"
+        for d in range(n_days):
+            if not present[s, d]:
+                continue
+            row_values = values[s, d].tolist()
+            data.append({
+                "sourceId": source_id,
+                "referenceTime": ref_times[d],
+                "observations": [
+                    {
+                        "elementId": element,
+                        "value": row_values[k],
+                        "unit": unit,
+                        "timeOffset": offset,
+                        "timeResolution": "P1D",
+                        "timeSeriesId": 0,
+                        "performanceCategory": "C",
+                        "exposureCategory": "2",
+                        "qualityCode": 0,
+                    }
+                    for k, (element, unit, offset) in enumerate(obs_keys)
+                ],
+            })
+    return data
+
+def generate_stations(n_stations=10, seed=0):
+    """
+    Lager stasjoner med koordinater innenfor Sør-Norge, på samme form som stasjonsfilene.
+    """
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        "station_name": [f"SYNTETISK {i}" for i in range(n_stations)],
+        "source_id": station_ids(n_stations),
+        "lon": np.round(rng.uniform(5.0, 12.0, n_stations), 4),
+        "lat": np.round(rng.uniform(58.0, 63.5, n_stations), 4),
+    })
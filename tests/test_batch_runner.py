@@ -0,0 +1,198 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest import mock
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from batch_runner import validate_manifest, expand_jobs, run_batch, main, ManifestError, EXIT_OK, EXIT_JOB_FAILED, EXIT_BAD_MANIFEST, EXIT_ERROR
+from storage import PartitionedStore
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        if self.status_code != 200:
+            return {'error': {'message': 'feil', 'reason': 'test'}}
+        return {'data': self.data}
+
+
+class FakeClient:
+    """
+    Svarer med to dager nedbør per stasjon, men feiler for stasjoner i failing_sources.
+    """
+    def __init__(self, failing_sources=()):
+        self.failing_sources = set(failing_sources)
+
+    def get(self, url, params=None):
+        sources = params['sources'].split(',')
+        if self.failing_sources & set(sources):
+            return FakeResponse(500)
+        data = [
+            {'sourceId': f'{source}:0', 'referenceTime': f'2025-01-0{day}T00:00:00.000Z', 'observations': [
+                {'elementId': params['elements'], 'value': float(day), 'unit': 'mm', 'timeOffset': 'PT6H'}
+            ]}
+            for source in sources for day in (1, 2)
+        ]
+        return FakeResponse(200, data)
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = os.path.join(os.getcwd(), 'data', 'test_batch')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry_path = os.path.join(self.tmp.name, 'stations.csv')
+        pd.DataFrame({
+            'source_id': ['SN1', 'SN2', 'SN3'],
+            'station_name': ['A', 'B', 'C'],
+            'lon': [10.0, 10.1, 8.0],
+            'lat': [59.9, 59.8, 58.1],
+            'county': ['Oslo', 'Oslo', 'Agder'],
+        }).to_csv(self.registry_path, index=False)
+        self.manifest = validate_manifest({
+            'client_id': 'test',
+            'regions': 'all',
+            'elements': ['sum(precipitation_amount P1D)'],
+            'time_ranges': ['2025-01-01/2025-01-03'],
+            'output_pattern': 'test_batch/{region}.csv',
+            'registry_path': self.registry_path,
+            'max_workers': 2,
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        self.tmp.cleanup()
+
+    def test_ugyldig_manifest(self):
+        """
+        Tester at manglende felt gir ManifestError og returkode 2.
+        """
+        with self.assertRaises(ManifestError):
+            validate_manifest({'client_id': 'test', 'regions': 'all'})
+        path = os.path.join(self.tmp.name, 'bad.json')
+        with open(path, 'w') as f:
+            json.dump({'regions': []}, f)
+        self.assertEqual(main([path]), EXIT_BAD_MANIFEST)
+
+    def test_ugyldig_tidsperiode_og_filmønster(self):
+        """
+        Tester at en tidsperiode uten "start/slutt" og et filmønster med ukjente felt gir
+        ManifestError og returkode 2, i stedet for en feil midt i kjøringen.
+        """
+        for time_ranges in (['2025-01-01'], ['2025-01-01/2025-01-02/2025-01-03'], ['2025-01-01/ikke-dato'], [20250101]):
+            with self.assertRaises(ManifestError):
+                validate_manifest(dict(self.manifest, time_ranges=time_ranges))
+        for pattern in ('{region}/{station}.csv', '{region', '{0}.csv'):
+            with self.assertRaises(ManifestError):
+                validate_manifest(dict(self.manifest, output_pattern=pattern))
+        validate_manifest(dict(self.manifest, time_ranges=['2025-01-01T00:00:00Z/2025-01-02T00:00:00Z']))
+
+        for bad in ({'time_ranges': ['2025-01-01']}, {'output_pattern': '{region}/{station}.csv'}):
+            path = os.path.join(self.tmp.name, 'bad.json')
+            with open(path, 'w') as f:
+                json.dump(dict(self.manifest, **bad), f)
+            self.assertEqual(main([path, '--dry-run']), EXIT_BAD_MANIFEST)
+
+    def test_manglende_register(self):
+        """
+        Tester at et gyldig manifest med manglende stasjonsregister gir returkode 3, ikke ugyldig manifest.
+        """
+        path = os.path.join(self.tmp.name, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump(dict(self.manifest, registry_path=os.path.join(self.tmp.name, 'mangler.csv')), f)
+        self.assertEqual(main([path, '--dry-run']), EXIT_ERROR)
+        self.assertEqual(main([path]), EXIT_ERROR)
+
+    def test_expand_jobs(self):
+        """
+        Tester at regioner × elementer × perioder gir riktig antall jobber.
+        """
+        registry = pd.read_csv(self.registry_path).set_index('source_id')
+        manifest = dict(self.manifest, time_ranges=['2025-01-01/2025-01-03', '2025-02-01/2025-02-03'])
+        jobs = expand_jobs(manifest, registry)
+        self.assertEqual(len(jobs), 2 * 2)
+        self.assertEqual({job['source_id'] for job in jobs}, {'SN3', 'SN1,SN2'})
+
+    def test_run_batch_vellykket(self):
+        """
+        Tester at alle jobber kjøres og lagres, med returkode 0.
+        """
+        exit_code, results = run_batch(self.manifest, client=FakeClient())
+        self.assertEqual(exit_code, EXIT_OK)
+        self.assertEqual(sum(r['observations'] for r in results), 3 * 2)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'Oslo.csv')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'Agder.csv')))
+
+    def test_egen_klient_lukkes(self):
+        """
+        Tester at klienten run_batch lager fra manifestet lukkes etter jobbene.
+        """
+        client = FakeClient()
+        client.close = mock.Mock()
+        with mock.patch('batch_runner.FrostClient', return_value=client) as make_client:
+            exit_code, _ = run_batch(dict(self.manifest, cache=False))
+        self.assertEqual(exit_code, EXIT_OK)
+        make_client.assert_called_once()
+        client.close.assert_called_once()
+
+    def test_run_batch_med_feil(self):
+        """
+        Tester at én feilende jobb gir returkode 1 uten å stoppe de andre.
+        """
+        exit_code, results = run_batch(self.manifest, client=FakeClient(failing_sources={'SN3'}))
+        self.assertEqual(exit_code, EXIT_JOB_FAILED)
+        self.assertEqual([r['region'] for r in results if not r['ok']], ['Agder'])
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'Oslo.csv')))
+
+    def test_run_batch_til_kolonnelager(self):
+        """
+        Tester at jobbene kan lagre i kolonnelageret i stedet for CSV.
+        """
+        store_path = os.path.join(self.tmp.name, 'store')
+        exit_code, _ = run_batch(dict(self.manifest, output_format='store', store_path=store_path), client=FakeClient())
+        self.assertEqual(exit_code, EXIT_OK)
+        store = PartitionedStore(store_path)
+        self.assertEqual(sorted(region for _, region, _, _ in store.partitions()), ['Agder', 'Oslo'])
+        self.assertEqual(len(store.read(region='Oslo')), 2 * 2)
+        with self.assertRaises(ManifestError):
+            validate_manifest(dict(self.manifest, output_format='parquet'))
+
+    def test_run_batch_med_prosesspool(self):
+        """
+        Tester at jobbene kan dele en prosesspool til prosesseringen med samme resultat.
+        """
+        run_batch(self.manifest, client=FakeClient())
+        expected = pd.read_csv(os.path.join(self.output_dir, 'Oslo.csv'))
+        exit_code, _ = run_batch(dict(self.manifest, process_workers=2), client=FakeClient())
+        self.assertEqual(exit_code, EXIT_OK)
+        pd.testing.assert_frame_equal(pd.read_csv(os.path.join(self.output_dir, 'Oslo.csv')), expected)
+
+    def test_run_batch_med_profil(self):
+        """
+        Tester at profile_path gir én linje per steg og jobb, med jobbnavnet som kjøring.
+        """
+        profile_path = os.path.join(self.tmp.name, 'profile.jsonl')
+        exit_code, results = run_batch(dict(self.manifest, profile_path=profile_path), client=FakeClient())
+        self.assertEqual(exit_code, EXIT_OK)
+        profile = pd.read_json(profile_path, lines=True)
+        self.assertEqual(set(profile['run']), {r['name'] for r in results})
+        self.assertIn('process/clean_columns', set(profile['stage']))
+        self.assertEqual(len(profile[profile['stage'] == 'save']), 2)
+        self.assertTrue(profile['peak_mb'].isna().all()) # To arbeidere, så minnet måles ikke
+
+        # Med prosesspool gir prosesseringen også én post per steg
+        os.remove(profile_path)
+        exit_code, _ = run_batch(dict(self.manifest, profile_path=profile_path, max_workers=1, process_workers=2), client=FakeClient())
+        self.assertEqual(exit_code, EXIT_OK)
+        profile = pd.read_json(profile_path, lines=True)
+        self.assertIn('process/process_partitions', set(profile['stage']))
+        self.assertTrue(profile['peak_mb'].notna().all())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+import tempfile
+import io
+import contextlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'benchmarks')))
+
+from run_benchmarks import bench_scale, compare_results, compare_parallel, main
+from bench_interpolation import evaluate_engines, choose_engines
+import bench_clean_columns
+import numpy as np
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_bench_scale(self):
+        """
+        Tester at en liten størrelse gir én post per funksjon, med tid per steg for prosesseringen.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            cases = bench_scale('tiny', {'n_stations': 5, 'n_days': 40, 'time_offsets': ('PT6H',)}, 1, tmp)
+        self.assertEqual([c['name'] for c in cases], ['process_weather_data', 'process_weather_data_parallel', 'interpolate_data', 'grid_interpolator_month', 'predict_from_csv'])
+        self.assertIn('fill_missing_values', cases[0]['stages'])
+        self.assertTrue(all(c['seconds_min'] > 0 for c in cases))
+
+    def test_compare_results(self):
+        """
+        Tester at bare tester som er tregere enn toleransen regnes som regresjon.
+        """
+        baseline = {'cases': [
+            {'name': 'a', 'scale': 'small', 'seconds_min': 1.0},
+            {'name': 'b', 'scale': 'small', 'seconds_min': 1.0},
+        ]}
+        current = {'cases': [
+            {'name': 'a', 'scale': 'small', 'seconds_min': 1.1},
+            {'name': 'b', 'scale': 'small', 'seconds_min': 2.0},
+            {'name': 'c', 'scale': 'small', 'seconds_min': 1.0},
+        ]}
+        comparison = compare_results(baseline, current, tolerance=0.25)
+        self.assertEqual(comparison['name'].tolist(), ['a', 'b'])
+        self.assertEqual(comparison['regression'].tolist(), [False, True])
+
+    def test_compare_parallel(self):
+        """
+        Tester at den parallelle prosesseringen sammenlignes med den serielle, bare for store nok størrelser.
+        """
+        results = {'cases': [
+            {'name': 'process_weather_data', 'scale': 'small', 'rows': 100, 'seconds_min': 1.0},
+            {'name': 'process_weather_data_parallel', 'scale': 'small', 'rows': 100, 'seconds_min': 3.0, 'workers': 4},
+            {'name': 'process_weather_data', 'scale': 'large', 'rows': 10**6, 'seconds_min': 1.0},
+            {'name': 'process_weather_data_parallel', 'scale': 'large', 'rows': 10**6, 'seconds_min': 3.0, 'workers': 4},
+        ]}
+        comparison = compare_parallel(results, tolerance=0.25, min_rows=1000)
+        self.assertEqual(comparison['scale'].tolist(), ['large'])
+        self.assertEqual(comparison['slower'].tolist(), [True])
+        results['cases'][3]['seconds_min'] = 0.5
+        self.assertFalse(compare_parallel(results, tolerance=0.25, min_rows=1000)['slower'].any())
+
+    def test_main_lagrer_og_sammenligner(self):
+        """
+        Tester at to kjøringer lagres, og at den andre sammenlignes med den første.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            argv = ['--scales', 'small', '--repeat', '1', '--results-dir', tmp, '--tolerance', '100']
+            self.assertEqual(main(argv), 0)
+            self.assertEqual(main(argv), 0)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+    def test_bench_clean_columns(self):
+        """
+        Tester at benchmarken for clean_columns kjører, dvs. at løkken og den vektoriserte gir samme resultat.
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            bench_clean_columns.main(['--stations', '3', '--days', '10'])
+        self.assertIn('Speed-up', out.getvalue())
+
+    def test_interpolasjonsmotorer(self):
+        """
+        Tester at hver motor og grid_res får tid, feil og dekning, og at den raskeste nøyaktige motoren velges.
+        """
+        rng = np.random.default_rng(0)
+        points = np.c_[rng.uniform(8, 12, 15), rng.uniform(58, 61, 15)]
+        days = [('2025-01-01', points, points[:, 0] + points[:, 1])]
+        results = evaluate_engines(days, grid_res=(20, 40), engines=('linear', 'idw'), repeat=1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue((results['coverage'] > 0).all())
+
+        results = results.assign(seconds=[2.0, 1.0, 2.0, 1.0], rmse=[1.0, 5.0, 1.0, 1.05], coverage=1.0)
+        chosen = choose_engines(results, tolerance=0.1)
+        self.assertEqual(chosen['engine'].tolist(), ['linear', 'idw'])
+
+if __name__ == "__main__":
+    unittest.main()
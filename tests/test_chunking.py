@@ -0,0 +1,157 @@
+import unittest
+import os
+import sys
+import tempfile
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from chunking import split_sources, split_reference_time, estimate_obs_per_day, plan_windows, split_window, is_truncated, Checkpoint, SAFETY_FACTOR
+from weather_oslo_met import FrostDataFetcher
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, total=None):
+        self.status_code = status_code
+        self.data = data
+        self.total = total
+
+    def json(self):
+        if self.total is None:
+            return {'data': self.data}
+        return {'totalItemCount': self.total, 'currentItemCount': len(self.data), 'data': self.data}
+
+
+class FakeClient:
+    """
+    Svarer med én observasjon per stasjon og dag i vinduet, og kan feile på et gitt kall.
+    """
+    def __init__(self, fail_on_call=None):
+        self.calls = []
+        self.fail_on_call = fail_on_call
+
+    def get(self, url, params=None):
+        self.calls.append(params)
+        if len(self.calls) == self.fail_on_call:
+            return FakeResponse(500)
+        start, end = params['referencetime'].split('/')
+        data = [
+            {'sourceId': f'{source}:0', 'referenceTime': day.isoformat(), 'observations': []}
+            for source in params['sources'].split(',')
+            for day in pd.date_range(start, end, freq='D', inclusive='left')
+        ]
+        return FakeResponse(200, data)
+
+
+class CappedClient:
+    """
+    Svarer med seks observasjoner per stasjon og dag (flere sensorer og timeOffsets),
+    men avkorter svaret ved max_observations slik Frost gjør, med totalItemCount for hele svaret.
+    """
+    def __init__(self, max_observations):
+        self.max_observations = max_observations
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append(params)
+        start, end = params['referencetime'].split('/')
+        items = [
+            {'sourceId': f'{source}:0', 'referenceTime': day.isoformat(), 'observations': [
+                {'elementId': 'sum(precipitation_amount P1D)', 'value': 1.0, 'unit': 'mm', 'timeOffset': f'PT{hour}H'}
+                for hour in range(6)
+            ]}
+            for source in params['sources'].split(',')
+            for day in pd.date_range(start, end, freq='D', inclusive='left')
+        ]
+        kept = items[:self.max_observations // 6]
+        return FakeResponse(200, kept, total=len(items))
+
+
+class TestChunking(unittest.TestCase):
+    def test_split_sources(self):
+        """
+        Tester at stasjonslisten deles i grupper av riktig størrelse.
+        """
+        chunks = split_sources('SN1,SN2,SN3,SN4,SN5', max_sources=2)
+        self.assertEqual(chunks, ['SN1,SN2', 'SN3,SN4', 'SN5'])
+
+    def test_split_reference_time(self):
+        """
+        Tester at vinduene dekker hele perioden uten overlapp.
+        """
+        windows = split_reference_time('2020-01-01/2020-01-10', window_days=4)
+        self.assertEqual(windows, ['2020-01-01/2020-01-05', '2020-01-05/2020-01-09', '2020-01-09/2020-01-10'])
+
+    def test_referencetime_uten_intervall(self):
+        """
+        Tester at én dato, 'latest' og gjentatte intervaller blir ett vindu uendret i stedet for en feil.
+        """
+        for ref_time in ('2020-01-01', 'latest', 'R2/2020-01-01/2020-01-02/P1Y'):
+            self.assertEqual(split_reference_time(ref_time, window_days=4), [ref_time])
+        self.assertEqual(plan_windows('SN1,SN2', 'sum(precipitation_amount P1D)', 'latest'), [('SN1,SN2', 'latest')])
+        self.assertEqual(split_window('SN1,SN2', 'latest'), [('SN1', 'latest'), ('SN2', 'latest')])
+        self.assertIsNone(split_window('SN1', 'latest'))
+
+    def test_estimate_obs_per_day(self):
+        """
+        Tester at perioden i elementnavnet gir riktig antall observasjoner per dag.
+        """
+        self.assertEqual(estimate_obs_per_day('sum(precipitation_amount P1D)'), 1)
+        self.assertEqual(estimate_obs_per_day('mean(air_temperature PT1H)'), 24)
+
+    def test_plan_windows_under_grensen(self):
+        """
+        Tester at ingen vinduer for en tiårs-jobb med 100 stasjoner går over taket.
+        """
+        sources = ','.join(f'SN{i}' for i in range(100))
+        windows = plan_windows(sources, 'sum(precipitation_amount P1D)', '2015-01-01/2025-01-01', max_observations=10000, max_sources=50)
+        for window_sources, ref_time in windows:
+            start, end = (pd.Timestamp(t) for t in ref_time.split('/'))
+            self.assertLessEqual(len(window_sources.split(',')) * (end - start).days * SAFETY_FACTOR, 10000)
+
+    def test_split_window(self):
+        """
+        Tester at et vindu deles i hele dager først, så i stasjoner, så i timer, og til slutt ikke mer.
+        """
+        self.assertEqual(split_window('SN1,SN2', '2020-01-01/2020-01-05'),
+                         [('SN1,SN2', '2020-01-01/2020-01-03'), ('SN1,SN2', '2020-01-03/2020-01-05')])
+        self.assertEqual(split_window('SN1,SN2,SN3', '2020-01-01/2020-01-02'),
+                         [('SN1', '2020-01-01/2020-01-02'), ('SN2,SN3', '2020-01-01/2020-01-02')])
+        self.assertEqual(split_window('SN1', '2020-01-01/2020-01-02'),
+                         [('SN1', '2020-01-01/2020-01-01T12:00:00'), ('SN1', '2020-01-01T12:00:00/2020-01-02')])
+        self.assertIsNone(split_window('SN1', '2020-01-01T00:00:00/2020-01-01T01:00:00'))
+        self.assertTrue(is_truncated({'totalItemCount': 3, 'currentItemCount': 2, 'data': []}))
+        self.assertTrue(is_truncated({'data': [{'observations': [{}] * 5}]}, max_observations=5))
+        self.assertFalse(is_truncated({'data': [{'observations': [{}] * 4}]}, max_observations=5))
+
+    def test_avkortet_vindu_deles(self):
+        """
+        Tester at vinduer som avkortes fordi elementet har flere observasjoner per dag enn anslått,
+        deles og hentes på nytt, så ingen observasjoner mangler.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            client = CappedClient(max_observations=120)
+            fetcher = FrostDataFetcher('test', 'SN1,SN2', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-31', client=client)
+            data = fetcher.fetch_data_chunked(max_observations=120, checkpoint_dir=tmp)
+        self.assertEqual(len(data), 2 * 30)
+        self.assertEqual(len({(item['sourceId'], item['referenceTime']) for item in data}), 2 * 30)
+        self.assertGreater(len(client.calls), len(plan_windows('SN1,SN2', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-31', 120)))
+
+    def test_resume_fra_checkpoint(self):
+        """
+        Tester at en avbrutt jobb fortsetter fra siste ferdige vindu.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            client = FakeClient(fail_on_call=3)
+            fetcher = FrostDataFetcher('test', 'SN1,SN2', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-21', client=client)
+            data = fetcher.fetch_data_chunked(max_observations=40, checkpoint_dir=tmp)
+            self.assertIsNone(data)
+            self.assertEqual(len(Checkpoint(tmp).completed()), 3)
+
+            client.calls.clear()
+            client.fail_on_call = None
+            data = fetcher.fetch_data_chunked(max_observations=40, checkpoint_dir=tmp)
+            self.assertEqual(len(client.calls), 1) # Bare vinduet som feilet hentes på nytt
+            self.assertEqual(len(data), 2 * 20)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
-from data_processing import clean_columns, preprocess_dataframe, remove_outliers, resample_and_aggregate, fill_missing_values, add_station_metadata
+from data_processing import clean_columns, preprocess_dataframe, remove_outliers, flag_outliers, resample_and_aggregate, fill_missing_values, add_station_metadata, process_weather_data, process_weather_data_chunked, process_weather_data_parallel, partition_by_station, ObservationBuffer
+from synthetic_frost import generate_observations, generate_stations
 
 import unittest
 from io import StringIO
@@ -43,6 +44,32 @@ class TestWeatherDataProcessor(unittest.TestCase):
         self.assertEqual(result['datatype'].nunique(), 1)
         self.assertEqual(result['unit'].nunique(), 1)
 
+    def test_clean_columns_lik_opprinnelig_lokke(self):
+        # Syntetiske data med flere elementer og timeOffsets, hull, tom liste og manglende timeOffset
+        data = generate_observations(n_stations=5, n_days=20, elements=('sum(precipitation_amount P1D)', 'max(surface_air_pressure P1D)'),
+                                     time_offsets=('PT0H', 'PT6H'), gap_fraction=0.1)
+        data[3]['observations'] = []
+        del data[5]['observations'][0]['timeOffset']
+        df = pd.json_normalize(data)
+
+        # Opprinnelig radvis implementasjon som fasit
+        rows = []
+        for _, row in df.iterrows():
+            ref_time = pd.to_datetime(row['referenceTime'])
+            for obs in row['observations']:
+                time_offset = isodate.parse_duration(obs.get('timeOffset', 'PT0H'))
+                rows.append({
+                    'sourceId': row['sourceId'],
+                    'referenceTimestamp': ref_time + timedelta(seconds=time_offset.total_seconds()),
+                    'datatype': obs['elementId'],
+                    'value': obs['value'],
+                    'unit': obs['unit'],
+                })
+
+        # Sjekk at resultatet er identisk, med tekstkolonnene som kategorier
+        expected = pd.DataFrame(rows).astype({'sourceId': 'category', 'datatype': 'category', 'unit': 'category'})
+        pd.testing.assert_frame_equal(clean_columns(df), expected)
+
     def test_preprocess_dataframe(self):
         # Opprett en test dataframe
         data = {
@@ -78,6 +105,38 @@ class TestWeatherDataProcessor(unittest.TestCase):
         # Sjekk resultatet
         self.assertTrue(df['value'].isna().any())
 
+    def test_flag_outliers_per_stasjon(self):
+        """
+        Tester at uteliggere finnes per stasjon, og at verdiene beholdes når de bare markeres.
+        """
+        times = pd.date_range('2022-01-01', periods=40, freq='D')
+        warm = 20 + np.sin(np.arange(40))
+        cold = -10 + np.cos(np.arange(40))
+        cold[5] = 15.0 # Vanlig verdi for den varme stasjonen, men uteligger for den kalde
+        df = pd.DataFrame({
+            'sourceId': ['VARM'] * 40 + ['KALD'] * 40,
+            'referenceTimestamp': list(times) * 2,
+            'datatype': ['temperature'] * 80,
+            'value': np.concatenate([warm, cold]),
+            'unit': ['°C'] * 80,
+        })
+        df.loc[10, 'value'] = np.nan
+
+        for method in ('mad', 'zscore', 'iqr'):
+            flagged = flag_outliers(df.copy(), method=method)
+            self.assertEqual(flagged.index[flagged['is_outlier']].tolist(), [45], method)
+            self.assertEqual(flagged['value'].isna().sum(), 1)
+
+        rolling = flag_outliers(df.copy(), window='10D')
+        self.assertTrue(rolling.loc[45, 'is_outlier'])
+        self.assertFalse(rolling.loc[10, 'is_outlier'])
+
+        removed = remove_outliers(df.copy())
+        self.assertNotIn('is_outlier', removed.columns)
+        self.assertTrue(np.isnan(removed.loc[45, 'value']))
+        with self.assertRaises(ValueError):
+            flag_outliers(df.copy(), method='ukjent')
+
     def test_resample_and_aggregate(self):
         # Create test data
         data = {
@@ -113,6 +172,33 @@ class TestWeatherDataProcessor(unittest.TestCase):
         # Sjekk resultatet
         self.assertFalse(df['value'].isna().any())
 
+    def test_fill_missing_values_per_stasjon(self):
+        """
+        Tester at hull fylles innenfor hver stasjon, lineært i tid, og at kantene bruker valgt reserve.
+        """
+        days = pd.to_datetime(['2022-01-01', '2022-01-02', '2022-01-04', '2022-01-05'])
+        df = pd.DataFrame({
+            'sourceId': ['B'] * 4 + ['A'] * 4,
+            'referenceTimestamp': list(days[::-1]) + list(days),
+            'datatype': ['temperature'] * 8,
+            'value': [np.nan, 4.0, np.nan, 1.0, np.nan, 10.0, np.nan, 40.0],
+            'unit': ['°C'] * 8,
+        })
+
+        result = fill_missing_values(df.copy())
+        # B er i omvendt rekkefølge: hullet 02.01 ligger mellom 1.0 (01.01) og 4.0 (04.01)
+        self.assertAlmostEqual(result['value'].iloc[2], 2.0)
+        # A: hullet 04.01 ligger mellom 10.0 (02.01) og 40.0 (05.01)
+        self.assertAlmostEqual(result['value'].iloc[6], 30.0)
+        # Kantene fylles med regresjon langs samme linje, uten å blande stasjonene
+        self.assertAlmostEqual(result['value'].iloc[0], 5.0)
+        self.assertAlmostEqual(result['value'].iloc[4], 0.0)
+        self.assertEqual(result.index.tolist(), df.index.tolist())
+
+        nearest = fill_missing_values(df.copy(), fallback='nearest')
+        self.assertEqual(nearest['value'].iloc[[0, 4]].tolist(), [4.0, 10.0])
+        self.assertEqual(fill_missing_values(df.copy(), fallback=None)['value'].isna().sum(), 2)
+
     def test_add_station_metadata(self):
         # Opprett en test dataframe
         data = {
@@ -148,5 +234,73 @@ class TestWeatherDataProcessor(unittest.TestCase):
         import os
         os.remove('metadata.csv')
 
+    def test_process_weather_data_chunked(self):
+        # Syntetiske data med hull og uteliggere, slik at både uteliggere og utfylling brukes
+        data = generate_observations(n_stations=12, n_days=60, elements=('sum(precipitation_amount P1D)', 'max(surface_air_pressure P1D)'),
+                                     time_offsets=('PT0H', 'PT6H'), gap_fraction=0.1, outlier_fraction=0.01, seed=3)
+        df = pd.json_normalize(data)
+        generate_stations(12).to_csv('metadata.csv', index=False)
+
+        # Kjør batch og strømmende variant, både i minnet og til fil
+        expected = process_weather_data(df.copy(), 'metadata.csv')
+        result = process_weather_data_chunked(df, 'metadata.csv', stations_per_chunk=5)
+        rows = process_weather_data_chunked(df, 'metadata.csv', output_path='chunked.csv', stations_per_chunk=5)
+        from_file = pd.read_csv('chunked.csv')
+
+        # Sjekk at resultatet i minnet er identisk, også rekkefølgen
+        pd.testing.assert_frame_equal(result, expected)
+
+        # Filen har de samme radene, i rekkefølgen til bitene
+        expected.to_csv('expected.csv', index=False)
+        key = ['sourceId', 'referenceTimestamp', 'datatype']
+        self.assertEqual(rows, len(expected))
+        pd.testing.assert_frame_equal(from_file.sort_values(key).reset_index(drop=True),
+                                      pd.read_csv('expected.csv').sort_values(key).reset_index(drop=True))
+
+        # Uten rader skal ikke filen fra forrige kjøring bli liggende
+        self.assertEqual(process_weather_data_chunked(df.iloc[:0], 'metadata.csv', output_path='chunked.csv'), 0)
+        self.assertTrue(pd.read_csv('chunked.csv').empty)
+
+        os.remove('metadata.csv')
+        os.remove('chunked.csv')
+        os.remove('expected.csv')
+
+    def test_process_weather_data_parallel(self):
+        # Syntetiske data der stasjonene har ulikt antall rader
+        data = generate_observations(n_stations=9, n_days=40, elements=('sum(precipitation_amount P1D)',),
+                                     time_offsets=('PT0H', 'PT6H'), gap_fraction=0.2, outlier_fraction=0.02, seed=4)
+        df = pd.json_normalize(data)
+
+        # Delene inneholder hele stasjoner og alle rader
+        cleaned = preprocess_dataframe(clean_columns(df.copy()))
+        parts = partition_by_station(cleaned, 4)
+        self.assertEqual(sum(len(part) for part in parts), len(cleaned))
+        self.assertEqual(sum(part['sourceId'].nunique() for part in parts), 9)
+
+        # Sjekk at resultatet er identisk med process_weather_data, også rekkefølgen
+        expected = process_weather_data(df.copy())
+        pd.testing.assert_frame_equal(process_weather_data_parallel(df.copy(), max_workers=2), expected)
+        pd.testing.assert_frame_equal(process_weather_data_parallel(df.copy(), max_workers=1), expected)
+
+    def test_observation_buffer(self):
+        # Elementene legges inn ett og ett, også med manglende stasjon, verdi som tekst og tom liste
+        data = generate_observations(n_stations=6, n_days=20, elements=('sum(precipitation_amount P1D)', 'mean(air_temperature P1D)'),
+                                     time_offsets=('PT0H', 'PT6H'), gap_fraction=0.1, seed=5)
+        data[1]['sourceId'] = None
+        data[2]['observations'][0]['value'] = '1.5'
+        data[3]['observations'][1]['value'] = None
+        data[4]['observations'] = []
+
+        expected = clean_columns(pd.json_normalize(data))
+        expected['value'] = pd.to_numeric(expected['value'], errors='coerce')
+        buffer = ObservationBuffer().extend(data)
+        self.assertEqual(len(buffer), len(expected))
+        pd.testing.assert_frame_equal(buffer.to_frame(), expected)
+
+        # Samme resultat gjennom hele prosesseringen med cleaned=True
+        pd.testing.assert_frame_equal(process_weather_data(buffer.to_frame(), cleaned=True),
+                                      process_weather_data(pd.json_normalize(data)))
+        self.assertTrue(ObservationBuffer().to_frame().empty)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
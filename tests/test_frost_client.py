@@ -0,0 +1,160 @@
+import unittest
+import os
+import sys
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from frost_client import FrostClient, RateLimiter
+from weather_oslo_met import FrostDataFetcher, run_concurrently
+
+
+def lag_observasjon(source_id, dag):
+    return {
+        'sourceId': f'{source_id}:0',
+        'referenceTime': f'2020-01-0{dag}T00:00:00.000Z',
+        'observations': [
+            {'elementId': 'sum(precipitation_amount P1D)', 'value': float(dag), 'unit': 'mm', 'timeOffset': 'PT6H'}
+        ]
+    }
+
+
+class FrostStandIn(BaseHTTPRequestHandler):
+    """
+    Enkel lokal erstatning for Frost-endepunktet.
+    Svarer 429 på de første fail_first forespørslene og teller samtidige forespørsler.
+    """
+    fail_first = 0
+    delay = 0.0
+    lock = threading.Lock()
+    requests_seen = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests_seen += 1
+            nummer = cls.requests_seen
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(cls.delay)
+            if nummer <= cls.fail_first:
+                self.send_response(429)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+            body = json.dumps({'data': [lag_observasjon('SN18700', dag) for dag in (1, 2, 3)]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFrostClient(unittest.TestCase):
+    def setUp(self):
+        """
+        Starter en lokal stand-in server på en ledig port.
+        """
+        FrostStandIn.fail_first = 0
+        FrostStandIn.delay = 0.0
+        FrostStandIn.requests_seen = 0
+        FrostStandIn.in_flight = 0
+        FrostStandIn.max_in_flight = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FrostStandIn)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}/observations/v0.jsonld'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_ved_429(self):
+        """
+        Tester at klienten prøver på nytt etter 429 og til slutt får data.
+        """
+        FrostStandIn.fail_first = 2
+        client = FrostClient('test', rate_limit=None, backoff_factor=0.01)
+        response = client.get(self.endpoint, {'sources': 'SN18700'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FrostStandIn.requests_seen, 3)
+
+    def test_gir_opp_etter_max_retries(self):
+        """
+        Tester at siste feilrespons returneres når alle forsøk er brukt opp.
+        """
+        FrostStandIn.fail_first = 10
+        client = FrostClient('test', rate_limit=None, max_retries=2, backoff_factor=0.01)
+        response = client.get(self.endpoint)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(FrostStandIn.requests_seen, 3)
+
+    def test_fetch_data_mot_lokal_server(self):
+        """
+        Tester at FrostDataFetcher kan pekes mot et annet endepunkt.
+        """
+        with FrostDataFetcher('test', 'SN18700', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-04', endpoint=self.endpoint) as fetcher:
+            data = fetcher.fetch_data()
+        self.assertEqual(len(data), 3)
+
+    def test_egen_klient_lukkes(self):
+        """
+        Tester at run() lukker en klient fetcheren har laget selv, men ikke en delt klient.
+        """
+        closed = []
+        own = FrostDataFetcher('test', 'SN18700', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-04',
+                               output_filename='test_own_client.csv', endpoint=self.endpoint)
+        own.client.close = lambda: closed.append('egen')
+        own.save_to_csv = lambda df: None # Ikke skriv filer i testen
+        self.assertTrue(own.run())
+
+        with FrostClient('test', rate_limit=None) as client:
+            client.close = lambda: closed.append('delt')
+            shared = FrostDataFetcher('test', 'SN18700', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-04',
+                                      output_filename='test_shared_client.csv', client=client, endpoint=self.endpoint)
+            shared.save_to_csv = lambda df: None
+            self.assertTrue(shared.run())
+            self.assertEqual(closed, ['egen'])
+        self.assertEqual(closed, ['egen', 'delt'])
+
+    def test_samtidighet_begrenses(self):
+        """
+        Tester at en delt klient aldri har flere samtidige forespørsler enn max_connections.
+        """
+        FrostStandIn.delay = 0.05
+        client = FrostClient('test', max_connections=2, rate_limit=None)
+        fetchers = [
+            FrostDataFetcher('test', 'SN18700', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-04',
+                             output_filename=f'test_concurrent_{i}.csv', client=client, endpoint=self.endpoint)
+            for i in range(6)
+        ]
+        for fetcher in fetchers:
+            fetcher.save_to_csv = lambda df: None # Ikke skriv filer i testen
+        results = run_concurrently(fetchers, max_workers=6)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(FrostStandIn.requests_seen, 6)
+        self.assertLessEqual(FrostStandIn.max_in_flight, 2)
+
+    def test_rate_limiter(self):
+        """
+        Tester at rate limiteren sprer forespørsler utover i tid.
+        """
+        limiter = RateLimiter(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+if __name__ == "__main__":
+    unittest.main()
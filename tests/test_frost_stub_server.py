@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from frost_stub_server import FrostStubServer, FrostStubData, OBSERVATIONS_PATH, SOURCES_PATH
+from frost_client import FrostClient
+from weather_oslo_met import FrostDataFetcher
+from Get_locations import fetch_all_stations, fetch_national_stations
+from batch_runner import validate_manifest, run_batch, EXIT_OK
+
+ELEMENTS = ('sum(precipitation_amount P1D)', 'mean(air_temperature P1D)')
+
+
+class TestFrostStubServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = FrostStubData.synthetic(n_stations=6, n_days=20, elements=ELEMENTS)
+
+    def client(self):
+        return FrostClient('test', rate_limit=None, max_retries=8, backoff_factor=0.01)
+
+    def test_filtrering(self):
+        """
+        Tester at sources, elements og referencetime filtrerer som hos Frost, og 404 uten data.
+        """
+        with FrostStubServer(self.data) as server:
+            url = server.base_url + OBSERVATIONS_PATH
+            client = self.client()
+            response = client.get(url, {'sources': 'SN10000:0,SN10002', 'elements': ELEMENTS[1],
+                                        'referencetime': '2015-01-05/2015-01-08'})
+            data = response.json()['data']
+            self.assertEqual(len(data), 2 * 3)
+            self.assertEqual({item['sourceId'] for item in data}, {'SN10000:0', 'SN10002:0'})
+            self.assertEqual({obs['elementId'] for item in data for obs in item['observations']}, {ELEMENTS[1]})
+            self.assertEqual(min(item['referenceTime'] for item in data), '2015-01-05T00:00:00.000Z')
+
+            missing = client.get(url, {'sources': 'SN10000', 'referencetime': '2020-01-01/2020-02-01'})
+            self.assertEqual(missing.status_code, 404)
+            self.assertEqual(client.get(url, {'sources': 'SN10000'}).status_code, 400)
+
+    def test_feil_gir_nye_forsok(self):
+        """
+        Tester at 429, 503 og avbrutte svar gir nye forsøk i FrostClient og til slutt hele svaret.
+        """
+        with FrostStubServer(self.data, rate_limit_rate=0.2, error_rate=0.2, truncate_rate=0.2, retry_after=0.01, seed=1) as server:
+            fetcher = FrostDataFetcher('test', 'SN10000,SN10001', ELEMENTS[0], '2015-01-01/2015-01-21',
+                                       client=self.client(), endpoint=server.base_url + OBSERVATIONS_PATH)
+            for _ in range(10):
+                self.assertEqual(len(fetcher.fetch_data()), 2 * 20)
+            stats = server.stats()
+        self.assertGreater(stats['truncated'], 0)
+        self.assertGreater(stats[429] + stats[503], 0)
+        self.assertEqual(stats[200] - stats['truncated'], 10)
+
+    def test_fetch_all_stations(self):
+        """
+        Tester at sources-endepunktet filtrerer på polygon i geometry.
+        """
+        with FrostStubServer(self.data) as server:
+            polygon = 'POLYGON((5 58, 12 58, 12 61, 5 61, 5 58))'
+            stations = fetch_all_stations('test', polygon=polygon, client=self.client(), endpoint=server.base_url + SOURCES_PATH)
+        expected = [s['name'] for s in self.data.stations if s['geometry']['coordinates'][1] < 61]
+        self.assertEqual(sorted(stations), sorted(expected))
+        self.assertGreater(len(stations), 0)
+        self.assertLess(len(stations), len(self.data.stations))
+
+    def test_land(self):
+        """
+        Tester at sources-endepunktet filtrerer på country, slik at stasjoner i andre land utelates.
+        """
+        foreign = {'id': 'SN99990', 'name': 'STOCKHOLM', 'country': 'Sverige', 'countryCode': 'SE',
+                   'geometry': {'@type': 'Point', 'coordinates': [18.07, 59.33]}}
+        data = FrostStubData([], self.data.stations + [foreign])
+        with FrostStubServer(data) as server:
+            url = server.base_url + SOURCES_PATH
+            stations = fetch_national_stations('test', client=self.client(), endpoint=url)
+            self.assertEqual(sorted(stations['source_id']), sorted(s['id'] for s in self.data.stations))
+            client = self.client()
+            self.assertEqual(len(client.get(url, {}).json()['data']), len(self.data.stations) + 1)
+            self.assertEqual([s['id'] for s in client.get(url, {'country': 'Sverige'}).json()['data']], ['SN99990'])
+
+    def test_batch_mot_stub(self):
+        """
+        Tester at batch-kjøringen kan pekes mot stuben med base_url.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            registry_path = os.path.join(tmp, 'stations.csv')
+            pd.DataFrame({'source_id': ['SN10000', 'SN10001'], 'station_name': ['A', 'B'],
+                          'lon': [10.0, 10.1], 'lat': [59.9, 59.8], 'county': ['Oslo', 'Oslo']}).to_csv(registry_path, index=False)
+            with FrostStubServer(self.data, latency=0.01) as server:
+                manifest = validate_manifest({
+                    'client_id': 'test', 'regions': 'all', 'elements': [ELEMENTS[0]], 'time_ranges': ['2015-01-01/2015-01-11'],
+                    'registry_path': registry_path, 'output_format': 'store', 'store_path': os.path.join(tmp, 'store'),
+                    'base_url': server.base_url,
+                })
+                exit_code, results = run_batch(manifest, client=self.client())
+        self.assertEqual(exit_code, EXIT_OK)
+        self.assertEqual(results[0]['observations'], 2 * 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from Get_locations import (
+    points_in_polygon, assign_counties, build_station_registry,
+    save_station_registry, load_station_registry, fetch_national_stations, fetch_all_stations, COUNTIES
+)
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {'data': [
+            {'id': 'SN18700', 'name': 'OSLO - BLINDERN', 'geometry': {'coordinates': [10.72, 59.9423]}},
+            {'id': 'SN39030', 'name': 'KRISTIANSAND - HÅNES', 'geometry': {'coordinates': [8.0915, 58.1813]}},
+            {'id': 'SN99999', 'name': 'UTENFOR', 'geometry': {'coordinates': [0.0, 0.0]}},
+            {'id': 'SN1', 'name': 'UTEN KOORDINATER', 'geometry': {}},
+        ]}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.closed = 0
+
+    def get(self, url, params=None):
+        self.calls.append((url, params))
+        return FakeResponse()
+
+    def close(self):
+        self.closed += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TestGetLocations(unittest.TestCase):
+    def test_points_in_polygon(self):
+        """
+        Tester punkt-i-polygon for punkter innenfor, utenfor og i et konkavt polygon.
+        """
+        ring = [[0, 0], [4, 0], [4, 4], [2, 1], [0, 4], [0, 0]] # Konkav "V"-form
+        lon = np.array([1.0, 3.0, 2.0, 5.0])
+        lat = np.array([1.0, 1.0, 3.0, 1.0])
+        self.assertEqual(points_in_polygon(lon, lat, ring).tolist(), [True, True, False, False])
+
+    def test_assign_counties(self):
+        """
+        Tester at stasjoner får riktig fylke og at stasjoner utenfor får NaN.
+        """
+        stations = pd.DataFrame({
+            'station_name': ['A', 'B', 'C'],
+            'source_id': ['SN18700', 'SN39030', 'SN99999'],
+            'lon': [10.72, 8.0915, 0.0],
+            'lat': [59.9423, 58.1813, 0.0],
+        })
+        result = assign_counties(stations)
+        self.assertEqual(result['county'].tolist()[:2], ['Oslo', 'Agder'])
+        self.assertTrue(pd.isna(result['county'].iloc[2]))
+
+    def test_egen_klient_lukkes(self):
+        """
+        Tester at en klient funksjonene lager selv lukkes, men ikke en delt klient.
+        """
+        client = FakeClient()
+        with mock.patch('Get_locations.FrostClient', return_value=client):
+            self.assertEqual(len(fetch_national_stations('test')), 3)
+            self.assertIn('OSLO - BLINDERN', fetch_all_stations('test'))
+        self.assertEqual(client.closed, 2)
+        fetch_national_stations('test', client=client)
+        self.assertEqual(client.closed, 2)
+
+    def test_nasjonal_henting_og_register(self):
+        """
+        Tester at én forespørsel gir et register med oppslag på source_id.
+        """
+        client = FakeClient()
+        stations = fetch_national_stations('test', client=client)
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(len(stations), 3)
+
+        registry = build_station_registry(stations, COUNTIES)
+        self.assertEqual(registry.loc['SN18700', 'county'], 'Oslo')
+        self.assertNotIn('SN99999', registry.index)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stations.csv')
+            save_station_registry(registry, path)
+            loaded = load_station_registry(path)
+            self.assertEqual(loaded.loc['SN39030', 'county'], 'Agder')
+            self.assertEqual(list(loaded.columns), ['station_name', 'lon', 'lat', 'county'])
+
+if __name__ == "__main__":
+    unittest.main()
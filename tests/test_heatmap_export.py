@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+import io
+import re
+import zlib
+import base64
+import contextlib
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from heatmap_utils import get_heatmap_dataset, clear_heatmap_cache, mercator_rows
+from interpolation_cube import build_cube, cube_path
+from heatmap_export import quantize, palette, cube_frames, export_animation
+
+DATA_DIR = os.path.abspath(os.path.join(os.getcwd(), 'data', 'Jan_2025'))
+SINGLE_DAY_EXPORT = 477 * 1024 # weather_map.html, eksporten av én dag med deck.to_html
+
+
+def read_payload(path):
+    """
+    Pakker ut dataene i en eksportert HTML-fil, som nettleseren gjør med DecompressionStream.
+    """
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    payload = re.search(r'const PAYLOAD = "([^"]*)"', html).group(1)
+    shape = [int(n) for n in re.search(r'const SHAPE = \[([^\]]*)\]', html).group(1).split(',')]
+    return np.frombuffer(zlib.decompress(base64.b64decode(payload)), dtype=np.uint8).reshape(shape)
+
+
+class TestHeatmapExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        clear_heatmap_cache()
+
+    def tearDown(self):
+        clear_heatmap_cache()
+        self.tmp.cleanup()
+
+    def test_kvantisering(self):
+        """
+        Tester at NaN blir 0, og at verdiene fordeles på 1–255 mellom min og maks.
+        """
+        levels = quantize(np.array([np.nan, -5.0, 0.0, 5.0, 10.0, 20.0]), 0.0, 10.0)
+        np.testing.assert_array_equal(levels, [0, 1, 1, 128, 255, 255])
+        self.assertEqual(levels.dtype, np.uint8)
+        colors = palette()
+        self.assertEqual(colors.shape, (256, 4))
+        self.assertEqual(colors[0, 3], 0)
+        self.assertTrue((colors[1:, 3] == 255).all())
+
+    def test_januar_som_animasjon(self):
+        """
+        Tester at en hel måned blir én fil som er mindre enn eksporten av én dag, at dataene i
+        filen er de kvantiserte dagene, og at hver dag er uendret når rutenettet er det samme.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = get_heatmap_dataset(DATA_DIR)
+            datatype = dataset.datatypes[0]
+            cube = build_cube(dataset, datatype, cube_path(self.tmp.name, datatype))
+        dates, frames, grid_lon, grid_lat = cube_frames(cube)
+        self.assertEqual(dates, cube.dates)
+        self.assertEqual(frames.shape, (len(dates), 200, 200))
+        for i, selected_date in enumerate(dates):
+            day_lon, day_lat = cube.axes(selected_date)
+            if np.allclose(day_lon, grid_lon) and np.allclose(day_lat, grid_lat):
+                np.testing.assert_array_equal(frames[i], cube.grid(selected_date))
+
+        max_value = dataset.max_value(datatype)
+        path = os.path.join(self.tmp.name, 'animation.html')
+        size = export_animation(path, dates, frames, grid_lon, grid_lat, 0.0, max_value)
+        self.assertLess(size, SINGLE_DAY_EXPORT)
+        np.testing.assert_array_equal(read_payload(path), quantize(frames[:, mercator_rows(grid_lat)], 0.0, max_value))
+
+    def test_tekst_escapes(self):
+        """
+        Tester at tittel, enhet og datoer ikke kan sette inn HTML eller avslutte skriptet.
+        """
+        path = os.path.join(self.tmp.name, 'escape.html')
+        frames = np.full((1, 3, 3), 1.0)
+        axis = np.linspace(59.0, 60.0, 3)
+        export_animation(path, ['</script><b>'], frames, axis, axis, 0.0, 2.0, title='<img src=x onerror=alert(1)>', unit='"mm"')
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        self.assertNotIn('<img src=x', html)
+        self.assertIn('&lt;img src=x onerror=alert(1)&gt;', html)
+        self.assertIn('&quot;mm&quot;', html)
+        self.assertEqual(html.count('</script>'), 3) # deck.gl, mapbox-gl og skriptet i siden
+        self.assertIn('const DATES = ["<\\/script><b>"];', html)
+
+    def test_felles_rutenett(self):
+        """
+        Tester at dager med ulike stasjoner legges på ett rutenett som dekker alle, med NaN utenfor dagens rutenett.
+        """
+        class Cube:
+            dates = ['2025-01-01', '2025-01-02']
+            index = {'2025-01-01': 0, '2025-01-02': 1}
+            meta = {'grid_res': 5, 'extents': [[0.0, 4.0, 0.0, 4.0], [2.0, 8.0, 0.0, 4.0]]}
+
+            def axes(self, selected_date):
+                lon_min, lon_max, lat_min, lat_max = self.meta['extents'][self.index[selected_date]]
+                return np.linspace(lon_min, lon_max, 5), np.linspace(lat_min, lat_max, 5)
+
+            def grid(self, selected_date):
+                return np.tile(self.axes(selected_date)[0], (5, 1))
+
+        dates, frames, grid_lon, grid_lat = cube_frames(Cube())
+        np.testing.assert_allclose(grid_lon, np.linspace(0, 8, 5))
+        np.testing.assert_allclose(frames[0, 0], [0.0, 2.0, 4.0, np.nan, np.nan])
+        np.testing.assert_allclose(frames[1, 0], [np.nan, 2.0, 3.5, 6.5, 8.0])
+
+if __name__ == "__main__":
+    unittest.main()
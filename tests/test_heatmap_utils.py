@@ -0,0 +1,121 @@
+import unittest
+import os
+import sys
+import tempfile
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import matplotlib.image as mpimg
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from heatmap_utils import (
+    get_heatmap_dataset, clear_heatmap_cache, data_fingerprint, filter_data,
+    render_grid_png, make_bitmap_map, mercator_rows, mercator_y, grid_bounds
+)
+
+
+class TestHeatmapDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for mtype, scale in (('Precipitation', 1.0), ('Sunshine', 2.0)):
+            pd.DataFrame({
+                'sourceId': ['SN1', 'SN2', 'SN1', 'SN2'],
+                'referenceTimestamp': ['2025-01-01T06:00:00Z', '2025-01-01T06:00:00Z', '2025-01-02T06:00:00Z', '2025-01-02T06:00:00Z'],
+                'value': [1.0 * scale, 4.0 * scale, 2.0 * scale, 3.0 * scale],
+                'lon': [10.0, 11.0, 10.0, 11.0],
+                'lat': [59.0, 60.0, 59.0, 60.0],
+            }).to_csv(os.path.join(self.tmp.name, f'{mtype}_data.csv'), index=False)
+        clear_heatmap_cache()
+
+    def tearDown(self):
+        clear_heatmap_cache()
+        self.tmp.cleanup()
+
+    def test_avledede_verdier(self):
+        """
+        Tester datatyper, datoer, maksverdi og at filter gir samme resultat som filter_data.
+        """
+        dataset = get_heatmap_dataset(self.tmp.name)
+        self.assertEqual(dataset.datatypes, ['Precipitation', 'Sunshine'])
+        self.assertEqual(dataset.dates, ['2025-01-01', '2025-01-02'])
+        self.assertEqual(dataset.max_value('Sunshine'), 8.0)
+        for datatype in dataset.datatypes:
+            for date in dataset.dates:
+                expected = filter_data(dataset.df, datatype, date, dataset.max_value(datatype))
+                pd.testing.assert_frame_equal(dataset.filter(datatype, date), expected)
+        self.assertTrue(dataset.filter('Ukjent', '2025-01-01').empty)
+
+    def test_delt_og_invalidert(self):
+        """
+        Tester at datasettet deles mellom kall og lastes på nytt når en fil endres eller cachen tømmes.
+        """
+        first = get_heatmap_dataset(self.tmp.name)
+        self.assertIs(get_heatmap_dataset(self.tmp.name), first)
+
+        path = os.path.join(self.tmp.name, 'Precipitation_data.csv')
+        before = data_fingerprint(self.tmp.name)
+        df = pd.read_csv(path)
+        df.loc[0, 'value'] = 100.0
+        df.to_csv(path, index=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertNotEqual(data_fingerprint(self.tmp.name), before)
+
+        second = get_heatmap_dataset(self.tmp.name)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.max_value('Precipitation'), 100.0)
+
+        clear_heatmap_cache(self.tmp.name)
+        self.assertIsNot(get_heatmap_dataset(self.tmp.name), second)
+
+
+class TestBitmapRendering(unittest.TestCase):
+    def setUp(self):
+        self.grid_lon = np.linspace(5.0, 15.0, 40)
+        self.grid_lat = np.linspace(58.0, 71.0, 30)
+        self.grid = np.tile(np.linspace(0.0, 10.0, 40), (30, 1))
+        self.grid[:5, :5] = np.nan
+
+    def test_mercator_rows(self):
+        """
+        Tester at bildet går fra nord til sør, og at radene er jevnt fordelt i Mercator y.
+        """
+        rows = mercator_rows(self.grid_lat, 300)
+        self.assertEqual(rows[0], 29)
+        self.assertEqual(rows[-1], 0)
+        self.assertTrue((np.diff(rows) <= 0).all())
+        # Nord i bildet dekker hver breddegrad flere rader enn i sør
+        counts = np.bincount(rows, minlength=30)
+        self.assertGreater(counts[-2], counts[1])
+        self.assertAlmostEqual(mercator_y(0.0), 0.0)
+
+    def test_render_grid_png(self):
+        """
+        Tester at PNG-en har samme fargeskala som legenden, og at gridpunkter uten verdi er gjennomsiktige.
+        """
+        image = mpimg.imread(BytesIO(render_grid_png(self.grid, self.grid_lat, 0.0, 10.0)))
+        self.assertEqual(image.shape, (30, 40, 4))
+        np.testing.assert_allclose(image[10, 0], [1, 1, 1, 1])  # hvit ved min_val
+        np.testing.assert_allclose(image[10, -1], [1, 0, 0, 1])  # rød ved max_val
+        self.assertEqual(image[-1, 0, 3], 0)  # NaN nederst til venstre (sør-vest)
+        self.assertEqual(image[0, 0, 3], 1)
+
+    def test_make_bitmap_map(self):
+        """
+        Tester at kartet har ett BitmapLayer med hjørnene til rutenettet, og at størrelsen ikke
+        vokser med antall gridpunkter slik som ett punkt per gridpunkt.
+        """
+        deck = make_bitmap_map(self.grid, self.grid_lon, self.grid_lat, 0.0, 10.0)
+        layer = deck.layers[0]
+        self.assertEqual(layer.type, 'BitmapLayer')
+        self.assertEqual(layer.bounds, grid_bounds(self.grid_lon, self.grid_lat))
+        self.assertTrue(layer.image.startswith('data:image/png;base64,'))
+
+        fine_lon, fine_lat = np.linspace(5.0, 15.0, 400), np.linspace(58.0, 71.0, 300)
+        fine = np.tile(np.linspace(0.0, 10.0, 400), (300, 1))
+        fine_deck = make_bitmap_map(fine, fine_lon, fine_lat, 0.0, 10.0)
+        self.assertLess(len(fine_deck.to_json()), 20 * len(deck.to_json()))
+        self.assertIsNone(make_bitmap_map(np.full((3, 3), np.nan), fine_lon[:3], fine_lat[:3], 0.0, 1.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import os
+import sys
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from weather_oslo_met import FrostDataFetcher
+from frost_client import FrostClient
+from frost_stub_server import FrostStubServer, FrostStubData, OBSERVATIONS_PATH
+from instrumentation import StageProfiler
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return {'data': self.data}
+
+
+class FakeClient:
+    """
+    Svarer med én nedbørsobservasjon per stasjon og dag i forespurt periode.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append(params)
+        start, end = params['referencetime'].split('/')
+        data = [
+            {'sourceId': f'{source}:0', 'referenceTime': f'{day.date()}T00:00:00.000Z', 'observations': [
+                {'elementId': 'sum(precipitation_amount P1D)', 'value': float(day.day % 4), 'unit': 'mm', 'timeOffset': 'PT6H'}
+            ]}
+            for source in params['sources'].split(',')
+            for day in pd.date_range(start, end, freq='D', inclusive='left')
+        ]
+        return FakeResponse(200 if data else 404, data)
+
+
+class TestIncrementalSync(unittest.TestCase):
+    def setUp(self):
+        self.output_filename = "test_incremental.csv"
+        self.output_path = os.path.join(os.getcwd(), "data", self.output_filename)
+        self.full_path = os.path.join(os.getcwd(), "data", "test_incremental_full.csv")
+
+    def tearDown(self):
+        for path in (self.output_path, self.full_path, os.path.join(os.getcwd(), "data", ".raw", self.output_filename)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def lag_fetcher(self, client, ref_time):
+        return FrostDataFetcher('test', 'SN1,SN2', 'sum(precipitation_amount P1D)', ref_time,
+                                output_filename=self.output_filename, client=client)
+
+    def test_henter_bare_manglende_periode(self):
+        """
+        Tester at andre kjøring bare ber om dagene etter nyeste lagrede måling.
+        """
+        client = FakeClient()
+        self.assertTrue(self.lag_fetcher(client, '2020-01-01/2020-01-11').run(incremental=True))
+        self.assertEqual(client.calls[0]['referencetime'], '2020-01-01/2020-01-11')
+
+        client.calls.clear()
+        self.assertTrue(self.lag_fetcher(client, '2020-01-01/2020-01-13').run(incremental=True))
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(client.calls[0]['referencetime'], '2020-01-10/2020-01-13')
+
+        df = pd.read_csv(self.output_path)
+        self.assertEqual(len(df), 2 * 12) # Ingen duplikater etter fletting
+        self.assertFalse(df.duplicated(subset=['sourceId', 'referenceTimestamp', 'datatype']).any())
+
+    def test_utfil_uten_radata(self):
+        """
+        Tester at en utfil fra en vanlig kjøring, uten rådata, gir nyeste tidsstempel per stasjon.
+        """
+        client = FakeClient()
+        self.assertTrue(self.lag_fetcher(client, '2020-01-01/2020-01-11').run())
+        self.assertFalse(os.path.exists(os.path.join(os.getcwd(), "data", ".raw", self.output_filename)))
+
+        client.calls.clear()
+        self.assertTrue(self.lag_fetcher(client, '2020-01-01/2020-01-13').run(incremental=True))
+        self.assertEqual([call['referencetime'] for call in client.calls], ['2020-01-10/2020-01-13'])
+        df = pd.read_csv(self.output_path)
+        self.assertEqual(len(df), 2 * 12)
+        self.assertFalse(df.duplicated(subset=['sourceId', 'referenceTimestamp', 'datatype']).any())
+
+    def test_ingen_ny_data(self):
+        """
+        Tester at ingen forespørsler sendes når utfilen allerede dekker perioden.
+        """
+        client = FakeClient()
+        self.lag_fetcher(client, '2020-01-01/2020-01-05').run(incremental=True)
+        client.calls.clear()
+        plan = self.lag_fetcher(client, '2020-01-01/2020-01-04').plan_incremental()
+        self.assertEqual(plan, [])
+
+    def test_ny_stasjon_hentes_fra_start(self):
+        """
+        Tester at en stasjon som ikke finnes i utfilen hentes for hele perioden.
+        """
+        client = FakeClient()
+        self.lag_fetcher(client, '2020-01-01/2020-01-05').run(incremental=True)
+        fetcher = FrostDataFetcher('test', 'SN1,SN2,SN3', 'sum(precipitation_amount P1D)', '2020-01-01/2020-01-06',
+                                   output_filename=self.output_filename, client=client)
+        plan = fetcher.plan_incremental()
+        self.assertEqual(plan, [('SN3', '2020-01-01/2020-01-06'), ('SN1,SN2', '2020-01-04/2020-01-06')])
+
+    def test_samme_som_full_kjoring(self):
+        """
+        Tester at inkrementell henting i to omganger gir samme utfil som én full kjøring mot stuben,
+        også med uteliggere og hull, siden hele serien per stasjon renses på nytt.
+        """
+        data = FrostStubData.synthetic(n_stations=4, n_days=40, outlier_fraction=0.05, gap_fraction=0.1, seed=3)
+        elements = 'sum(precipitation_amount P1D)'
+        sources = 'SN10000,SN10001,SN10002,SN10003'
+        with FrostStubServer(data) as server, FrostClient('test', rate_limit=None) as client:
+            def fetcher(ref_time, output_filename):
+                return FrostDataFetcher('test', sources, elements, ref_time, output_filename=output_filename,
+                                        client=client, endpoint=server.base_url + OBSERVATIONS_PATH)
+            self.assertTrue(fetcher('2015-01-01/2015-02-10', os.path.basename(self.full_path)).run())
+            self.assertTrue(fetcher('2015-01-01/2015-01-21', self.output_filename).run(incremental=True))
+            second = fetcher('2015-01-01/2015-02-10', self.output_filename)
+            self.assertTrue(all(ref_time[:10] > '2015-01-10' for _, ref_time in second.plan_incremental())) # Bare de nye dagene hentes
+            self.assertTrue(second.run(incremental=True))
+
+        key = ['sourceId', 'referenceTimestamp', 'datatype']
+        full = pd.read_csv(self.full_path).sort_values(key).reset_index(drop=True)
+        incremental = pd.read_csv(self.output_path).sort_values(key).reset_index(drop=True)
+        pd.testing.assert_frame_equal(incremental, full)
+
+    def test_begrenset_kontekst(self):
+        """
+        Tester at en inkrementell kjøring bare renser de nye dagene og konteksten før dem,
+        at rådataene kortes ned til konteksten, og at utfilen får de samme radene som en full kjøring.
+        """
+        data = FrostStubData.synthetic(n_stations=3, n_days=120, outlier_fraction=0.05, gap_fraction=0.1, seed=4)
+        elements = 'sum(precipitation_amount P1D)'
+        sources = 'SN10000,SN10001,SN10002'
+        raw_path = os.path.join(os.getcwd(), "data", ".raw", self.output_filename)
+        with FrostStubServer(data) as server, FrostClient('test', rate_limit=None) as client:
+            def fetcher(ref_time, output_filename, profiler=None):
+                return FrostDataFetcher('test', sources, elements, ref_time, output_filename=output_filename, client=client,
+                                        endpoint=server.base_url + OBSERVATIONS_PATH, profiler=profiler, incremental_context='20D')
+            self.assertTrue(fetcher('2015-01-01/2015-05-01', os.path.basename(self.full_path)).run())
+            self.assertTrue(fetcher('2015-01-01/2015-04-21', self.output_filename).run(incremental=True))
+            profiler = StageProfiler('test', track_memory=False)
+            self.assertTrue(fetcher('2015-01-01/2015-05-01', self.output_filename, profiler).run(incremental=True))
+
+        processed = profiler.report().set_index('stage')
+        self.assertLessEqual(processed.loc['process', 'rows_in'], 3 * (20 + 11)) # Konteksten og dagene fra 20.04
+        raw = pd.read_csv(raw_path, parse_dates=['referenceTimestamp'])
+        span = raw.groupby('sourceId')['referenceTimestamp'].agg(['min', 'max'])
+        self.assertTrue((span['min'] >= span['max'].dt.floor('D') - pd.Timedelta('20D')).all())
+
+        key = ['sourceId', 'referenceTimestamp', 'datatype']
+        full = pd.read_csv(self.full_path).sort_values(key).reset_index(drop=True)
+        incremental = pd.read_csv(self.output_path).sort_values(key).reset_index(drop=True)
+        pd.testing.assert_frame_equal(incremental[key], full[key])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from instrumentation import StageProfiler, NO_PROFILER, load_profile
+from data_processing import process_weather_data, process_weather_data_parallel
+from synthetic_frost import generate_observations
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_steg_og_nesting(self):
+        """
+        Tester navn på nestede steg, rekkefølge, rader inn/ut og at minnetoppen måles.
+        """
+        profiler = StageProfiler('test')
+        with profiler.stage('ytre', rows_in=3) as record:
+            profiler.run('indre', lambda values: [v * 2 for v in values] * 1000, [1, 2, 3])
+            record['rows_out'] = 2
+
+        self.assertEqual([r['stage'] for r in profiler.records], ['ytre', 'ytre/indre'])
+        outer, inner = profiler.records
+        self.assertEqual((outer['rows_in'], outer['rows_out']), (3, 2))
+        self.assertEqual((inner['rows_in'], inner['rows_out']), (3, 3000))
+        self.assertGreaterEqual(outer['seconds'], inner['seconds'])
+        self.assertGreater(inner['peak_mb'], 0)
+        self.assertGreaterEqual(outer['peak_mb'], inner['peak_mb'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_uten_minne_og_uten_profiler(self):
+        """
+        Tester at track_memory=False ikke måler minne, og at NO_PROFILER bare kjører funksjonen.
+        """
+        profiler = StageProfiler(track_memory=False)
+        profiler.run('sum', sum, [1, 2])
+        self.assertIsNone(profiler.records[0]['peak_mb'])
+        self.assertEqual(NO_PROFILER.run('sum', sum, [1, 2]), 3)
+        with NO_PROFILER.stage('blokk') as record:
+            record['rows_out'] = 1
+
+    def test_jsonl(self):
+        """
+        Tester at hvert steg legges til som én linje, også på tvers av kjøringer.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profil', 'profile.jsonl')
+            for name in ('a', 'b'):
+                StageProfiler(name, jsonl_path=path).run('len', len, 'abc')
+            profile = load_profile(path)
+        self.assertEqual(profile['run'].tolist(), ['a', 'b'])
+        self.assertEqual(profile['rows_in'].tolist(), [3, 3])
+
+    def test_process_weather_data(self):
+        """
+        Tester at prosesseringen gir én post per steg med samme resultat som uten profiler.
+        """
+        df = pd.json_normalize(generate_observations(n_stations=5, n_days=30))
+        profiler = StageProfiler('prosessering')
+        result = process_weather_data(df.copy(), profiler=profiler)
+
+        report = profiler.report()
+        self.assertEqual(report['stage'].tolist(), ['clean_columns', 'preprocess_dataframe', 'remove_outliers',
+                                                    'resample_and_aggregate', 'fill_missing_values', 'select_output_columns'])
+        self.assertEqual(report['rows_in'].iloc[0], len(df))
+        self.assertEqual(report['rows_out'].iloc[-1], len(result))
+        pd.testing.assert_frame_equal(result, process_weather_data(df.copy()))
+
+    def test_flere_traader(self):
+        """
+        Tester at et steg i en annen tråd ikke nullstiller minnetoppen til steget som måler,
+        men selv får peak_mb None.
+        """
+        first, second = StageProfiler('første'), StageProfiler('andre')
+        allocated, done = threading.Event(), threading.Event()
+
+        def measure():
+            with first.stage('stor'):
+                block = bytearray(20_000_000)
+                del block
+                allocated.set()
+                done.wait(10)
+
+        thread = threading.Thread(target=measure)
+        thread.start()
+        allocated.wait(10)
+        second.run('liten', len, 'abc')
+        done.set()
+        thread.join()
+
+        self.assertIsNone(second.records[0]['peak_mb'])
+        self.assertGreaterEqual(first.records[0]['peak_mb'], 20)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_process_weather_data_parallel(self):
+        """
+        Tester at den parallelle prosesseringen også gir én post per steg i hovedprosessen.
+        """
+        df = pd.json_normalize(generate_observations(n_stations=5, n_days=30))
+        profiler = StageProfiler('parallell')
+        result = process_weather_data_parallel(df.copy(), max_workers=1, profiler=profiler)
+        self.assertEqual(profiler.report()['stage'].tolist(), ['clean_columns', 'preprocess_dataframe', 'process_partitions', 'select_output_columns'])
+        pd.testing.assert_frame_equal(result, process_weather_data(df.copy()))
+
+if __name__ == "__main__":
+    unittest.main()
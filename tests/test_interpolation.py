@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+import numpy as np
+from scipy.interpolate import griddata
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+import interpolation
+from interpolation import (
+    GridInterpolator, get_interpolator, interpolate_cached, clear_interpolator_cache,
+    ENGINES, interpolate, leave_one_out, grid_mask, cutoff_mask
+)
+from heatmap_utils import interpolate_grid
+
+
+class TestGridInterpolator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.points = np.c_[rng.uniform(8.0, 12.0, 25), rng.uniform(58.5, 61.0, 25)]
+        self.values = rng.uniform(0, 20, (25, 5))
+        self.grid_lon = np.linspace(8.0, 12.0, 50)
+        self.grid_lat = np.linspace(58.5, 61.0, 40)
+        clear_interpolator_cache()
+
+    def tearDown(self):
+        clear_interpolator_cache()
+
+    def test_kubisk_som_interpolate_grid(self):
+        """
+        Tester at den kubiske interpolatoren gir samme rutenett som interpolate_grid, også for mange dager samtidig.
+        """
+        interpolator = GridInterpolator(self.points, self.grid_lon, self.grid_lat, cutoff_radius_km=40)
+        grids = interpolator(self.values)
+        self.assertEqual(grids.shape, (5, 40, 50))
+        for day in range(5):
+            expected = interpolate_grid(self.points, self.values[:, day], self.grid_lon, self.grid_lat, 40)
+            np.testing.assert_array_equal(np.isnan(grids[day]), np.isnan(expected))
+            np.testing.assert_allclose(grids[day], expected, atol=1e-3)
+            np.testing.assert_allclose(interpolator(self.values[:, day]), grids[day], atol=1e-4, equal_nan=True)
+
+    def test_lineaer_som_griddata(self):
+        """
+        Tester at de barysentriske vektene gir samme resultat som griddata(method='linear').
+        """
+        interpolator = GridInterpolator(self.points, self.grid_lon, self.grid_lat, cutoff_radius_km=1000, method='linear')
+        grid_x, grid_y = np.meshgrid(self.grid_lon, self.grid_lat)
+        expected = griddata(self.points, self.values[:, 0], (grid_x, grid_y), method='linear')
+        np.testing.assert_allclose(interpolator(self.values[:, 0]), expected, atol=1e-10, equal_nan=True)
+        with self.assertRaises(ValueError):
+            GridInterpolator(self.points, self.grid_lon, self.grid_lat, method='quintic')
+
+    def test_deling_og_rekkefolge(self):
+        """
+        Tester at samme stasjoner i annen rekkefølge deler interpolator, og at cachen er begrenset.
+        """
+        order = np.random.default_rng(0).permutation(25)
+        first = interpolate_cached(self.points, self.values[:, 0], self.grid_lon, self.grid_lat, 40)
+        shuffled = interpolate_cached(self.points[order], self.values[order, 0], self.grid_lon, self.grid_lat, 40)
+        np.testing.assert_array_equal(first, shuffled)
+        self.assertEqual(len(interpolation._interpolators), 1)
+
+        interpolator = get_interpolator(self.points, self.grid_lon, self.grid_lat, 40, 'linear')
+        self.assertIs(get_interpolator(self.points, self.grid_lon, self.grid_lat, 40, 'linear'), interpolator)
+        for shift in range(interpolation.MAX_CACHED + 2):
+            get_interpolator(self.points + shift, self.grid_lon, self.grid_lat, 40, 'linear')
+        self.assertEqual(len(interpolation._interpolators), interpolation.MAX_CACHED)
+
+    def test_motorer(self):
+        """
+        Tester at GridInterpolator gir samme resultat som interpolate for alle motorene, og at
+        nearest og idw også fyller utenfor det konvekse skallet.
+        """
+        covered = {}
+        for engine in ENGINES:
+            expected = interpolate(self.points, self.values[:, 0], self.grid_lon, self.grid_lat, 40, engine)
+            actual = GridInterpolator(self.points, self.grid_lon, self.grid_lat, 40, engine)(self.values[:, 0])
+            np.testing.assert_allclose(actual, expected, atol=1e-4, equal_nan=True)
+            covered[engine] = (~np.isnan(expected)).sum()
+        self.assertEqual(covered['nearest'], covered['idw'])
+        self.assertGreater(covered['idw'], covered['cubic'])
+        self.assertEqual(covered['linear'], covered['cubic'])
+
+        # IDW gir stasjonens egen verdi i stasjonen
+        np.testing.assert_allclose(interpolate(self.points, self.values[:, 0], self.points[:3, 0], self.points[:3, 1], 40, 'idw').diagonal(),
+                                   self.values[:3, 0])
+        with self.assertRaises(ValueError):
+            interpolate(self.points, self.values[:, 0], self.grid_lon, self.grid_lat, engine='kriging')
+
+    def test_leave_one_out(self):
+        """
+        Tester at et lineært felt gjenskapes av linear, og at nearest gir en verdi for alle stasjonene.
+        """
+        values = 2 * self.points[:, 0] + 3 * self.points[:, 1]
+        grid_lon = np.linspace(8.0, 12.0, 2001)
+        grid_lat = np.linspace(58.5, 61.0, 2001)
+        linear = leave_one_out(self.points, values, grid_lon, grid_lat, 1000, 'linear')
+        found = ~np.isnan(linear)
+        self.assertGreater(found.sum(), 10)
+        np.testing.assert_allclose(linear[found], values[found], atol=0.01)
+        nearest = leave_one_out(self.points, values, grid_lon, grid_lat, 1000, 'nearest')
+        self.assertFalse(np.isnan(nearest).any())
+        self.assertTrue((nearest != values).all())
+
+    def test_grid_mask(self):
+        """
+        Tester at masken fra sirklene rundt stasjonene er lik cutoff_mask, deles, og at bare
+        gridpunktene i masken sendes til motoren.
+        """
+        mask = grid_mask(self.points, self.grid_lon, self.grid_lat, 20)
+        grid_x, grid_y = np.meshgrid(self.grid_lon, self.grid_lat)
+        expected = ~cutoff_mask(self.points, np.c_[grid_x.flatten(), grid_y.flatten()], 20).reshape(mask.shape)
+        np.testing.assert_array_equal(mask, expected)
+        self.assertTrue(0 < mask.sum() < mask.size)
+        self.assertIs(grid_mask(self.points, self.grid_lon, self.grid_lat, 20), mask)
+        self.assertFalse(mask.flags.writeable)
+
+        evaluated = []
+        def counting(points, values, xi):
+            evaluated.append(len(xi))
+            return np.ones(len(xi))
+        interpolation.ENGINES['counting'] = counting
+        try:
+            grid = interpolate(self.points, self.values[:, 0], self.grid_lon, self.grid_lat, 20, 'counting')
+        finally:
+            del interpolation.ENGINES['counting']
+        self.assertEqual(evaluated, [mask.sum()])
+        np.testing.assert_array_equal(~np.isnan(grid), mask)
+
+if __name__ == "__main__":
+    unittest.main()
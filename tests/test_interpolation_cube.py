@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+import io
+import contextlib
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from heatmap_utils import get_heatmap_dataset, clear_heatmap_cache, interpolate_data
+from interpolation_cube import (
+    build_cube, cube_path, get_interpolation_cube, clear_cube_cache, InterpolationCube
+)
+
+
+def write_csv(data_dir, n_days, seed=0):
+    """
+    Skriver en CSV-fil med 12 stasjoner og n_days dager, på samme form som filene i data/.
+    """
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(8.0, 12.0, 12)
+    lat = rng.uniform(58.5, 61.0, 12)
+    rows = []
+    for day in range(n_days):
+        for i in range(12):
+            rows.append({'sourceId': f'SN{i}', 'referenceTimestamp': f'2025-01-{day + 1:02d}T06:00:00Z',
+                         'value': round(float(rng.uniform(0, 20)), 1), 'lon': lon[i], 'lat': lat[i]})
+    pd.DataFrame(rows).to_csv(os.path.join(data_dir, 'Precipitation_data.csv'), index=False)
+
+
+class TestInterpolationCube(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        clear_heatmap_cache()
+        clear_cube_cache()
+
+    def tearDown(self):
+        clear_heatmap_cache()
+        clear_cube_cache()
+        self.tmp.cleanup()
+
+    def dataset(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return get_heatmap_dataset(self.tmp.name)
+
+    def test_samme_som_interpolate_data(self):
+        """
+        Tester at hver dag i kuben gir samme punkter og verdier som interpolate_data. Alle dagene
+        har samme stasjoner, så de interpoleres med en delt GridInterpolator.
+        """
+        write_csv(self.tmp.name, 10)
+        dataset = self.dataset()
+        max_value = dataset.max_value('Precipitation')
+        with contextlib.redirect_stdout(io.StringIO()):
+            cube = build_cube(dataset, 'Precipitation', cube_path(self.tmp.name, 'Precipitation'), grid_res=60)
+        self.assertEqual(cube.dates, dataset.dates)
+        self.assertEqual(cube.values.shape, (10, 60, 60))
+        for selected_date in dataset.dates:
+            expected = interpolate_data(dataset.filter('Precipitation', selected_date), grid_res=60)
+            actual = cube.frame(selected_date, max_value)
+            self.assertEqual(list(actual.columns), list(expected.columns))
+            np.testing.assert_allclose(actual.values, expected.values, atol=1e-4)
+        self.assertTrue(cube.frame('2030-01-01', max_value).empty)
+
+    def test_nye_dager_interpoleres_inkrementelt(self):
+        """
+        Tester at bare nye dager interpoleres når CSV-filen utvides, og at de gamle dagene er uendret.
+        """
+        write_csv(self.tmp.name, 3)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            first = get_interpolation_cube(self.tmp.name, 'Precipitation', self.dataset(), grid_res=40)
+            self.assertIs(get_interpolation_cube(self.tmp.name, 'Precipitation', self.dataset(), grid_res=40), first)
+        self.assertIn('Interpolerte 3 av 3', out.getvalue())
+        old_grid = np.array(first.grid('2025-01-02'))
+
+        write_csv(self.tmp.name, 5)
+        os.utime(os.path.join(self.tmp.name, 'Precipitation_data.csv'), ns=(0, 1))
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            second = get_interpolation_cube(self.tmp.name, 'Precipitation', self.dataset(), grid_res=40)
+        self.assertIn('Interpolerte 2 av 5', out.getvalue())
+        self.assertEqual(len(second), 5)
+        np.testing.assert_array_equal(second.grid('2025-01-02'), old_grid)
+
+        # Kuben på disk kan åpnes på nytt uten å bygges
+        reopened = InterpolationCube.open(cube_path(self.tmp.name, 'Precipitation'))
+        self.assertEqual(reopened.dates, second.dates)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.tmp.name, '.cube'))), ['Precipitation'])
+
+    def test_samtidige_kall_bygger_en_gang(self):
+        """
+        Tester at samtidige kall for samme kube, som fra to Streamlit-økter, bygger den bare én gang.
+        """
+        write_csv(self.tmp.name, 4)
+        dataset = self.dataset()
+        cubes, start = [], threading.Barrier(4)
+
+        def get():
+            start.wait()
+            cubes.append(get_interpolation_cube(self.tmp.name, 'Precipitation', dataset, grid_res=30))
+
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            threads = [threading.Thread(target=get) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(out.getvalue().count('Interpolerte'), 1)
+        self.assertEqual(len(cubes), 4)
+        self.assertTrue(all(cube is cubes[0] for cube in cubes))
+
+if __name__ == "__main__":
+    unittest.main()
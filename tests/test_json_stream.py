@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from json_stream import iter_json_items
+from frost_stub_server import FrostStubServer, FrostStubData, OBSERVATIONS_PATH
+from frost_client import FrostClient
+from weather_oslo_met import FrostDataFetcher
+from data_processing import clean_columns
+from storage import PartitionedStore
+import pandas as pd
+
+
+def biter(text, size):
+    payload = text.encode('utf-8')
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+class TestJsonStream(unittest.TestCase):
+    def test_elementer_over_bitgrenser(self):
+        """
+        Tester at elementene blir like som med json.loads uansett bitstørrelse, også med tall,
+        æøå over to biter og andre felt før og etter data.
+        """
+        body = {
+            '@context': 'https://frost.met.no/schema',
+            'totalItemCount': 123456,
+            'data': [{'sourceId': 'SN18700:0', 'value': 1.25, 'navn': 'Blindern æøå'}, [1, 2], 'tekst', 987654321, None],
+            'itemsPerPage': 1000,
+        }
+        text = json.dumps(body, ensure_ascii=False, indent=1)
+        for size in (1, 2, 7, 64, len(text) * 4):
+            self.assertEqual(list(iter_json_items(biter(text, size))), body['data'])
+
+    def test_tom_og_manglende_liste(self):
+        """
+        Tester tom data-liste, tomt objekt og et objekt uten data.
+        """
+        self.assertEqual(list(iter_json_items([b'{"data": []}'])), [])
+        self.assertEqual(list(iter_json_items([b'{}'])), [])
+        self.assertEqual(list(iter_json_items([b'{"error": {"code": 404}}'])), [])
+
+    def test_avkortet_svar(self):
+        """
+        Tester at et svar som slutter midt i gir JSONDecodeError, etter elementene som var hele.
+        """
+        text = json.dumps({'data': [{'a': 1}, {'b': 2}, {'c': 3}]})
+        items = iter_json_items(biter(text[:len(text) - 8], 5))
+        self.assertEqual(next(items), {'a': 1})
+        with self.assertRaises(json.JSONDecodeError):
+            list(items)
+
+    def test_fetch_data_streaming(self):
+        """
+        Tester at strømmende henting gir samme tabell som fetch_data og clean_columns,
+        også når svar avbrytes og må hentes på nytt.
+        """
+        elements = 'sum(precipitation_amount P1D),mean(air_temperature P1D)'
+        data = FrostStubData.synthetic(n_stations=5, n_days=30, elements=tuple(elements.split(',')))
+        with FrostStubServer(data, truncate_rate=0.3, seed=2) as server:
+            client = FrostClient('test', rate_limit=None, max_retries=10, backoff_factor=0.01)
+            fetcher = FrostDataFetcher('test', 'SN10000,SN10001,SN10004', elements, '2015-01-01/2015-01-31',
+                                       client=client, endpoint=server.base_url + OBSERVATIONS_PATH)
+            expected = clean_columns(pd.json_normalize(fetcher.fetch_data()))
+            for _ in range(3):
+                pd.testing.assert_frame_equal(fetcher.fetch_data_streaming(), expected)
+            self.assertGreater(server.stats().get('truncated', 0), 0)
+
+    def test_run_streaming(self):
+        """
+        Tester at run(streaming=True) lagrer det samme som vanlig henting.
+        """
+        data = FrostStubData.synthetic(n_stations=4, n_days=20)
+        with FrostStubServer(data) as server, tempfile.TemporaryDirectory() as tmp:
+            results = []
+            for streaming in (False, True):
+                store = PartitionedStore(os.path.join(tmp, str(streaming)))
+                fetcher = FrostDataFetcher('test', 'SN10000,SN10001,SN10002,SN10003', 'sum(precipitation_amount P1D)',
+                                           '2015-01-01/2015-01-21', client=FrostClient('test', rate_limit=None),
+                                           endpoint=server.base_url + OBSERVATIONS_PATH, store=store, region='Test')
+                self.assertTrue(fetcher.run(streaming=streaming))
+                self.assertEqual(fetcher.n_observations, 4 * 20)
+                results.append(store.read())
+        pd.testing.assert_frame_equal(results[1], results[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src', 'API')))
+
+from response_cache import ResponseCache, normalize_params
+from frost_client import FrostClient
+
+OBS_URL = 'https://frost.met.no/observations/v0.jsonld'
+SOURCES_URL = 'https://frost.met.no/sources/v0.jsonld'
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+
+class FakeSession:
+    """
+    Erstatter requests.Session og teller hvor mange ganger nettverket brukes.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(b'{"data": [1, 2, 3]}')
+
+    def close(self):
+        pass
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normaliserte_parametere_gir_samme_nokkel(self):
+        """
+        Tester at rekkefølge på parametere og stasjoner ikke påvirker nøkkelen.
+        """
+        a = {'sources': 'SN1, SN2', 'elements': 'x', 'referencetime': '2020-01-01/2020-02-01'}
+        b = {'referencetime': '2020-01-01/2020-02-01', 'elements': 'x', 'sources': 'SN2,SN1'}
+        self.assertEqual(normalize_params(a), normalize_params(b))
+        self.assertEqual(ResponseCache.key(OBS_URL, a), ResponseCache.key(OBS_URL, b))
+        self.assertNotEqual(ResponseCache.key(OBS_URL, a), ResponseCache.key(SOURCES_URL, a))
+
+    def test_lagre_og_hente(self):
+        """
+        Tester at et lagret svar kan hentes igjen uendret.
+        """
+        params = {'sources': 'SN1', 'referencetime': '2020-01-01/2020-02-01'}
+        self.assertIsNone(self.cache.get(OBS_URL, params))
+        self.cache.put(OBS_URL, params, b'{"data": []}')
+        self.assertEqual(self.cache.get(OBS_URL, params).json(), {'data': []})
+
+    def test_ttl_per_endepunkt(self):
+        """
+        Tester at avsluttede historiske vinduer aldri utløper, mens stasjonslister gjør det.
+        """
+        self.assertIsNone(self.cache.ttl_for(OBS_URL, {'referencetime': '2015-01-01/2016-01-01'}))
+        self.assertIsNotNone(self.cache.ttl_for(OBS_URL, {'referencetime': '2015-01-01/2999-01-01'}))
+
+        cache = ResponseCache(self.tmp.name, ttl={'sources': 0})
+        cache.put(SOURCES_URL, {'geometry': 'x'}, b'{}')
+        time.sleep(0.01)
+        self.assertIsNone(cache.get(SOURCES_URL, {'geometry': 'x'}))
+
+    def test_lru_sletting(self):
+        """
+        Tester at filen som er brukt minst nylig slettes når cachen blir for stor.
+        """
+        cache = ResponseCache(self.tmp.name, max_bytes=10 ** 9)
+        payload = os.urandom(2000) # Tilfeldige bytes komprimeres ikke
+        for i in range(3):
+            cache.put(OBS_URL, {'sources': f'SN{i}', 'referencetime': '2015-01-01/2016-01-01'}, payload)
+            time.sleep(0.02)
+        cache.get(OBS_URL, {'sources': 'SN0', 'referencetime': '2015-01-01/2016-01-01'}) # SN0 blir sist brukt
+
+        cache.max_bytes = cache.size() - 1
+        cache.evict()
+        self.assertIsNotNone(cache.get(OBS_URL, {'sources': 'SN0', 'referencetime': '2015-01-01/2016-01-01'}))
+        self.assertIsNone(cache.get(OBS_URL, {'sources': 'SN1', 'referencetime': '2015-01-01/2016-01-01'}))
+
+    def test_sletting_under_lesing(self):
+        """
+        Tester at en fil som slettes av evict i en annen tråd mens den leses, gir en bom i stedet for en feil.
+        """
+        params = {'sources': 'SN1', 'referencetime': '2015-01-01/2016-01-01'}
+        self.cache.put(OBS_URL, params, b'{"data": []}')
+        with mock.patch('response_cache.gzip.open', side_effect=FileNotFoundError):
+            self.assertIsNone(self.cache.get(OBS_URL, params))
+        with mock.patch('response_cache.os.utime', side_effect=FileNotFoundError):
+            self.assertIsNone(self.cache.get(OBS_URL, params))
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_sletter_bare_over_grensen(self):
+        """
+        Tester at put bare går gjennom mappen når den løpende totalen passerer max_bytes.
+        """
+        payload = os.urandom(2000)
+        cache = ResponseCache(self.tmp.name, max_bytes=5000)
+        with mock.patch.object(cache, 'evict', wraps=cache.evict) as evict:
+            for i in range(2):
+                cache.put(OBS_URL, {'sources': f'SN{i}', 'referencetime': '2015-01-01/2016-01-01'}, payload)
+            cache.put(OBS_URL, {'sources': 'SN1', 'referencetime': '2015-01-01/2016-01-01'}, payload) # Erstatter en fil
+            self.assertEqual(evict.call_count, 0)
+            self.assertEqual(cache.total_bytes, cache.size())
+            cache.put(OBS_URL, {'sources': 'SN2', 'referencetime': '2015-01-01/2016-01-01'}, payload)
+            self.assertEqual(evict.call_count, 1)
+        self.assertLessEqual(cache.size(), 5000)
+        self.assertEqual(cache.total_bytes, cache.size())
+
+    def test_klient_bruker_cache(self):
+        """
+        Tester at andre identiske forespørsel ikke går mot nettverket.
+        """
+        client = FrostClient('test', rate_limit=None, cache=self.cache)
+        client.session = FakeSession()
+        params = {'sources': 'SN1', 'referencetime': '2015-01-01/2016-01-01'}
+        first = client.get(OBS_URL, params)
+        second = client.get(OBS_URL, params)
+        self.assertEqual(client.session.calls, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(second.from_cache)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import io
+import contextlib
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from schema import apply_schema, station_codes, memory_report, to_utc
+from data_processing import process_weather_data
+from predictions import read_csv_data
+from heatmap_utils import load_data
+from synthetic_frost import generate_observations
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'sourceId': ['SN18700:0', 'SN18700:0', 'SN39040:0', None],
+            'referenceTimestamp': pd.to_datetime(['2025-01-01 06:00', '2025-01-02 06:00', '2025-01-01 06:00', '2025-01-01 06:00']),
+            'datatype': ['sum(precipitation_amount P1D)'] * 4,
+            'value': ['1.5', '2.0', 'x', '0.0'],
+            'unit': ['mm'] * 4,
+            'lon': [10.72, 10.72, 8.09, 8.0],
+        })
+
+    def test_apply_schema(self):
+        """
+        Tester at kolonnene får kompakte typer, og at originalen ikke endres.
+        """
+        result = apply_schema(self.df)
+        for column in ('sourceId', 'datatype', 'unit'):
+            self.assertIsInstance(result[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(result['value'].dtype, np.float32)
+        self.assertEqual(result['lon'].dtype, np.float32)
+        self.assertEqual(str(result['referenceTimestamp'].dtype), 'datetime64[ns, UTC]')
+        self.assertTrue(np.isnan(result['value'].iloc[2]))
+        self.assertEqual(self.df['value'].iloc[0], '1.5')
+
+    def test_to_utc(self):
+        """
+        Tester at tidsstempler med annen tidssone gjøres om til UTC.
+        """
+        oslo = pd.Series(pd.to_datetime(['2025-01-01 07:00']).tz_localize('Europe/Oslo'))
+        self.assertEqual(to_utc(oslo).iloc[0], pd.Timestamp('2025-01-01 06:00', tz='UTC'))
+        self.assertEqual(to_utc(pd.Series(['2025-01-01T06:00:00.000Z'])).iloc[0], pd.Timestamp('2025-01-01 06:00', tz='UTC'))
+
+    def test_station_codes(self):
+        """
+        Tester heltallskoder for stasjoner, med og uten ':0', og for ukjente og manglende ID.
+        """
+        codes = station_codes(['SN18700:0', 'SN18700', 'SN39040:1', 'ukjent', None])
+        self.assertEqual(codes.tolist(), [18700, 18700, 39040, -1, -1])
+        self.assertEqual(codes.dtype, np.int32)
+
+    def test_memory_report(self):
+        """
+        Tester at minnerapporten gir byte per kolonne, og at skjemaet bruker mindre minne.
+        """
+        data = generate_observations(n_stations=20, n_days=60, elements=('sum(precipitation_amount P1D)',))
+        result = process_weather_data(pd.json_normalize(data))
+        self.assertIsInstance(result['datatype'].dtype, pd.CategoricalDtype)
+
+        compact = memory_report(result, verbose=False)
+        self.assertIn('value', compact.index)
+        plain = result.astype({'sourceId': object, 'datatype': object, 'unit': object, 'value': 'float64'})
+        self.assertLess(compact.sum() * 2, memory_report(plain, verbose=False).sum())
+
+    def test_lastere(self):
+        """
+        Tester at lasterne gir stasjonsnummer som heltall, og skriver minnebruken med report=True.
+        """
+        data = generate_observations(n_stations=3, n_days=10, elements=('sum(precipitation_amount P1D)',))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'Precipitation_data.csv')
+            process_weather_data(pd.json_normalize(data)).to_csv(path, index=False)
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                df = read_csv_data(path, report=True)
+                heatmap = load_data(tmp, report=True)
+        self.assertEqual(df['station_code'].dtype, np.int32)
+        self.assertTrue((df['station_code'] > 0).all())
+        self.assertEqual(heatmap['station_code'].tolist(), station_codes(heatmap['sourceId']).tolist())
+        self.assertIn(f'{path}: ', out.getvalue())
+        self.assertIn(f'{tmp}: ', out.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
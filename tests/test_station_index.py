@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from station_index import StationIndex, get_station_index, clear_station_indexes
+from data_processing import add_station_metadata
+
+
+class TestStationIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'stations.csv')
+        pd.DataFrame({
+            'source_id': ['SN18700', 'SN39040', 'SN18700'],
+            'station_name': ['OSLO - BLINDERN', 'KJEVIK', 'DUPLIKAT'],
+            'lon': [10.72, 8.08, 0.0],
+            'lat': [59.94, 58.2, 0.0],
+            'county': ['Oslo', 'Agder', 'Oslo'],
+        }).to_csv(self.path, index=False)
+        clear_station_indexes()
+
+    def tearDown(self):
+        clear_station_indexes()
+        self.tmp.cleanup()
+
+    def test_join(self):
+        """
+        Tester at koblingen normaliserer sourceId, beholder radrekkefølgen og gir NaN for ukjente stasjoner.
+        """
+        df = pd.DataFrame({
+            'sourceId': ['SN39040:0', 'SN18700:0', 'SN99999:0', 'SN18700:1'],
+            'value': [1.0, 2.0, 3.0, 4.0],
+        }, index=[10, 11, 12, 13])
+        result = get_station_index(self.path).join(df)
+
+        self.assertEqual(result.index.tolist(), [0, 1, 2, 3])
+        self.assertEqual(list(result.columns), ['sourceId', 'value', 'station_name', 'lon', 'lat'])
+        self.assertEqual(result['sourceId'].astype(str).tolist(), ['SN39040', 'SN18700', 'SN99999', 'SN18700'])
+        self.assertEqual(result['station_name'].tolist()[:2], ['KJEVIK', 'OSLO - BLINDERN'])
+        self.assertTrue(np.isnan(result['lon'].iloc[2]))
+        self.assertEqual(result['lat'].iloc[3], 59.94)
+
+    def test_lookup_og_fylke(self):
+        """
+        Tester oppslag av posisjon og fylke, der første rad vinner ved duplikater.
+        """
+        index = StationIndex.from_csv(self.path)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup(['SN18700:0', 'ukjent']).tolist(), [0, -1])
+        self.assertEqual(index.get(['SN39040'], 'county').tolist(), ['Agder'])
+
+    def test_delt_og_invalidert_ved_endring(self):
+        """
+        Tester at indeksen deles mellom kall og lastes på nytt når filen endres.
+        """
+        first = get_station_index(self.path)
+        self.assertIs(get_station_index(self.path), first)
+
+        pd.DataFrame({'source_id': ['SN1'], 'station_name': ['NY'], 'lon': [1.0], 'lat': [2.0]}).to_csv(self.path, index=False)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = get_station_index(self.path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.get(['SN1:0'], 'station_name').tolist(), ['NY'])
+
+    def test_add_station_metadata_uten_fil(self):
+        """
+        Tester at manglende stasjonsfil gir uendret DataFrame.
+        """
+        df = pd.DataFrame({'sourceId': ['SN18700:0'], 'value': [1.0]})
+        result = add_station_metadata(df, os.path.join(self.tmp.name, 'finnes_ikke.csv'))
+        self.assertEqual(list(result.columns), ['sourceId', 'value'])
+
+if __name__ == "__main__":
+    unittest.main()
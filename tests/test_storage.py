@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+import io
+import contextlib
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), 'src')))
+
+from storage import PartitionedStore
+from schema import apply_schema
+from predictions import read_store_data, predict_from_store
+from heatmap_utils import load_data, load_data_from_store
+
+
+def make_data(sources, start, days, element='sum(precipitation_amount P1D)', value=1.0):
+    times = pd.date_range(start, periods=days, freq='D', tz='UTC') + pd.Timedelta(hours=6)
+    return pd.DataFrame({
+        'sourceId': np.repeat(sources, days),
+        'referenceTimestamp': np.tile(times, len(sources)),
+        'datatype': element,
+        'value': value + np.arange(days * len(sources), dtype=float),
+        'unit': 'mm',
+        'lon': 10.0,
+        'lat': 60.0,
+    })
+
+
+class TestPartitionedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PartitionedStore(self.tmp.name)
+        # To måneder for Oslo og én for Agder
+        self.oslo = make_data(['SN18700', 'SN18950'], '2025-01-20', 20)
+        self.agder = make_data(['SN39040'], '2025-01-01', 10)
+        self.store.write(self.oslo, 'Oslo')
+        self.store.write(self.agder, 'Agder')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partisjoner(self):
+        """
+        Tester at data deles på element, region og måned, og at partisjoner velges ut fra filtrene.
+        """
+        months = [(region, month) for _, region, month, _ in self.store.partitions()]
+        self.assertEqual(months, [('Agder', '2025-01'), ('Oslo', '2025-01'), ('Oslo', '2025-02')])
+        self.assertEqual(len(self.store.partitions(region='Oslo', start='2025-02-01')), 1)
+        self.assertEqual(self.store.partitions(element='mean(air_temperature P1D)'), [])
+
+    def test_les_alt_tilbake(self):
+        """
+        Tester at alle rader og verdier kommer tilbake uendret.
+        """
+        result = self.store.read(region='Oslo')
+        key = ['sourceId', 'referenceTimestamp']
+        pd.testing.assert_frame_equal(
+            result.sort_values(key).reset_index(drop=True),
+            apply_schema(self.oslo).sort_values(key).reset_index(drop=True),
+        )
+
+    def test_filter_pa_dato_og_stasjon(self):
+        """
+        Tester at tidsrom og stasjoner filtreres, også uten ':0' i stasjons-ID.
+        """
+        day = self.store.read(start='2025-01-25', end='2025-01-26')
+        self.assertEqual(sorted(day['sourceId']), ['SN18700', 'SN18950'])
+
+        station = self.store.read(sources=['SN18950:0'], columns=['referenceTimestamp', 'value'])
+        self.assertEqual(len(station), 20)
+        self.assertEqual(list(station.columns), ['referenceTimestamp', 'value'])
+        self.assertTrue(station['referenceTimestamp'].is_monotonic_increasing)
+
+        self.assertTrue(self.store.read(start='2026-01-01').empty)
+
+    def test_skriv_erstatter_duplikater(self):
+        """
+        Tester at rader med samme nøkkel erstattes, og at nyeste tidsstempel per stasjon stemmer.
+        """
+        update = make_data(['SN18700'], '2025-02-05', 10, value=100.0)
+        self.store.write(update, 'Oslo')
+        result = self.store.read(region='Oslo', sources=['SN18700'])
+        self.assertEqual(len(result), 26) # 20 dager fra 20.01, der 05.02-08.02 erstattes, og 6 nye dager til 14.02
+        self.assertEqual(result.loc[result['referenceTimestamp'] == pd.Timestamp('2025-02-05 06:00', tz='UTC'), 'value'].tolist(), [100.0])
+        self.assertEqual(result['value'].iloc[-1], 109.0)
+
+        latest = self.store.latest_timestamps(region='Oslo')
+        self.assertEqual(latest['SN18700'], pd.Timestamp('2025-02-14 06:00', tz='UTC'))
+        self.assertEqual(latest['SN18950'], pd.Timestamp('2025-02-08 06:00', tz='UTC'))
+
+    def test_csv_eksport_og_import(self):
+        """
+        Tester at eksport til CSV gir samme innhold som save_to_csv, og at den kan importeres igjen.
+        """
+        path = os.path.join(self.tmp.name, 'export', 'sum(precipitation_amount P1D)_Agder.csv')
+        self.assertEqual(self.store.export_csv(path, region='Agder'), 10)
+        exported = pd.read_csv(path)
+        self.assertEqual(list(exported.columns), list(self.agder.columns))
+
+        other = PartitionedStore(os.path.join(self.tmp.name, 'other'))
+        self.assertEqual(other.import_csv_dir(os.path.dirname(path)), 10)
+        self.assertEqual([region for _, region, _, _ in other.partitions()], ['Agder'])
+
+    def test_lastere(self):
+        """
+        Tester lasting av én dag til heatmap og én stasjon til prediksjon.
+        """
+        day = load_data_from_store(self.tmp.name, start='2025-01-05', end='2025-01-06')
+        self.assertEqual(day['referenceTimestamp'].tolist(), ['2025-01-05'])
+
+        # Samme datatype som load_data gir for CSV-filene batch-kjøringen lager
+        csv_dir = os.path.join(self.tmp.name, 'csv')
+        os.makedirs(csv_dir)
+        self.store.export_csv(os.path.join(csv_dir, 'sum(precipitation_amount P1D)_Agder.csv'), region='Agder')
+        with contextlib.redirect_stdout(io.StringIO()):
+            from_csv = load_data(csv_dir)
+        from_store = load_data_from_store(self.tmp.name, datatype='Precipitation', start='2025-01-01', end='2025-01-11')
+        self.assertEqual(from_csv['datatype'].unique().tolist(), ['Precipitation'])
+        self.assertEqual(from_store['datatype'].unique().tolist(), ['Precipitation'])
+        self.assertEqual(len(from_store), len(from_csv))
+        self.assertEqual(len(load_data_from_store(self.tmp.name, datatype='sum(precipitation_amount P1D)', start='2025-01-01', end='2025-01-11')), 10)
+
+        station = read_store_data(self.tmp.name, 'SN18700')
+        self.assertEqual(station['sourceId'].unique().tolist(), ['SN18700'])
+        forecast_df, historical_df = predict_from_store(self.tmp.name, 'SN18700', 'W', 4)
+        self.assertEqual(len(forecast_df), 4)
+
+if __name__ == "__main__":
+    unittest.main()